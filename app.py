@@ -1,12 +1,22 @@
+import io
+import uuid
 import streamlit as st
-import traceback
 from datetime import datetime
 
 # Importações da Nova Estrutura
 from ui.styles import apply_global_styles
 from ui.components import render_header, render_metric_card, render_results_tabs, render_instructions
 from core.processor import DataProcessor
+from core.historico import HistoricoStore
+from core.processo_isolado import executar_isolado
 from utils.helpers import carregar_arquivo
+from utils.cache import CACHE_ARQUIVOS, hash_arquivo
+from utils.tarefas import EXECUTANDO, ERRO, NA_FILA, TAREFAS
+
+# Intervalo (s) de atualização do painel enquanto a tarefa roda.
+INTERVALO_ACOMPANHAMENTO_S = 1
+# Validade (s) da contagem de NFs do histórico local mostrada na sidebar.
+INTERVALO_CONTAGEM_HISTORICO_S = 60
 
 # Configuração Base
 st.set_page_config(
@@ -20,10 +30,7 @@ def main():
     # 1. Aplica Design System
     apply_global_styles()
 
-    # 2. Inicializa Processador
-    processor = DataProcessor()
-
-    # 3. Sidebar - Navegação Profissional
+    # 2. Sidebar - Navegação Profissional
     st.sidebar.image("https://intelipost-assets.s3.amazonaws.com/images/logo/logo-intelipost.png", width=160)
     st.sidebar.markdown("<br>", unsafe_allow_html=True)
 
@@ -34,19 +41,37 @@ def main():
             "📧 Pendência - E-mail",
             "⏰ Pendência - Atraso",
             "🛡️ Pendência - Prevenção",
+            "🔁 Pendência - Atraso + Prevenção",
         ],
         index=0
     )
 
     st.sidebar.markdown("---")
+    historico_local = None
+    if st.sidebar.toggle("Histórico persistente", value=False,
+                         help="Usa o histórico local de NFs tratadas em vez de depender só da planilha enviada."):
+        historico_local = _historico_local()
+        st.sidebar.caption(f"{_total_historico(historico_local):,} NFs no histórico local.".replace(",", "."))
+        st.sidebar.checkbox("Registrar NFs tratadas após processar", value=True, key="registrar_historico")
+    st.sidebar.checkbox("Validação: cruzar pela chave de acesso", value=False, key="por_chave_acesso",
+                        help="Quando a NF não está no Sysemp ou se repete nele, casa pela Chave da NF (44 dígitos).")
+    st.sidebar.toggle("Processo isolado (arquivos grandes)", value=False, key="processo_isolado",
+                      help="Processa num processo separado que devolve a memória ao sistema ao terminar. "
+                           "Não usa o cache de arquivos entre execuções.")
+
+    st.sidebar.markdown("---")
+    cache_stats = CACHE_ARQUIVOS.estatisticas()
+    tarefas_stats = TAREFAS.estatisticas()
     st.sidebar.markdown(f"""
         <div style='color: #64748b; font-size: 0.8rem;'>
             <b>Versão:</b> 3.1.0 Enterprise<br>
-            <b>Data:</b> {datetime.now().strftime('%d/%m/%Y')}
+            <b>Data:</b> {datetime.now().strftime('%d/%m/%Y')}<br>
+            <b>Cache:</b> {cache_stats['acertos_memoria'] + cache_stats['acertos_disco']} acertos / {cache_stats['falhas']} falhas<br>
+            <b>Processamentos:</b> {tarefas_stats[EXECUTANDO]} executando / {tarefas_stats[NA_FILA]} na fila
         </div>
     """, unsafe_allow_html=True)
 
-    # 4. Seleção de Fluxo
+    # 3. Seleção de Fluxo
     if "Intelipost" in menu and "Atraso" not in menu:
         render_header("Pendência - Intelipost", "Automação avançada para cruzamento de transações logísticas.")
         render_instructions("intelipost")
@@ -65,9 +90,41 @@ def main():
 
         if st.button("🚀 PROCESSAR INTELIPOST"):
             if file_source and file_sys:
-                executar_processamento(processor, "intelipost", file_source, file_sys, file_hist)
+                executar_processamento("intelipost", file_source, file_sys, file_hist, historico_local)
+            else:
+                st.warning("⚠️ Selecione os arquivos de origem (Intelipost e Sysemp).")
+        acompanhar_processamento("intelipost")
+
+    elif "Atraso + Prevenção" in menu:
+        render_header(
+            "Pendência - Atraso + Prevenção",
+            "Gera Atraso e Prevenção numa única execução — cruzamentos com o Sysemp feitos uma vez só."
+        )
+        render_instructions("validacao")
+
+        st.info(
+            "💡 Mesmas regras dos módulos Atraso e Prevenção. O resultado traz as duas planilhas: "
+            "**Atraso** (DATA PREVISTA até ontem) e **Prevenção** (DATA PREVISTA = HOJE ou AMANHÃ)."
+        )
+
+        with st.container():
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                st.markdown("### 1. Intelipost")
+                file_source = st.file_uploader("Upload Transações Intelipost", type=["xlsx", "csv"], key="inteli_multi")
+            with c2:
+                st.markdown("### 2. Sysemp")
+                file_sys = st.file_uploader("Upload Manutenção NF", type=["xlsx", "csv"], key="sys_multi")
+            with c3:
+                st.markdown("### 3. NFs em Tratamento")
+                file_hist = st.file_uploader("Histórico / NFs em Tratamento", type=["xlsx", "csv"], key="hist_multi")
+
+        if st.button("🚀 PROCESSAR ATRASO + PREVENÇÃO"):
+            if file_source and file_sys:
+                executar_processamento("atraso_prevencao", file_source, file_sys, file_hist, historico_local)
             else:
                 st.warning("⚠️ Selecione os arquivos de origem (Intelipost e Sysemp).")
+        acompanhar_processamento("atraso_prevencao")
 
     elif "Atraso" in menu:
         render_header(
@@ -96,9 +153,10 @@ def main():
 
         if st.button("🚀 PROCESSAR ATRASO"):
             if file_source and file_sys:
-                executar_processamento(processor, "validacao", file_source, file_sys, file_hist)
+                executar_processamento("validacao", file_source, file_sys, file_hist, historico_local)
             else:
                 st.warning("⚠️ Selecione os arquivos de origem (Intelipost e Sysemp).")
+        acompanhar_processamento("validacao")
 
     elif "Prevenção" in menu:
         render_header(
@@ -128,9 +186,10 @@ def main():
 
         if st.button("🚀 PROCESSAR PREVENÇÃO"):
             if file_source and file_sys:
-                executar_processamento(processor, "prevencao", file_source, file_sys, file_hist)
+                executar_processamento("prevencao", file_source, file_sys, file_hist, historico_local)
             else:
                 st.warning("⚠️ Selecione os arquivos de origem (Intelipost e Sysemp).")
+        acompanhar_processamento("prevencao")
 
     else:
         render_header("Pendência - E-mail", "Fluxo ágil para tratativas recebidas via comunicação direta.")
@@ -152,93 +211,261 @@ def main():
 
         if st.button("🚀 PROCESSAR E-MAIL"):
             if file_source and file_sys:
-                executar_processamento(processor, "email", file_source, file_sys, file_hist)
+                executar_processamento("email", file_source, file_sys, file_hist, historico_local)
             else:
                 st.warning("⚠️ Selecione os arquivos de origem (E-mail e Sysemp).")
-
-def executar_processamento(processor, tipo, file_source, file_sys, file_hist):
-    """Orquestra a execução do processamento e renderiza resultados."""
-    with st.status("Executando motor de inteligência logistica...", expanded=True) as status:
-        try:
-            # Carregamento
-            st.write("📖 Lendo arquivos de entrada...")
-            df_source_raw = carregar_arquivo(file_source)
-            df_sys_raw = carregar_arquivo(file_sys)
-            nfs_hist = processor.carregar_base_historico(file_hist)
-
-            # Tratamento Sysemp
-            st.write("⚙️ Normalizando base Sysemp...")
-            df_sys_clean, err = processor.tratar_sysemp(df_sys_raw)
-            if err:
-                st.error(err)
-                return
-
-            # Processamento Específico
-            st.write("🔄 Cruzando dados e aplicando dicionários...")
-            if tipo == "intelipost":
-                (df_f, df_r), err_p = processor.processar_intelipost(df_source_raw, df_sys_clean, nfs_hist)
-            elif tipo == "validacao":
-                (df_f, df_r), err_p = processor.processar_validacao_transportadora(df_source_raw, df_sys_clean, nfs_hist, df_sys_raw=df_sys_raw)
-            elif tipo == "prevencao":
-                (df_f, df_r), err_p = processor.processar_validacao_transportadora(df_source_raw, df_sys_clean, nfs_hist, df_sys_raw=df_sys_raw, modo='prevencao')
-            else:
-                (df_f, df_r), err_p = processor.processar_email(df_source_raw, df_sys_clean, nfs_hist)
-
-            if err_p:
-                st.error(err_p)
-                return
-
-            status.update(label="✅ Processamento Concluído!", state="complete", expanded=False)
-
-            # Renderização de Métricas
-            st.markdown("<br>", unsafe_allow_html=True)
-            m1, m2, m3 = st.columns(3)
-            with m1: render_metric_card("Total Processado", len(df_f) + len(df_r))
-            with m2: render_metric_card("Removidas (Histórico)", len(df_r), color="#dc2626")
-            with m3: render_metric_card("Novas para Tratar", len(df_f), color="#16a34a")
-
-            # Resultados — labels e nome de arquivo customizados por fluxo
-            if tipo in ("validacao", "prevencao"):
-                # Indicadores específicos do fluxo de validação/prevenção
-                if not df_f.empty and 'STATUS DA TRANSPORTADORA' in df_f.columns:
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    n_verd = int((df_f['STATUS DA TRANSPORTADORA'] == 'Verdadeiro').sum())
-                    n_fals = int((df_f['STATUS DA TRANSPORTADORA'] == 'Falso').sum())
-                    n_nloc = int((df_f['STATUS DA TRANSPORTADORA'] == 'Não Localizado').sum())
-                    v1, v2, v3 = st.columns(3)
-                    with v1: render_metric_card("Verdadeiros", n_verd, color="#16a34a")
-                    with v2: render_metric_card("Falsos (Substituídos)", n_fals, color="#dc2626")
-                    with v3: render_metric_card("Não Localizados", n_nloc, color="#f59e0b")
-
-                if tipo == "prevencao":
-                    render_results_tabs(
-                        df_f, df_r,
-                        nome_arquivo="Prevencao_Transportadora",
-                        sheet_principal="Prevenção",
-                        sheet_removidas="Descartadas (Histórico)",
-                        label_principal="🛡️ Resultado da Prevenção",
-                        label_removidas="🗑️ Descartadas pelo Histórico",
-                        msg_vazio_principal="Nenhum pedido com DATA PREVISTA de HOJE ou AMANHÃ.",
-                        msg_vazio_removidas="Nenhuma NF foi descartada pelo histórico.",
-                    )
-                else:
-                    render_results_tabs(
-                        df_f, df_r,
-                        nome_arquivo="Validacao_Transportadora",
-                        sheet_principal="Validação",
-                        sheet_removidas="Descartadas (Histórico)",
-                        label_principal="✅ Resultado da Validação",
-                        label_removidas="🗑️ Descartadas pelo Histórico",
-                        msg_vazio_principal="Nenhum pedido para validar após o filtro de histórico.",
-                        msg_vazio_removidas="Nenhuma NF foi descartada pelo histórico.",
-                    )
-            else:
-                render_results_tabs(df_f, df_r)
-
-        except Exception as e:
-            st.error(f"🚨 ERRO CRÍTICO: {str(e)}")
+        acompanhar_processamento("email")
+
+@st.cache_resource
+def _historico_local():
+    """Um HistoricoStore por servidor (abrir o store cria a tabela se faltar)."""
+    return HistoricoStore()
+
+@st.cache_data(ttl=INTERVALO_CONTAGEM_HISTORICO_S, hash_funcs={HistoricoStore: lambda h: h.caminho})
+def _total_historico(historico_local):
+    """COUNT(*) do histórico, refeito no máximo a cada INTERVALO_CONTAGEM_HISTORICO_S."""
+    return len(historico_local)
+
+def _carregar_com_cache(arquivo, tipo, carregar, avisar=st.write):
+    """Busca no cache pelo hash do conteúdo; calcula e guarda em caso de falha."""
+    chave = f"{hash_arquivo(arquivo)}:{tipo}"
+    valor = CACHE_ARQUIVOS.obter(chave)
+    if valor is None:
+        valor = carregar()
+        CACHE_ARQUIVOS.guardar(chave, valor)
+    else:
+        avisar(f"♻️ {arquivo.name}: reaproveitado do cache.")
+    return valor
+
+def _carregar_sysemp_com_cache(processor, file_sys, avisar=st.write):
+    """SysempIndex (bases tratada + bruta indexadas por NF), cacheado pelo hash do arquivo.
+
+    Retorno: (indice, erro_str_ou_None)
+    """
+    chave = f"{hash_arquivo(file_sys)}:sysemp_indice"
+    indice = CACHE_ARQUIVOS.obter(chave)
+    if indice is not None:
+        avisar(f"♻️ {file_sys.name}: índice reaproveitado do cache.")
+        return indice, None
+
+    (df_sys_clean, df_sys_raw), err = processor.carregar_sysemp_em_blocos(file_sys)
+    if err:
+        return None, err
+    # Completo antes de guardar: o cache mede o tamanho (e o LRU o limite) aqui.
+    indice = processor.indice_sysemp(df_sys_clean, df_sys_raw, chave_acesso=True)
+    CACHE_ARQUIVOS.guardar(chave, indice)
+    return indice, None
+
+def _copiar_upload(arquivo):
+    """Cópia em memória do upload: a tarefa lê o arquivo fora do script da sessão."""
+    if arquivo is None:
+        return None
+    copia = io.BytesIO(arquivo.getvalue())
+    copia.name = arquivo.name
+    return copia
+
+def _processar(tarefa, tipo, file_source, file_sys, file_hist, historico_local, por_chave, registrar, layouts):
+    """Corpo da tarefa em segundo plano: carrega, processa e registra o histórico.
+
+    Roda numa thread do utils.tarefas — sem st.*: o progresso vai para
+    tarefa.avisar e as etapas para tarefa.instrumentacao.
+    Retorno: ({'resultados': {tipo: (df_f, df_r)}, 'derivas': [texto]}, erro_str_ou_None)
+    """
+    instr = tarefa.instrumentacao
+    # Deriva de layout contra os últimos cabeçalhos desta sessão (`layouts`).
+    processor = DataProcessor(instrumentacao=instr, layouts=layouts)
+
+    # Carregamento
+    tarefa.avisar("📖 Lendo arquivos de entrada...")
+    # Cópia rasa: os motores podem renomear/atribuir colunas e o
+    # DataFrame original fica guardado no cache.
+    with instr.etapa("leitura da origem") as etapa:
+        # Só as colunas que o fluxo usa são lidas (cache por fluxo).
+        df_source_raw = _carregar_com_cache(
+            file_source, f"origem:{tipo}",
+            lambda: carregar_arquivo(file_source, colunas=processor.projecao(tipo)),
+            tarefa.avisar,
+        ).copy(deep=False)
+        etapa.saida(len(df_source_raw))
+    if historico_local is not None:
+        if file_hist:
+            novas = historico_local.importar_planilha(file_hist, origem=file_hist.name)
+            tarefa.avisar(f"🗂️ Histórico local: {novas} NFs novas importadas da planilha.")
+        nfs_hist = historico_local
+    else:
+        nfs_hist = _carregar_com_cache(
+            file_hist, "historico", lambda: processor.carregar_base_historico(file_hist), tarefa.avisar
+        ) if file_hist else set()
+
+    # Tratamento Sysemp: o índice por NF das bases tratada e bruta
+    # fica no cache (mesmo arquivo sobe nos quatro módulos). Os
+    # motores consultam só as NFs da origem, sem semi-join prévio.
+    tarefa.avisar("⚙️ Lendo e normalizando base Sysemp...")
+    sysemp, err = _carregar_sysemp_com_cache(processor, file_sys, tarefa.avisar)
+    if err:
+        return None, err
+
+    # Processamento Específico (o modo combinado gera dois fluxos de saída)
+    tarefa.avisar("🔄 Cruzando dados e aplicando dicionários...")
+    resultados, err_p = processor.processar_fluxo(tipo, df_source_raw, sysemp, nfs_hist, por_chave_acesso=por_chave)
+    if err_p:
+        return None, err_p
+
+    if historico_local is not None and registrar:
+        for tipo_res, (df_f, _) in resultados.items():
+            col_nf_saida = 'NOTA FISCAL' if 'NOTA FISCAL' in df_f.columns else 'Nota Fiscal'
+            novas = historico_local.registrar(df_f[col_nf_saida], origem=tipo_res)
+            tarefa.avisar(f"🗂️ {novas} NFs tratadas registradas no histórico local.")
+
+    # Mudança de layout dos arquivos em relação à última execução.
+    derivas = [deriva.descricao() for deriva in processor.esquemas.retirar_derivas()]
+    return {"resultados": resultados, "derivas": derivas}, None
+
+def executar_processamento(tipo, file_source, file_sys, file_hist, historico_local=None):
+    """Submete o processamento como tarefa em segundo plano (utils.tarefas).
+
+    A sessão continua livre enquanto ele roda; a tarefa fica em
+    st.session_state["tarefas"][tipo] e acompanhar_processamento mostra o
+    progresso e, ao fim, o resultado — também depois de trocar de módulo.
+    Com `historico_local` (HistoricoStore), a planilha de histórico enviada
+    é acrescentada ao store e a exclusão consulta o store.
+    """
+    # Opções lidas aqui: a tarefa não acessa o session_state.
+    por_chave = st.session_state.get("por_chave_acesso", False)
+    registrar = st.session_state.get("registrar_historico", False)
+    # Últimos cabeçalhos por fluxo desta sessão: a tarefa os atualiza.
+    layouts = st.session_state.setdefault("layouts", {})
+    arquivos = [_copiar_upload(f) for f in (file_source, file_sys, file_hist)]
+    sessao = st.session_state.setdefault("id_sessao", uuid.uuid4().hex)
+    if st.session_state.get("processo_isolado", False):
+        # Leitura e cruzamentos num processo filho; volta em Arrow IPC.
+        entradas = dict(zip(("origem", "sysemp", "historico"), arquivos))
+        funcao = lambda t: executar_isolado(
+            tipo, entradas, historico_local, por_chave, registrar,
+            avisar=t.avisar, instrumentacao=t.instrumentacao, layouts=layouts,
+        )
+    else:
+        funcao = lambda t: _processar(t, tipo, *arquivos, historico_local, por_chave, registrar, layouts)
+    try:
+        tarefa = TAREFAS.submeter(funcao, descricao=tipo, sessao=sessao)
+    except RuntimeError as e:   # inclui FilaCheia
+        st.error(f"⏳ {e}")
+        return None
+    st.session_state.setdefault("tarefas", {})[tipo] = tarefa
+    return tarefa
+
+def _tabela_etapas(instr):
+    etapas = instr.como_dataframe()
+    if etapas["memoria_pico_mb"].isna().all():
+        etapas = etapas.drop(columns="memoria_pico_mb")
+    return etapas.rename(columns={
+        "nome": "Etapa", "linhas_entrada": "Entrada", "linhas_saida": "Saída",
+        "tempo_s": "Tempo (s)", "memoria_delta_mb": "Δ Memória (MB)",
+        "memoria_pico_mb": "Pico (MB)",
+    })
+
+def _painel_tarefa(tarefa):
+    """Painel st.status com os avisos e as etapas medidas até agora."""
+    if tarefa.estado == NA_FILA:
+        posicao = TAREFAS.posicao_na_fila(tarefa)
+        rotulo, estado = f"⏳ Na fila ({posicao or 0} à frente)...", "running"
+    elif tarefa.estado == EXECUTANDO:
+        rotulo, estado = f"Executando motor de inteligência logistica... ({tarefa.duracao_s():.0f}s)", "running"
+    elif tarefa.estado == ERRO:
+        rotulo, estado = "🚨 Processamento interrompido", "error"
+    else:
+        rotulo, estado = f"✅ Processamento Concluído! ({tarefa.duracao_s():.1f}s)", "complete"
+    with st.status(rotulo, state=estado, expanded=not tarefa.terminada):
+        for aviso in list(tarefa.avisos):
+            st.write(aviso)
+        if tarefa.instrumentacao.etapas:
+            st.dataframe(_tabela_etapas(tarefa.instrumentacao), hide_index=True, use_container_width=True)
+
+@st.fragment(run_every=INTERVALO_ACOMPANHAMENTO_S)
+def _acompanhar_em_andamento(tarefa):
+    """Atualiza só o painel enquanto a tarefa roda; ao terminar, redesenha a página."""
+    _painel_tarefa(tarefa)
+    if tarefa.terminada:
+        st.rerun()
+
+def acompanhar_processamento(tipo):
+    """Progresso ou resultado da última tarefa deste módulo na sessão."""
+    tarefa = st.session_state.get("tarefas", {}).get(tipo)
+    if tarefa is None:
+        return
+    if not tarefa.terminada:
+        _acompanhar_em_andamento(tarefa)
+        return
+
+    _painel_tarefa(tarefa)
+    if tarefa.erro:
+        if tarefa.log:
+            st.error(f"🚨 ERRO CRÍTICO: {tarefa.erro}")
             with st.expander("Ver Log Técnico"):
-                st.code(traceback.format_exc())
+                st.code(tarefa.log)
+        else:
+            st.error(tarefa.erro)
+        return
+
+    for deriva in tarefa.resultado["derivas"]:
+        st.warning(f"🧩 Layout mudou — {deriva}")
+
+    resultados = tarefa.resultado["resultados"]
+    titulos = {"validacao": "⏰ Atraso", "prevencao": "🛡️ Prevenção"}
+    for tipo_res, (df_f, df_r) in resultados.items():
+        if len(resultados) > 1:
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.subheader(titulos[tipo_res])
+        renderizar_resultado(tipo_res, df_f, df_r, chave=f"{tarefa.id}:{tipo_res}")
+
+def renderizar_resultado(tipo, df_f, df_r, chave=None):
+    """Métricas e abas de resultado de um fluxo (`chave`: identidade para o download)."""
+    # Renderização de Métricas
+    st.markdown("<br>", unsafe_allow_html=True)
+    m1, m2, m3 = st.columns(3)
+    with m1: render_metric_card("Total Processado", len(df_f) + len(df_r))
+    with m2: render_metric_card("Removidas (Histórico)", len(df_r), color="#dc2626")
+    with m3: render_metric_card("Novas para Tratar", len(df_f), color="#16a34a")
+
+    # Resultados — labels e nome de arquivo customizados por fluxo
+    if tipo in ("validacao", "prevencao"):
+        # Indicadores específicos do fluxo de validação/prevenção
+        if not df_f.empty and 'STATUS DA TRANSPORTADORA' in df_f.columns:
+            st.markdown("<br>", unsafe_allow_html=True)
+            n_verd = int((df_f['STATUS DA TRANSPORTADORA'] == 'Verdadeiro').sum())
+            n_fals = int((df_f['STATUS DA TRANSPORTADORA'] == 'Falso').sum())
+            n_nloc = int((df_f['STATUS DA TRANSPORTADORA'] == 'Não Localizado').sum())
+            v1, v2, v3 = st.columns(3)
+            with v1: render_metric_card("Verdadeiros", n_verd, color="#16a34a")
+            with v2: render_metric_card("Falsos (Substituídos)", n_fals, color="#dc2626")
+            with v3: render_metric_card("Não Localizados", n_nloc, color="#f59e0b")
+
+        if tipo == "prevencao":
+            render_results_tabs(
+                df_f, df_r,
+                nome_arquivo="Prevencao_Transportadora",
+                sheet_principal="Prevenção",
+                sheet_removidas="Descartadas (Histórico)",
+                label_principal="🛡️ Resultado da Prevenção",
+                label_removidas="🗑️ Descartadas pelo Histórico",
+                msg_vazio_principal="Nenhum pedido com DATA PREVISTA de HOJE ou AMANHÃ.",
+                msg_vazio_removidas="Nenhuma NF foi descartada pelo histórico.",
+                chave=chave,
+            )
+        else:
+            render_results_tabs(
+                df_f, df_r,
+                nome_arquivo="Validacao_Transportadora",
+                sheet_principal="Validação",
+                sheet_removidas="Descartadas (Histórico)",
+                label_principal="✅ Resultado da Validação",
+                label_removidas="🗑️ Descartadas pelo Histórico",
+                msg_vazio_principal="Nenhum pedido para validar após o filtro de histórico.",
+                msg_vazio_removidas="Nenhuma NF foi descartada pelo histórico.",
+                chave=chave,
+            )
+    else:
+        render_results_tabs(df_f, df_r, chave=chave)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: exportação .xlsx openpyxl + loop por célula x escrita em streaming.
+
+Como rodar (a partir da raiz do repositório):
+    python -m benchmarks.bench_exportacao --linhas 300000
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from utils.exportacao import COLUNAS_FORCAR_TEXTO, gerar_planilha_excel
+
+
+def _exportar_openpyxl(abas):
+    """Exportação anterior: pd.ExcelWriter(openpyxl) + '@' célula a célula."""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        for nome_aba, df in abas.items():
+            df.to_excel(writer, index=False, sheet_name=nome_aba)
+            ws = writer.sheets[nome_aba]
+            for idx, col_name in enumerate(df.columns, start=1):
+                if col_name in COLUNAS_FORCAR_TEXTO:
+                    for cell in ws[get_column_letter(idx)][1:]:
+                        cell.number_format = '@'
+    return buffer.getvalue()
+
+
+def _resultado_sintetico(n, seed=42):
+    """DataFrame no formato da saída de Validação (strings, chave de 44 dígitos)."""
+    rng = np.random.default_rng(seed)
+    nfs = rng.integers(1, 999_999, size=n).astype(str)
+    chaves = np.char.add("3526041234567800019055001", np.char.zfill(nfs, 19))
+    return pd.DataFrame({
+        'DATA TRATATIVA': '18/10/2026',
+        'NOTA FISCAL': nfs,
+        'N° PEDIDO': np.char.add("ML-", nfs),
+        'Chave NF': chaves,
+        'TRANSPORTADORA': rng.choice(['JADLOG', 'TOTAL EXPRESS', 'PATRUS'], size=n),
+        'DATA PREVISTA': '17/10/2026',
+        'OCORRÊNCIA': rng.choice(['EM TRÂNSITO', 'AGUARDANDO COLETA', ''], size=n),
+    })
+
+
+def _medir(fn, abas, memoria):
+    t0 = time.perf_counter()
+    tamanho = len(fn(abas))
+    tempo = time.perf_counter() - t0
+    pico = None
+    if memoria:
+        # Rodada separada: o tracemalloc deixa a execução várias vezes mais lenta.
+        tracemalloc.start()
+        fn(abas)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return tempo, pico, tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=300_000)
+    parser.add_argument("--sem-openpyxl", action="store_true",
+                        help="Mede só a escrita em streaming (openpyxl é lento em volumes grandes).")
+    parser.add_argument("--memoria", action="store_true", help="Também mede o pico de memória (tracemalloc).")
+    args = parser.parse_args()
+
+    df = _resultado_sintetico(args.linhas)
+    abas = {'Validação': df, 'Descartadas (Histórico)': df.iloc[: args.linhas // 10]}
+    casos = [("streaming", gerar_planilha_excel)]
+    if not args.sem_openpyxl:
+        casos.insert(0, ("openpyxl", _exportar_openpyxl))
+
+    print(f"{args.linhas:,} linhas x {len(df.columns)} colunas")
+    for nome, fn in casos:
+        tempo, pico, tamanho = _medir(fn, abas, args.memoria)
+        memoria = f" | pico {pico / 2**20:8.1f} MB" if pico is not None else ""
+        print(f"  {nome:<10} {tempo:7.2f}s{memoria} | arquivo {tamanho / 2**20:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: normalização de NF / Pedido escalar (.apply) x vetorizada.
+
+Como rodar (a partir da raiz do repositório):
+    python -m benchmarks.bench_normalizacao --linhas 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.processor import DataProcessor
+from utils.helpers import normalizar_nf
+from utils.normalizacao import normalizar_nf_serie, normalizar_pedido_serie
+
+
+def _serie_sintetica(n, seed=42):
+    """NFs no formato misto visto nos exports (pontuação, '.0', vazios)."""
+    rng = np.random.default_rng(seed)
+    nums = rng.integers(1, 999_999, size=n).astype(str)
+    formato = rng.integers(0, 5, size=n)
+    valores = np.where(formato == 0, np.char.add(nums, ".0"), nums)
+    valores = np.where(formato == 1, np.char.add(np.char.add(" ", valores), ","), valores)
+    valores = valores.astype(object)
+    valores[formato == 2] = np.nan
+    return pd.Series(valores)
+
+
+def _cronometra(fn, serie, repeticoes):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn(serie)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    serie = _serie_sintetica(args.linhas)
+    casos = [
+        ("NF", lambda s: s.apply(normalizar_nf), normalizar_nf_serie),
+        ("Pedido", lambda s: s.apply(DataProcessor._normalizar_pedido), normalizar_pedido_serie),
+    ]
+    print(f"{args.linhas:,} linhas, melhor de {args.repeticoes}")
+    for nome, escalar, vetorizada in casos:
+        t_esc = _cronometra(escalar, serie, args.repeticoes)
+        t_vet = _cronometra(vetorizada, serie, args.repeticoes)
+        print(f"  {nome:<7} apply: {t_esc:7.3f}s | vetorizada: {t_vet:7.3f}s | {t_esc / t_vet:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark de ponta a ponta dos pontos de entrada do DataProcessor.
+
+Gera dados sintéticos (benchmarks/dados_sinteticos.py) em cada tamanho e
+mede, por etapa, o tempo de parede e o pico de memória. O pico
+(utils.instrumentacao.MonitorPico) soma o heap Python/numpy (tracemalloc)
+e o pool do Arrow, onde moram as colunas de texto do pandas (amostrado a
+cada 2 ms). Ele é medido numa rodada separada, porque o tracemalloc deixa
+a execução mais lenta.
+
+Os resultados são comparados com os baselines gravados em
+benchmarks/baselines.json; etapas acima da tolerância são marcadas como
+regressão e o processo sai com 1. Etapa sem baseline não é comparada:
+ao criar uma, grave o baseline dela (--salvar-baseline).
+
+Como rodar (a partir da raiz do repositório):
+    python -m benchmarks.bench_pipeline                        # 10k e 100k
+    python -m benchmarks.bench_pipeline --tamanhos 1000000 5000000 --repeticoes 1
+    python -m benchmarks.bench_pipeline --salvar-baseline      # atualiza o JSON
+    python -m benchmarks.bench_pipeline --etapas validacao_atraso --detalhar
+
+Os baselines valem para a máquina em que foram gravados; ao trocar de
+máquina, grave-os de novo antes de comparar.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.dados_sinteticos import gerar_conjunto
+from core.processor import DataProcessor
+from utils.helpers import carregar_arquivo
+from utils.exportacao import MAX_LINHAS_EXCEL, gerar_planilha_excel
+from utils.instrumentacao import SEM_INSTRUMENTACAO, Instrumentacao, MonitorPico
+
+ARQUIVO_BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+TAMANHOS_PADRAO = [10_000, 100_000]
+TOLERANCIA_PADRAO = 0.30
+# Diferenças absolutas menores que isto são ruído, não regressão.
+FOLGA_TEMPO_S = 0.05
+FOLGA_MEMORIA_MB = 2.0
+# Colunas que o export real da Intelipost traz e nenhum fluxo usa (~80 no total).
+COLUNAS_EXTRAS_INTELIPOST = 60
+
+
+def _csv(df, nome):
+    """DataFrame -> arquivo CSV em memória, como um upload."""
+    buffer = io.BytesIO(df.to_csv(sep=';', index=False).encode('utf-8'))
+    buffer.name = nome
+    return buffer
+
+
+def _linhas_saida(resultado):
+    """Linhas de saída de uma etapa: DataFrame/set, ((final, removidas), err) ou contagem."""
+    if isinstance(resultado, bytes):
+        return None
+    if isinstance(resultado, int):
+        return resultado
+    if isinstance(resultado, tuple):
+        (df_f, df_r), _ = resultado
+        return len(df_f) + len(df_r)
+    return len(resultado)
+
+
+def _com_colunas_extras(df, n_colunas):
+    """`df` com `n_colunas` de texto que nenhum fluxo lê, como no export real."""
+    base = df['Pedido'].astype(str)
+    extras = pd.DataFrame({f'Campo {i}': base + f'-{i}' for i in range(n_colunas)}, index=df.index)
+    return pd.concat([df, extras], axis=1)
+
+
+def _etapas(processor, dados):
+    """Lista (nome, linhas_entrada, fn). Cada fn monta suas entradas do zero."""
+    inteli, sys_bruto, email, hist = (
+        dados['intelipost'], dados['sysemp_bruto'], dados['email'], dados['historico']
+    )
+    sys_csv = _csv(sys_bruto, 'sysemp.csv').getvalue()
+    hist_csv = _csv(hist, 'historico.csv').getvalue()
+    inteli_csv = _csv(_com_colunas_extras(inteli, COLUNAS_EXTRAS_INTELIPOST), 'intelipost.csv').getvalue()
+    df_sys, _ = processor.tratar_sysemp(sys_bruto)
+    nfs_hist = processor.carregar_base_historico(_csv(hist, 'historico.csv'))
+    raw = processor.projetar_sysemp_bruto(sys_bruto)
+    # Os fluxos recebem o índice pronto, como no app (cacheado por arquivo).
+    indice = processor.indice_sysemp(df_sys, raw)
+
+    def carregar_sysemp():
+        arquivo = io.BytesIO(sys_csv)
+        arquivo.name = 'sysemp.csv'
+        (df_clean, _), _ = processor.carregar_sysemp_em_blocos(arquivo)
+        return df_clean
+
+    def carregar_intelipost(projetado):
+        def _carregar():
+            arquivo = io.BytesIO(inteli_csv)
+            arquivo.name = 'intelipost.csv'
+            return carregar_arquivo(arquivo, colunas=processor.projecao('validacao') if projetado else None)
+        return _carregar
+
+    def carregar_historico():
+        arquivo = io.BytesIO(hist_csv)
+        arquivo.name = 'historico.csv'
+        return processor.carregar_base_historico(arquivo)
+
+    def validacao(modo, por_chave_acesso=False):
+        return lambda: processor.processar_validacao_transportadora(
+            inteli.copy(), indice, nfs_hist, modo=modo, por_chave_acesso=por_chave_acesso
+        )
+
+    def multimodo():
+        por_modo, _ = processor.processar_validacao_multimodo(inteli.copy(), indice, nfs_hist)
+        return sum(len(f) + len(d) for f, d in por_modo.values())
+
+    def exportacao():
+        (df_f, df_r), _ = processor.processar_validacao_transportadora(inteli.copy(), indice, nfs_hist)
+        if len(df_f) >= MAX_LINHAS_EXCEL:
+            df_f = df_f.iloc[: MAX_LINHAS_EXCEL - 1]
+        return gerar_planilha_excel({'Validação': df_f, 'Descartadas (Histórico)': df_r})
+
+    return [
+        ('carregar_sysemp_csv', len(sys_bruto), carregar_sysemp),
+        ('tratar_sysemp', len(sys_bruto), lambda: processor.tratar_sysemp(sys_bruto)[0]),
+        ('indice_sysemp', len(df_sys), lambda: len(processor.indice_sysemp(df_sys, raw).chaves)),
+        ('carregar_origem_completa', len(inteli), carregar_intelipost(False)),
+        ('carregar_origem_projetada', len(inteli), carregar_intelipost(True)),
+        ('carregar_base_historico', len(hist), carregar_historico),
+        ('processar_intelipost', len(inteli), lambda: processor.processar_intelipost(inteli.copy(), indice, nfs_hist)),
+        ('processar_email', len(email), lambda: processor.processar_email(email.copy(), indice, nfs_hist)),
+        ('validacao_atraso', len(inteli), validacao('atraso')),
+        ('validacao_prevencao', len(inteli), validacao('prevencao')),
+        ('validacao_por_chave_acesso', len(inteli), validacao('atraso', por_chave_acesso=True)),
+        ('validacao_multimodo', len(inteli), multimodo),
+        ('validacao_e_exportacao', len(inteli), exportacao),
+    ]
+
+
+def _medir(fn, memoria, repeticoes):
+    tempo = float('inf')
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = fn()
+        tempo = min(tempo, time.perf_counter() - t0)
+    pico = None
+    if memoria:
+        monitor = MonitorPico()
+        marca = monitor.abrir()
+        try:
+            fn()
+        finally:
+            pico = monitor.fechar(marca) / 2**20
+    return tempo, pico, _linhas_saida(resultado)
+
+
+def _detalhar(processor, fn, memoria):
+    """Uma execução extra de `fn` com as etapas internas do DataProcessor medidas."""
+    instr = Instrumentacao(pico_memoria=memoria)
+    processor.instrumentacao = instr
+    try:
+        fn()
+    finally:
+        processor.instrumentacao = SEM_INSTRUMENTACAO
+    return instr.tabela(recuo='      ')
+
+
+def _comparar(atual, base, tolerancia, folga):
+    """Variação relativa e se passou da tolerância (None quando não há base)."""
+    if base is None or atual is None or base <= 0:
+        return None, False
+    variacao = atual / base - 1
+    return variacao, variacao > tolerancia and atual - base > folga
+
+
+def _fmt_variacao(variacao, regressao):
+    if variacao is None:
+        return '      -'
+    return f"{variacao:+6.0%}{' !' if regressao else '  '}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--etapas', nargs='+', help="Roda só as etapas com estes nomes.")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Tempo = melhor de N execuções.")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória.")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="Piora relativa aceita antes de acusar regressão (padrão: 0.30).")
+    parser.add_argument('--baselines', default=ARQUIVO_BASELINES)
+    parser.add_argument('--salvar-baseline', action='store_true',
+                        help="Grava os resultados desta rodada como baseline.")
+    parser.add_argument('--detalhar', action='store_true',
+                        help="Imprime também as etapas internas do DataProcessor (execução extra).")
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines, encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    processor = DataProcessor()
+    regressoes = []
+    for n in args.tamanhos:
+        t0 = time.perf_counter()
+        dados = gerar_conjunto(n)
+        print(f"\n{n:,} linhas (dados gerados em {time.perf_counter() - t0:.1f}s)")
+        print(f"  {'etapa':<26} {'entrada':>10} {'saída':>10} {'tempo':>9} {'Δ':>8} {'pico MB':>9} {'Δ':>8}")
+
+        base_n = baselines.get(str(n), {})
+        medidas = {}
+        for nome, entrada, fn in _etapas(processor, dados):
+            if args.etapas and nome not in args.etapas:
+                continue
+            tempo, pico, saida = _medir(fn, not args.sem_memoria, args.repeticoes)
+            medidas[nome] = {'tempo_s': round(tempo, 4), 'pico_mb': None if pico is None else round(pico, 1)}
+
+            base = base_n.get(nome, {})
+            var_t, reg_t = _comparar(tempo, base.get('tempo_s'), args.tolerancia, FOLGA_TEMPO_S)
+            var_m, reg_m = _comparar(pico, base.get('pico_mb'), args.tolerancia, FOLGA_MEMORIA_MB)
+            if reg_t or reg_m:
+                regressoes.append((n, nome))
+            pico_txt = f"{pico:9.1f}" if pico is not None else f"{'-':>9}"
+            saida_txt = f"{saida:10,}" if saida is not None else f"{'-':>10}"
+            print(f"  {nome:<26} {entrada:10,} {saida_txt} {tempo:8.3f}s {_fmt_variacao(var_t, reg_t)} "
+                  f"{pico_txt} {_fmt_variacao(var_m, reg_m)}")
+            if args.detalhar:
+                print(_detalhar(processor, fn, not args.sem_memoria))
+
+        if args.salvar_baseline:
+            baselines.setdefault(str(n), {}).update(medidas)
+
+    if args.salvar_baseline:
+        with open(args.baselines, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write('\n')
+        print(f"\nBaselines gravados em {args.baselines}")
+
+    if regressoes:
+        print(f"\nRegressões (> {args.tolerancia:.0%}): " + ', '.join(f"{e} @ {n:,}" for n, e in regressoes))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Gerador de dados sintéticos no formato dos exports reais.
+
+Reproduz o que torna os arquivos de produção difíceis: grafias de
+transportadora do CARRIERS com caixa/espaços inconsistentes, NFs sujas
+("364.982,", "364982.0", " 364982 ", vazias), datas em formatos misturados
+(ISO com hora, dd/mm/aaaa, "VERIFICAR") e um Sysemp com empresas fora do
+filtro e NFs repetidas. Tudo vetorizado (sem laço por linha): 1M de linhas
+sai em ~10s.
+
+Uso:
+    from benchmarks.dados_sinteticos import gerar_conjunto
+    dados = gerar_conjunto(100_000)
+    dados['intelipost'], dados['sysemp_bruto'], dados['email'], dados['historico']
+"""
+import numpy as np
+import pandas as pd
+
+from core.config import CARRIERS, MARKETPLACES, OCCURRENCES
+
+# Grafias "Sysemp" trazem sufixo de filial/empresa (dígitos); as demais são
+# as formas curtas do Intelipost.
+TRANSP_SYSEMP = [k for k in CARRIERS if any(c.isdigit() for c in k)]
+TRANSP_INTELIPOST = [k for k in CARRIERS if k not in TRANSP_SYSEMP]
+
+UFS = ['SP', 'RJ', 'MG', 'PR', 'SC', 'RS', 'BA', 'PE', 'GO', 'sp', ' rj ']
+EMPRESAS = [16, 18, 19, 21, 10, 99]
+FORMATOS_DATA = ['%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%Y-%m-%d', '%d/%m/%Y %H:%M']
+
+
+def _escolher(rng, opcoes, n, nulos=0.0):
+    valores = pd.Series(np.asarray(opcoes, dtype=object)[rng.integers(0, len(opcoes), size=n)]).astype(str)
+    if nulos:
+        valores = valores.where(rng.random(n) >= nulos)
+    return valores
+
+
+def _escolher_com_grafias(rng, opcoes, n):
+    """Como _escolher, com caixa e espaços inconsistentes (como digitados nos sistemas de origem)."""
+    grafias = [g for o in opcoes for g in (o, o, o.upper(), '  ' + o.lower() + ' ')]
+    return _escolher(rng, grafias, n)
+
+
+def _numeros(rng, inicio, fim, n):
+    return pd.Series(rng.integers(inicio, fim, size=n)).astype(str)
+
+
+def _nfs_sujas(rng, numeros, vazias=0.0):
+    """NFs em formatos mistos: '364982', '364.982,', '364982.0', ' 364982 ' e,
+    numa fração `vazias` das linhas, vazia ou ausente."""
+    base = pd.Series(numeros).astype(str)
+    sorteio = rng.integers(0, 9, size=len(base))
+    sorteio[rng.random(len(base)) < vazias] = 9
+    milhar = (base.str[:-3] + '.' + base.str[-3:]).str.lstrip('.') + ','
+    sujas = base.where(sorteio != 6, milhar)
+    sujas = sujas.where(sorteio != 7, base + '.0')
+    sujas = sujas.where(sorteio != 8, ' ' + base + ' ')
+    sujas = sujas.where(sorteio != 9, '')
+    return sujas.where((sorteio != 9) | (rng.random(len(base)) < 0.5))
+
+
+def _datas_mistas(rng, n, hoje, dias=(-10, 5), nulos=0.05, invalidas=0.02):
+    """Datas relativas a `hoje`, cada linha num dos FORMATOS_DATA."""
+    offsets = np.arange(dias[0], dias[1] + 1)
+    # Tabela (offset x formato) pré-formatada; as linhas só indexam nela.
+    tabela = np.array([
+        [(hoje + pd.Timedelta(days=int(d), hours=13, minutes=45)).strftime(f) for f in FORMATOS_DATA]
+        for d in offsets
+    ] + [['VERIFICAR'] * len(FORMATOS_DATA)], dtype=object)
+    sorteio = rng.random(n)
+    linha = rng.integers(0, len(offsets), size=n)
+    linha[sorteio < invalidas] = len(offsets)
+    valores = pd.Series(tabela[linha, rng.integers(0, len(FORMATOS_DATA), size=n)]).astype(str)
+    return valores.where((sorteio < invalidas) | (sorteio >= invalidas + nulos))
+
+
+def _chaves_nfe(numeros):
+    # 10**19 + nf tem 20 dígitos; sem o '1' inicial, é a NF com zeros à esquerda.
+    digitos = np.asarray(numeros, dtype=np.uint64) + np.uint64(10**19)
+    return '3526041234567800019055001' + pd.Series(digitos).astype(str).str[1:]
+
+
+def gerar_intelipost(n, numeros_nf, rng, hoje):
+    """Export de transações da Intelipost (serve para Intelipost e Validação)."""
+    return pd.DataFrame({
+        'Pedido': _numeros(rng, 10**6, 10**7, n),
+        'Nota Fiscal': _nfs_sujas(rng, numeros_nf, vazias=0.01),
+        'Chave da Nota': _chaves_nfe(numeros_nf),
+        'Transportadora': _escolher_com_grafias(rng, TRANSP_INTELIPOST, n),
+        'UF': _escolher(rng, UFS, n, nulos=0.02),
+        'Canal de Vendas': _escolher(rng, list(MARKETPLACES), n, nulos=0.02),
+        'marketplace': _escolher(rng, ['ML-', 'SH-', '', 'MGL'], n) + _numeros(rng, 1, 10**9, n),
+        'MicroStatus': _escolher(rng, list(OCCURRENCES) + ['ATRASO NA ENTREGA', 'INFORMATIVO'], n),
+        'Data Criação': _datas_mistas(rng, n, hoje, dias=(-30, -5)),
+        'Previsão Entrega Cliente Original': _datas_mistas(rng, n, hoje),
+        'Previsão Entrega Transp. Original': _datas_mistas(rng, n, hoje),
+    })
+
+
+def gerar_sysemp_bruto(n, numeros_nf, rng):
+    """Relatório 'Manutenção de Notas Fiscais' cru, com empresas fora do filtro."""
+    return pd.DataFrame({
+        'Empresa': np.asarray(EMPRESAS)[rng.integers(0, len(EMPRESAS), size=n)],
+        'Nota Fiscal': _nfs_sujas(rng, numeros_nf),
+        'Chave NFe': _chaves_nfe(numeros_nf),
+        'Pedido Marketplace': _escolher(rng, ['ML-', 'SH-', 'MGL'], n) + _numeros(rng, 1, 10**9, n),
+        'UF': _escolher(rng, UFS, n),
+        'Marketplace': _escolher(rng, list(MARKETPLACES), n),
+        'Transportadora': _escolher_com_grafias(rng, TRANSP_SYSEMP, n),
+    })
+
+
+def gerar_email(n, numeros_nf, rng):
+    """Planilha de ocorrências recebidas por e-mail."""
+    return pd.DataFrame({
+        'NOTA FISCAL': _nfs_sujas(rng, numeros_nf, vazias=0.01),
+        'TRANSPORTADORA': _escolher_com_grafias(rng, TRANSP_INTELIPOST, n),
+        'OCORRÊNCIA': _escolher(rng, ['AVARIA', 'EXTRAVIO', 'DEVOLUÇÃO', 'Atraso na entrega'], n),
+    })
+
+
+def gerar_conjunto(n, seed=42, fracao_historico=0.1, hoje=None):
+    """Conjunto coerente de entradas com `n` linhas de origem.
+
+    O Sysemp bruto tem ~1,5x as linhas da origem: contém ~90% das NFs da
+    origem (parte repetida) e NFs que não aparecem na origem. O histórico
+    cobre `fracao_historico` das NFs da origem.
+    """
+    rng = np.random.default_rng(seed)
+    hoje = pd.Timestamp.now().normalize() if hoje is None else pd.Timestamp(hoje)
+    universo = max(n * 2, 1000)
+
+    nfs_origem = rng.integers(1, universo, size=n)
+    n_sys = int(n * 1.5)
+    nfs_sys = np.where(
+        rng.random(n_sys) < 0.6, rng.choice(nfs_origem, size=n_sys), rng.integers(1, universo, size=n_sys)
+    )
+    n_hist = int(n * fracao_historico)
+    nfs_hist = rng.choice(nfs_origem, size=n_hist) if n_hist else np.array([], dtype=np.int64)
+
+    return {
+        'intelipost': gerar_intelipost(n, nfs_origem, rng, hoje),
+        'sysemp_bruto': gerar_sysemp_bruto(n_sys, nfs_sys, rng),
+        'email': gerar_email(n, nfs_origem, rng),
+        'historico': pd.DataFrame({'Nota Fiscal': pd.Series(nfs_hist).astype(str)}),
+    }
@@ -0,0 +1,233 @@
+"""
+Execução em lote (sem Streamlit) dos fluxos do DataProcessor.
+
+Carrega o Sysemp (e monta o índice por NF, core.sysemp_index) e o
+histórico UMA vez e processa quantos arquivos de origem forem passados,
+gravando um .xlsx por origem e fluxo. Imprime, por etapa (inclusive as
+internas do DataProcessor), linhas de entrada/saída, tempo e variação de
+memória.
+
+Com --economizar-memoria o Sysemp não fica inteiro em memória: ele é
+relido a cada origem, guardando só as linhas das NFs dela (semi-join na
+leitura em blocos). Custa uma leitura do Sysemp por origem; o resultado é
+o mesmo. --pico-memoria acrescenta o pico alocado de cada etapa à tabela
+(mais lento: usa tracemalloc).
+
+Exemplos (a partir da raiz do repositório):
+    python cli.py --modo validacao prevencao --sysemp sysemp.csv \\
+        --historico nfs_tratamento.xlsx --origem intelipost_1.csv intelipost_2.csv \\
+        --saida resultados/
+    python cli.py --modo email --sysemp sysemp.csv --origem emails.xlsx
+    python cli.py --modo validacao --sysemp sysemp.csv --origem intelipost_mes.csv \\
+        --economizar-memoria --pico-memoria
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from core.historico import ConjuntoNF, HistoricoStore
+from core.processor import DataProcessor
+from utils.exportacao import gerar_planilha_excel
+from utils.helpers import carregar_arquivo
+from utils.instrumentacao import Instrumentacao
+
+MODOS = ('intelipost', 'email', 'validacao', 'prevencao')
+
+# Nome-base do arquivo e das abas de saída, por fluxo (as abas são as do
+# app). Cada fluxo tem o seu prefixo: numa mesma rodada, um não grava por
+# cima do arquivo do outro.
+SAIDAS = {
+    'intelipost': ('Tratativas_Full', 'Tratativas (Novas)', 'Removidas (No Histórico)'),
+    'email':      ('Tratativas_Full_Email', 'Tratativas (Novas)', 'Removidas (No Histórico)'),
+    'validacao':  ('Validacao_Transportadora', 'Validação', 'Descartadas (Histórico)'),
+    'prevencao':  ('Prevencao_Transportadora', 'Prevenção', 'Descartadas (Histórico)'),
+}
+
+
+def _imprimir_etapas(instr):
+    """Imprime as etapas medidas desde a última impressão e as descarta."""
+    print(instr.tabela())
+    instr.limpar()
+
+
+def _carregar_sysemp(processor, caminho, nfs_filtro=None):
+    """Índice do Sysemp (core.sysemp_index); com `nfs_filtro`, só as linhas dessas NFs."""
+    with open(caminho, 'rb') as f:
+        (df_sys_clean, df_sys_raw), err = processor.carregar_sysemp_em_blocos(f, nfs_filtro=nfs_filtro)
+    if err:
+        return None, err
+    return processor.indice_sysemp(df_sys_clean, df_sys_raw), None
+
+
+def _sysemp_da_origem(processor, caminho_sysemp, df_origem, modos, por_chave_acesso):
+    """Modo econômico: o Sysemp só com as NFs da origem (semi-join na leitura).
+
+    Sem filtro com `por_chave_acesso` — a chave casa linhas do Sysemp cuja
+    NF não aparece na origem — ou quando alguma NF não é localizada.
+    """
+    nfs_filtro = None
+    if not por_chave_acesso:
+        conjuntos = [processor.nfs_da_origem(df_origem, modo) for modo in modos]
+        if all(c is not None for c in conjuntos):
+            nfs_filtro = set().union(*conjuntos)
+    sysemp, err = _carregar_sysemp(processor, caminho_sysemp, nfs_filtro)
+    if err:
+        raise RuntimeError(err)
+    return sysemp
+
+
+def _processar_origem(processor, caminho, modos, sysemp, nfs_hist, por_chave_acesso=False):
+    """Roda os `modos` pedidos para um arquivo de origem.
+
+    Retorna ({modo: (df_f, df_r)}, {modo: erro}): um fluxo que falha não
+    descarta os que deram certo. Falha na leitura da origem (ou do Sysemp,
+    no modo econômico) levanta exceção — aí nenhum fluxo roda.
+
+    `sysemp`: o índice já carregado ou, no modo econômico, o caminho do
+    arquivo (lido aqui, filtrado pelas NFs da origem).
+    """
+    instr = processor.instrumentacao
+    with instr.etapa("leitura da origem") as etapa, open(caminho, 'rb') as f:
+        df_origem = carregar_arquivo(f, colunas=processor.projecao(*modos))
+        etapa.saida(len(df_origem))
+    if isinstance(sysemp, str):
+        sysemp = _sysemp_da_origem(processor, sysemp, df_origem, modos, por_chave_acesso)
+
+    resultados, erros = {}, {}
+    validacao = [m for m in modos if m in ('validacao', 'prevencao')]
+    if validacao:
+        # Atraso + Prevenção juntos compartilham as etapas 1 a 3.
+        try:
+            with instr.etapa(f"validação ({', '.join(validacao)})", entrada=len(df_origem)):
+                por_modo, err = processor.processar_validacao_multimodo(
+                    df_origem, sysemp, nfs_hist,
+                    modos=['atraso' if m == 'validacao' else m for m in validacao],
+                    por_chave_acesso=por_chave_acesso,
+                )
+        except (KeyError, ValueError) as e:
+            por_modo, err = None, str(e)
+        for m in validacao:
+            if err:
+                erros[m] = err
+            else:
+                resultados[m] = por_modo['atraso' if m == 'validacao' else m]
+
+    for modo in (m for m in modos if m in ('intelipost', 'email')):
+        motor = processor.processar_intelipost if modo == 'intelipost' else processor.processar_email
+        try:
+            with instr.etapa(modo, entrada=len(df_origem)) as etapa:
+                (df_f, df_r), err = motor(df_origem.copy(deep=False), sysemp, nfs_hist)
+                if not err:
+                    etapa.saida(len(df_f) + len(df_r))
+        except (KeyError, ValueError) as e:
+            err = str(e)
+        if err:
+            erros[modo] = err
+        else:
+            resultados[modo] = (df_f, df_r)
+
+    return resultados, erros
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Processamento em lote dos fluxos de pendência (sem interface)."
+    )
+    parser.add_argument('--modo', nargs='+', choices=MODOS, required=True,
+                        help="Fluxo(s) a executar para cada origem.")
+    parser.add_argument('--sysemp', required=True, help="Relatório 'Manutenção de Notas Fiscais' (csv/xlsx).")
+    parser.add_argument('--origem', nargs='+', required=True,
+                        help="Arquivo(s) Intelipost / E-mail. O Sysemp é carregado uma única vez.")
+    parser.add_argument('--historico', nargs='*', default=[],
+                        help="Planilha(s) de histórico / NFs em Tratamento (opcional).")
+    parser.add_argument('--historico-db', help="Usa o histórico persistente (SQLite) neste caminho.")
+    parser.add_argument('--registrar', action='store_true',
+                        help="Com --historico-db, registra as NFs tratadas após cada origem.")
+    parser.add_argument('--por-chave-acesso', action='store_true',
+                        help="Validação: casa pela Chave da NF quando a NF falta ou se repete no Sysemp.")
+    parser.add_argument('--economizar-memoria', action='store_true',
+                        help="Relê o Sysemp a cada origem, só com as NFs dela (menos memória, mais leitura).")
+    parser.add_argument('--pico-memoria', action='store_true',
+                        help="Mostra o pico de memória de cada etapa (execução mais lenta).")
+    parser.add_argument('--saida', default='.', help="Pasta de saída dos .xlsx (padrão: atual).")
+    args = parser.parse_args(argv)
+    if args.registrar and not args.historico_db:
+        parser.error("--registrar exige --historico-db")
+
+    instr = Instrumentacao(pico_memoria=args.pico_memoria)
+    processor = DataProcessor(instrumentacao=instr)
+    os.makedirs(args.saida, exist_ok=True)
+    inicio = time.perf_counter()
+
+    print("Bases compartilhadas")
+    if args.economizar_memoria:
+        sysemp = args.sysemp
+    else:
+        try:
+            sysemp, err = _carregar_sysemp(processor, args.sysemp)
+        except (OSError, ValueError) as e:
+            sysemp, err = None, e
+        if err:
+            print(f"ERRO: {err}", file=sys.stderr)
+            return 1
+
+    try:
+        with instr.etapa("histórico") as etapa:
+            if args.historico_db:
+                nfs_hist = HistoricoStore(args.historico_db)
+                for caminho in args.historico:
+                    with open(caminho, 'rb') as f:
+                        nfs_hist.importar_planilha(f, origem=os.path.basename(caminho))
+                etapa.saida(len(nfs_hist))
+            else:
+                nfs_hist = ConjuntoNF()
+                for caminho in args.historico:
+                    with open(caminho, 'rb') as f:
+                        nfs_hist |= processor.carregar_base_historico(f)
+                etapa.saida(len(nfs_hist))
+    except (OSError, ValueError) as e:
+        print(f"ERRO: {e}", file=sys.stderr)
+        return 1
+    _imprimir_etapas(instr)
+
+    falhas = 0
+    data = datetime.now().strftime('%d-%m')
+    for caminho in args.origem:
+        print(f"\n{caminho}")
+        try:
+            resultados, erros = _processar_origem(
+                processor, caminho, args.modo, sysemp, nfs_hist, args.por_chave_acesso
+            )
+        except (RuntimeError, OSError, ValueError) as e:
+            instr.limpar()
+            print(f"  ERRO: {e}", file=sys.stderr)
+            falhas += 1
+            continue
+        for modo, err in erros.items():
+            print(f"  ERRO ({modo}): {err}", file=sys.stderr)
+        falhas += bool(erros)
+
+        base = os.path.splitext(os.path.basename(caminho))[0]
+        gravados = []
+        for modo, (df_f, df_r) in resultados.items():
+            prefixo, aba_principal, aba_removidas = SAIDAS[modo]
+            destino = os.path.join(args.saida, f"{prefixo}_{base}_{data}.xlsx")
+            with instr.etapa(f"exportação {modo}", entrada=len(df_f) + len(df_r)):
+                gerar_planilha_excel({aba_principal: df_f, aba_removidas: df_r}, destino)
+            gravados.append(f"  -> {destino} ({len(df_f):,} novas, {len(df_r):,} removidas)")
+            if args.registrar and isinstance(nfs_hist, HistoricoStore):
+                col_nf = 'NOTA FISCAL' if 'NOTA FISCAL' in df_f.columns else 'Nota Fiscal'
+                nfs_hist.registrar(df_f[col_nf], origem=modo)
+        _imprimir_etapas(instr)
+        for deriva in processor.esquemas.retirar_derivas():
+            print(f"  Layout mudou — {deriva.descricao()}")
+        print('\n'.join(gravados))
+
+    print(f"\nTotal: {time.perf_counter() - inicio:.2f}s")
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
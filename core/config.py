@@ -1,6 +1,7 @@
 # ==============================================================================
 # CONFIGURAÇÕES E DICIONÁRIOS GLOBAIS
 # ==============================================================================
+import os
 
 MARKETPLACES = {
     "ALIEXPRESS": "ALIEXPRESS", "AMAZON - EXTREMA": "AMAZON - EXTREMA",
@@ -185,3 +186,96 @@ FINAL_COLUMNS_VALIDACAO = [
     'NOTA FISCAL',
     'STATUS DA TRANSPORTADORA',
 ]
+
+# Colunas Finais — Fluxo Prevenção (mesma base da Validação, sem DATA PEDIDO
+# e STATUS, com 'DIA DA TRATATIVA' renomeado para 'DATA TRATATIVA').
+FINAL_COLUMNS_PREVENCAO = [
+    'DATA TRATATIVA',
+    'DATA PREVISTA',
+    'UF',
+    'TRANSPORTADORA',
+    'PEDIDO INTELIPOST',
+    'CHAVE DA NF',
+    'MARKETPLACE',
+    'N° PEDIDO',
+    'NOTA FISCAL',
+]
+
+# ==============================================================================
+# PAPÉIS DE COLUNA POR ARQUIVO
+# papel -> nomes candidatos, na ordem de preferência de
+# utils.helpers.encontrar_coluna. Os motores resolvem as colunas por estas
+# listas e a leitura projetada (DataProcessor.projecao) parseia só as
+# colunas que elas resolvem no cabeçalho.
+# ==============================================================================
+COLUNAS_NF = ['Nota Fiscal', 'NF', 'Numero NF']
+
+PAPEIS_INTELIPOST = {
+    'marketplace':    ['Canal de Vendas', 'Marketplace'],
+    'ocorrencia':     ['MicroStatus', 'Ocorrência de Entrega', 'Status'],
+    'nf':             ['Nota Fiscal', 'NF', 'Pedido do Cliente'],
+    'uf':             ['UF', 'Estado'],
+    # Usada pelo nome exato (vai direto para FINAL_COLUMNS).
+    'transportadora': ['Transportadora'],
+}
+
+PAPEIS_EMAIL = {
+    'nf':             ['NOTA FISCAL', 'NF', 'NÚMERO'],
+    'transportadora': ['TRANSPORTADORA', 'TRANSP'],
+    'ocorrencia':     ['OCORRÊNCIA', 'OCORRENCIA', 'STATUS'],
+}
+
+PAPEIS_VALIDACAO = {
+    'data_criacao':    ['Data Criação', 'Data Criacao', 'Data de Criação', 'Data de Criacao'],
+    'previsao':        [
+        'Previsão Entrega Cliente Original', 'Previsao Entrega Cliente Original',
+        'Previsão Entrega', 'Previsao Entrega', 'Data Prevista',
+    ],
+    'previsao_shopee': [
+        'Previsão Entrega Transp. Original', 'Previsao Entrega Transp. Original',
+        'Previsão Entrega Transp Original', 'Previsao Entrega Transp Original',
+    ],
+    'uf':              ['UF', 'Estado'],
+    'transportadora':  ['Transportadora', 'Transp'],
+    'pedido':          ['Pedido', 'Pedido Intelipost', 'Pedido ID'],
+    'chave_nf':        ['Chave da Nota', 'Chave NF', 'Chave da NF', 'Chave NFe'],
+    'canal':           ['Canal de Vendas', 'Canal de Venda'],
+    'num_pedido':      ['marketplace', 'Marketplace', 'Pedido Marketplace', 'N° Pedido', 'Nº Pedido'],
+    'nf':              COLUNAS_NF,
+}
+
+# Sysemp: além destes papéis, tratar_sysemp usa as colunas com 'EMPRESA' no
+# nome e as com 'PEDIDO' e 'MARKETPLACE' (ver DataProcessor.projecao).
+PAPEIS_SYSEMP = {
+    'nf':                 COLUNAS_NF,
+    'uf':                 ['UF', 'Estado', 'Destinatário UF'],
+    'marketplace':        ['Marketplace', 'Canal de Venda', 'Nome do Canal'],
+    'chave':              ['Chave NFe', 'Chave NF', 'Chave'],
+    'transportadora':     ['Transportadora', 'Transp', 'Nome Transportadora'],
+    'pedido_marketplace': ['Pedido Marketplace'],
+    'pedido':             ['Pedido'],
+}
+
+PAPEIS_HISTORICO = {'nf': COLUNAS_NF}
+
+# Papéis do arquivo de origem de cada fluxo do app / CLI.
+PAPEIS_ORIGEM = {
+    'intelipost':       PAPEIS_INTELIPOST,
+    'email':            PAPEIS_EMAIL,
+    'validacao':        PAPEIS_VALIDACAO,
+    'prevencao':        PAPEIS_VALIDACAO,
+    'atraso_prevencao': PAPEIS_VALIDACAO,
+}
+
+# Todos os perfis resolvidos por core.schema.SchemaResolver. 'sysemp_bruto'
+# é a base bruta já projetada (NF + Pedido Marketplace) do lookup de N° PEDIDO.
+PAPEIS_ARQUIVO = {
+    **PAPEIS_ORIGEM,
+    'sysemp':       PAPEIS_SYSEMP,
+    'sysemp_bruto': {p: PAPEIS_SYSEMP[p] for p in ('nf', 'pedido_marketplace')},
+    'historico':    PAPEIS_HISTORICO,
+}
+
+# Histórico persistente de NFs tratadas (core/historico.py).
+# Pode ser sobrescrito pela variável de ambiente HISTORICO_DB.
+HISTORICO_DB_PATH = os.environ.get('HISTORICO_DB', os.path.join('data', 'historico.sqlite'))
@@ -0,0 +1,157 @@
+"""Histórico persistente de NFs já tratadas.
+
+Substitui o re-upload da planilha de histórico / "NFs em Tratamento" a cada
+execução. As NFs ficam num SQLite local (chave primária = NF normalizada),
+então:
+    * registrar um lote custa O(lote), independente do tamanho do histórico;
+    * a exclusão por histórico consulta só as NFs do lote atual (join com
+      uma tabela temporária) em vez de parsear a planilha inteira.
+
+Os motores do DataProcessor aceitam uma instância de HistoricoStore no
+lugar do `set` de NFs (ver DataProcessor._mascara_historico).
+
+ConjuntoNF é o histórico em memória (planilha enviada a cada execução):
+as NFs viram chaves int64 (utils.normalizacao.chave_nf_serie) e a exclusão
+é um `isin` sobre inteiros, sem hashear texto por linha.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.config import HISTORICO_DB_PATH
+from core.schema import ESQUEMAS
+from utils.helpers import carregar_arquivo
+from utils.normalizacao import chave_nf_serie, normalizar_nf_serie
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nfs (
+    nf            TEXT PRIMARY KEY,
+    registrada_em TEXT NOT NULL,
+    origem        TEXT NOT NULL DEFAULT ''
+) WITHOUT ROWID
+"""
+
+
+class ConjuntoNF:
+    """Conjunto imutável de NFs normalizadas, guardado como chaves int64 ordenadas."""
+
+    def __init__(self, chaves=()):
+        # Como o `set` que substitui, inclui a NF vazia se ela veio na planilha.
+        self.chaves = np.unique(np.asarray(chaves, dtype=np.int64))
+
+    @classmethod
+    def de_nfs(cls, nfs):
+        """A partir de NFs já normalizadas (Series, set, lista...)."""
+        if not isinstance(nfs, pd.Series):
+            nfs = pd.Series(list(nfs), dtype=object)
+        return cls(chave_nf_serie(nfs))
+
+    def __len__(self):
+        return len(self.chaves)
+
+    def __or__(self, outro):
+        if not isinstance(outro, ConjuntoNF):
+            outro = ConjuntoNF.de_nfs(outro)
+        return ConjuntoNF(np.concatenate([self.chaves, outro.chaves]))
+
+    def memoria_bytes(self):
+        return self.chaves.nbytes
+
+    def contem_chaves(self, chaves):
+        """Máscara booleana (np.ndarray) de quais chaves estão no conjunto."""
+        if len(self.chaves) == 0:
+            return np.zeros(len(chaves), dtype=bool)
+        return pd.Series(chaves).isin(self.chaves).to_numpy()
+
+    def contem(self, serie_nf):
+        """Como HistoricoStore.contem: máscara das NFs normalizadas do lote."""
+        return self.contem_chaves(chave_nf_serie(serie_nf))
+
+
+class HistoricoStore:
+    """NFs tratadas, persistidas em SQLite. Thread-safe (uma conexão por chamada, sempre fechada)."""
+
+    def __init__(self, caminho=HISTORICO_DB_PATH):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        pasta = os.path.dirname(os.path.abspath(caminho))
+        os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute(_SCHEMA)
+
+    @contextmanager
+    def _conectar(self):
+        # `with sqlite3.connect(...)` só faz commit/rollback: a conexão
+        # continuaria aberta. Threads e processos isolados abrem o mesmo banco.
+        con = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def __len__(self):
+        with self._conectar() as con:
+            return con.execute("SELECT COUNT(*) FROM nfs").fetchone()[0]
+
+    # ----------------------------------------------------------------- #
+    # Escrita
+    # ----------------------------------------------------------------- #
+    def registrar(self, nfs, origem=""):
+        """Acrescenta NFs ao histórico (normaliza; ignora vazias e repetidas).
+
+        Retorna quantas NFs eram novas.
+        """
+        serie = normalizar_nf_serie(pd.Series(list(nfs), dtype=object))
+        unicas = pd.unique(serie[serie != ""].to_numpy(dtype=object))
+        if len(unicas) == 0:
+            return 0
+        agora = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._conectar() as con:
+            antes = con.total_changes
+            con.executemany(
+                "INSERT OR IGNORE INTO nfs (nf, registrada_em, origem) VALUES (?, ?, ?)",
+                ((nf, agora, origem) for nf in unicas),
+            )
+            return con.total_changes - antes
+
+    def importar_planilha(self, arquivo, origem="planilha"):
+        """Importa a planilha de histórico / NFs em Tratamento para o store.
+
+        Como em DataProcessor.carregar_base_historico, erros de leitura sobem
+        para o chamador; aqui, planilha sem coluna de NF também (ValueError).
+        """
+        df = carregar_arquivo(
+            arquivo, colunas=lambda cabecalho: ESQUEMAS.resolver(cabecalho, 'historico').usadas()
+        )
+        col_nf = ESQUEMAS.resolver(df, 'historico')['nf']
+        if not col_nf:
+            raise ValueError("Coluna de Nota Fiscal não encontrada na planilha de histórico.")
+        return self.registrar(df[col_nf], origem=origem)
+
+    # ----------------------------------------------------------------- #
+    # Consulta
+    # ----------------------------------------------------------------- #
+    def contem(self, serie_nf):
+        """Máscara booleana (np.ndarray) de quais NFs do lote estão no histórico.
+
+        `serie_nf` já deve vir normalizada (dígitos). Só os valores únicos do
+        lote vão ao banco, via tabela temporária + join na chave primária.
+        """
+        serie_nf = pd.Series(serie_nf)
+        unicas = pd.unique(serie_nf[serie_nf != ""].to_numpy(dtype=object))
+        if len(unicas) == 0:
+            return np.zeros(len(serie_nf), dtype=bool)
+        with self._conectar() as con:
+            con.execute("CREATE TEMP TABLE lote (nf TEXT PRIMARY KEY) WITHOUT ROWID")
+            con.executemany("INSERT OR IGNORE INTO lote (nf) VALUES (?)", ((nf,) for nf in unicas))
+            encontradas = [
+                r[0] for r in con.execute("SELECT lote.nf FROM lote JOIN nfs ON nfs.nf = lote.nf")
+            ]
+            con.execute("DROP TABLE lote")
+        return ConjuntoNF.de_nfs(encontradas).contem(serie_nf)
@@ -0,0 +1,270 @@
+"""Fluxos do DataProcessor num processo filho de vida curta.
+
+Um Sysemp de milhões de linhas deixa no processo do Streamlit centenas de
+MB que o alocador não devolve ao sistema — e o servidor é compartilhado
+por todos os usuários. Em modo isolado, leitura, tratamento e cruzamentos
+rodam num processo filho (`python -m core.processo_isolado pedido.json`)
+que termina junto com o processamento: a memória volta ao sistema e a do
+servidor fica estável.
+
+A troca de dados é feita por arquivos numa pasta temporária, não por
+pickle de DataFrames:
+    entrada   — os arquivos enviados, gravados como vieram (o filho os lê
+                com a mesma projeção e leitura em blocos do app; o Sysemp
+                já sai com o semi-join pelas NFs da origem);
+    saída     — cada DataFrame de resultado num arquivo Arrow IPC,
+                lido pelo pai via memory map (ler_arrow); índice e
+                colunas category fazem a ida e volta;
+    progresso — avisos e etapas medidas chegam como linhas JSON na saída
+                padrão do filho enquanto ele roda; o stderr fica num
+                arquivo da pasta (log de uma falha sem resposta).
+
+    resultado, err = executar_isolado('validacao', {'origem': up, 'sysemp': up_sys},
+                                      avisar=tarefa.avisar, instrumentacao=tarefa.instrumentacao)
+
+O resultado tem o formato do processamento do app:
+{'resultados': {fluxo: (df_final, df_removidas)}, 'derivas': [texto]}.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+
+import pyarrow as pa
+
+from core.historico import HistoricoStore
+from core.processor import DataProcessor
+from utils.helpers import carregar_arquivo
+from utils.instrumentacao import Instrumentacao, MedidaEtapa
+
+# Um processo que passa disso é encerrado (arquivo anormal ou travado).
+TIMEOUT_PROCESSO_S = 60 * 60
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PARTES = ('final', 'removidas')
+
+
+class FalhaProcessoIsolado(RuntimeError):
+    """Erro inesperado no processo filho; `log` traz o traceback de lá."""
+
+    def __init__(self, mensagem, log=None):
+        super().__init__(mensagem)
+        self.log = log
+
+
+def gravar_arrow(df, caminho):
+    """DataFrame -> arquivo Arrow IPC (formato de arquivo, sem compressão: mapeável)."""
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(os.fspath(caminho), 'wb') as destino, pa.ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+
+def ler_arrow(caminho):
+    """Arquivo Arrow IPC -> DataFrame, lendo o arquivo por memory map."""
+    tabela = pa.ipc.open_file(pa.memory_map(os.fspath(caminho), 'r')).read_all()
+    df = tabela.to_pandas()
+    # Texto em coluna object volta como `str` no pandas 3: restaura o dtype
+    # de origem, para o resultado sair igual ao do processamento no app.
+    metadados = tabela.schema.pandas_metadata or {}
+    objetos = [
+        c['name'] for c in metadados.get('columns', [])
+        if c['numpy_type'] == 'object' and c['name'] in df.columns and df[c['name']].dtype != object
+    ]
+    return df.astype(dict.fromkeys(objetos, object)) if objetos else df
+
+
+# --------------------------------------------------------------------- #
+# Processo filho
+# --------------------------------------------------------------------- #
+def _emitir(tipo, conteudo):
+    print(json.dumps([tipo, conteudo], ensure_ascii=False), flush=True)
+
+
+def _processar_pedido(pedido):
+    """Roda o fluxo do `pedido` e grava as saídas na pasta dele. Devolve o resumo."""
+    def avisar(texto):
+        _emitir('aviso', texto)
+
+    instr = Instrumentacao(callback=lambda medida: _emitir('etapa', medida.como_dict()))
+    processor = DataProcessor(instrumentacao=instr, layouts=pedido['layouts'])
+    tipo, arquivos = pedido['tipo'], pedido['arquivos']
+
+    avisar("📖 Lendo arquivos de entrada (processo isolado)...")
+    with instr.etapa("leitura da origem") as etapa, open(arquivos['origem'], 'rb') as f:
+        df_origem = carregar_arquivo(f, colunas=processor.projecao(tipo))
+        etapa.saida(len(df_origem))
+
+    if pedido['historico_db']:
+        nfs_hist = HistoricoStore(pedido['historico_db'])
+        if arquivos.get('historico'):
+            with open(arquivos['historico'], 'rb') as f:
+                novas = nfs_hist.importar_planilha(f, origem=pedido['nome_historico'])
+            avisar(f"🗂️ Histórico local: {novas} NFs novas importadas da planilha.")
+    elif arquivos.get('historico'):
+        with open(arquivos['historico'], 'rb') as f:
+            nfs_hist = processor.carregar_base_historico(f)
+    else:
+        nfs_hist = set()
+
+    # Sem cache entre execuções aqui: o Sysemp é lido só com as NFs da
+    # origem. A chave de acesso casa NFs que não estão na origem — sem filtro.
+    avisar("⚙️ Lendo e normalizando base Sysemp...")
+    nfs_filtro = None if pedido['por_chave_acesso'] else processor.nfs_da_origem(df_origem, tipo)
+    with open(arquivos['sysemp'], 'rb') as f:
+        (df_sys_clean, df_sys_raw), err = processor.carregar_sysemp_em_blocos(f, nfs_filtro=nfs_filtro)
+    if err:
+        return {'erro': err}
+    sysemp = processor.indice_sysemp(df_sys_clean, df_sys_raw)
+    del df_sys_clean, df_sys_raw
+
+    avisar("🔄 Cruzando dados e aplicando dicionários...")
+    resultados, err = processor.processar_fluxo(
+        tipo, df_origem, sysemp, nfs_hist, por_chave_acesso=pedido['por_chave_acesso']
+    )
+    if err:
+        return {'erro': err}
+
+    if isinstance(nfs_hist, HistoricoStore) and pedido['registrar']:
+        for fluxo, (df_f, _) in resultados.items():
+            col_nf_saida = 'NOTA FISCAL' if 'NOTA FISCAL' in df_f.columns else 'Nota Fiscal'
+            novas = nfs_hist.registrar(df_f[col_nf_saida], origem=fluxo)
+            avisar(f"🗂️ {novas} NFs tratadas registradas no histórico local.")
+
+    with instr.etapa("gravação Arrow IPC", entrada=sum(len(f) + len(r) for f, r in resultados.values())):
+        for fluxo, dfs in resultados.items():
+            for parte, df in zip(_PARTES, dfs):
+                gravar_arrow(df, os.path.join(pedido['pasta'], f"{fluxo}.{parte}.arrow"))
+
+    return {
+        'erro': None,
+        'fluxos': list(resultados),
+        'derivas': [d.descricao() for d in processor.esquemas.retirar_derivas()],
+        'layouts': processor.esquemas.ultimos,
+        'etapas': [m.como_dict() for m in instr.etapas],
+    }
+
+
+def _trabalhar(caminho_pedido):
+    """Ponto de entrada do processo filho: sempre termina com uma mensagem 'fim'."""
+    try:
+        with open(caminho_pedido, encoding='utf-8') as f:
+            resumo = _processar_pedido(json.load(f))
+    except Exception as e:
+        resumo = {'erro': str(e) or type(e).__name__, 'log': traceback.format_exc()}
+    _emitir('fim', resumo)
+
+
+# --------------------------------------------------------------------- #
+# Processo do app
+# --------------------------------------------------------------------- #
+def _gravar_entrada(pasta, papel, arquivo):
+    caminho = os.path.join(pasta, f"{papel}_{os.path.basename(arquivo.name)}")
+    with open(caminho, 'wb') as destino:
+        destino.write(arquivo.getvalue())
+    return caminho
+
+
+def executar_isolado(tipo, arquivos, historico_local=None, por_chave_acesso=False, registrar=False,
+                     avisar=None, instrumentacao=None, layouts=None, timeout_s=TIMEOUT_PROCESSO_S):
+    """
+    Roda o fluxo `tipo` (ver DataProcessor.processar_fluxo) num processo filho.
+
+    `arquivos`: {'origem': ..., 'sysemp': ..., 'historico': ... ou None},
+    objetos com `.name` e `.getvalue()` (uploads do Streamlit, BytesIO).
+    `historico_local`: HistoricoStore — o filho abre o mesmo SQLite.
+    `avisar(texto)` recebe o progresso; as etapas medidas no filho entram
+    em `instrumentacao.etapas`. `layouts`: últimos cabeçalhos da sessão
+    (core.schema.AcompanhamentoLayout) — vão ao filho e voltam atualizados.
+
+    Retorno: ({'resultados': {fluxo: (df_final, df_removidas)}, 'derivas': [texto]},
+              erro_str_ou_None). Falha inesperada no filho levanta
+    FalhaProcessoIsolado (com o traceback em `log`).
+    """
+    avisar = avisar or (lambda texto: None)
+    etapas = instrumentacao.etapas if instrumentacao is not None else []
+    inicio_etapas = len(etapas)
+    pasta = tempfile.mkdtemp(prefix='conversao_isolado_')
+    try:
+        pedido = {
+            'tipo': tipo,
+            'pasta': pasta,
+            'arquivos': {papel: _gravar_entrada(pasta, papel, a) for papel, a in arquivos.items() if a is not None},
+            'nome_historico': arquivos['historico'].name if arquivos.get('historico') is not None else None,
+            'historico_db': os.path.abspath(historico_local.caminho) if historico_local is not None else None,
+            'por_chave_acesso': por_chave_acesso,
+            'registrar': registrar,
+            'layouts': dict(layouts or {}),
+        }
+        caminho_pedido = os.path.join(pasta, 'pedido.json')
+        with open(caminho_pedido, 'w', encoding='utf-8') as f:
+            json.dump(pedido, f)
+
+        resumo = None
+        with open(os.path.join(pasta, 'stderr.log'), 'w+', encoding='utf-8', errors='replace') as stderr:
+            processo = subprocess.Popen(
+                [sys.executable, '-m', 'core.processo_isolado', caminho_pedido],
+                cwd=_RAIZ, stdout=subprocess.PIPE, stderr=stderr,
+                encoding='utf-8', errors='replace',
+            )
+            estourou = threading.Event()
+
+            def _encerrar():
+                estourou.set()
+                processo.kill()
+
+            cronometro = threading.Timer(timeout_s, _encerrar)
+            cronometro.start()
+            try:
+                for linha in processo.stdout:
+                    try:
+                        tipo_msg, conteudo = json.loads(linha)
+                    except ValueError:
+                        continue    # saída que não é mensagem (print de alguma biblioteca)
+                    if tipo_msg == 'aviso':
+                        avisar(conteudo)
+                    elif tipo_msg == 'etapa':
+                        etapas.append(MedidaEtapa.de_dict(conteudo))
+                    else:
+                        resumo = conteudo
+                processo.wait()
+            finally:
+                cronometro.cancel()
+                if processo.poll() is None:
+                    processo.kill()
+                    processo.wait()
+            stderr.seek(0)
+            log_filho = stderr.read()
+
+        if estourou.is_set():
+            return None, f"Processo isolado encerrado após {timeout_s / 60:.0f} min sem terminar."
+        if resumo is None:
+            if log_filho:
+                raise FalhaProcessoIsolado(
+                    f"O processo isolado terminou sem resultado (código {processo.returncode}).", log_filho
+                )
+            # Morto sem dizer nada: em geral, o sistema o encerrou por falta de memória.
+            return None, (f"O processo isolado foi encerrado (código {processo.returncode}) — "
+                          "provavelmente por falta de memória.")
+        if resumo.get('log'):
+            raise FalhaProcessoIsolado(resumo['erro'], resumo['log'])
+        if resumo['erro']:
+            return None, resumo['erro']
+
+        if layouts is not None:
+            layouts.update(resumo['layouts'])
+        # Ao vivo as etapas chegam na ordem em que terminam; no fim, a ordem de início.
+        etapas[inicio_etapas:] = [MedidaEtapa.de_dict(d) for d in resumo['etapas']]
+        resultados = {
+            fluxo: tuple(ler_arrow(os.path.join(pasta, f"{fluxo}.{parte}.arrow")) for parte in _PARTES)
+            for fluxo in resumo['fluxos']
+        }
+        return {'resultados': resultados, 'derivas': resumo['derivas']}, None
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    _trabalhar(sys.argv[1])
@@ -2,18 +2,61 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from core.historico import ConjuntoNF, HistoricoStore
+from core.schema import AcompanhamentoLayout
+from core.sysemp_index import SysempIndex
 from core.config import (
     MARKETPLACES, CARRIERS, OCCURRENCES,
-    FINAL_COLUMNS, FINAL_COLUMNS_VALIDACAO
+    FINAL_COLUMNS, FINAL_COLUMNS_VALIDACAO, FINAL_COLUMNS_PREVENCAO,
+)
+from utils.helpers import carregar_arquivo, ler_cabecalho, ler_csv_em_blocos, TAMANHO_BLOCO_CSV
+from utils.normalizacao import chave_nf_serie, normalizar_nf_serie, normalizar_pedido_serie
+from utils.datas import formatar_datas_br
+from utils.instrumentacao import SEM_INSTRUMENTACAO
+from utils.categorias import como_categoria, eh_categoria, intercalar, preencher_nulos
+from utils.transformacao import (
+    Transformacoes, com_dicionario, encadear, no_dicionario, texto_exibicao,
+    texto_limpo, texto_maiusculo, texto_maiusculo_espacos,
 )
-from utils.helpers import normalizar_nf, encontrar_coluna, carregar_arquivo
 
 # Fuso horario do Brasil. Streamlit Cloud roda em UTC; usar local time
 # levaria "ontem" a ser o dia errado em alguns horarios.
 TZ_BR = ZoneInfo('America/Sao_Paulo')
 
+# IDs de empresa considerados pelo tratamento do Sysemp.
+IDS_EMPRESA = [16, 18, 19, 21]
+
+# Modos da Validação de Transportadora (ETAPAS 4 e 5).
+#   janela(datas, hoje) -> máscara sobre a DATA PREVISTA tipada (sem hora)
+#   colunas / renomear  -> layout final do modo (None = FINAL_COLUMNS_VALIDACAO)
+# 'atraso'   : DATA PREVISTA até ontem (ontem + todas as anteriores).
+# 'prevencao': DATA PREVISTA HOJE ou HOJE + 1 DIA (hoje e amanhã).
+MODOS_VALIDACAO = {
+    'atraso': {
+        'janela': lambda datas, hoje: datas <= hoje - timedelta(days=1),
+        'colunas': None,
+        'renomear': {},
+    },
+    'prevencao': {
+        'janela': lambda datas, hoje: datas.isin([hoje, hoje + timedelta(days=1)]),
+        'colunas': FINAL_COLUMNS_PREVENCAO,
+        'renomear': {'DIA DA TRATATIVA': 'DATA TRATATIVA'},
+    },
+}
+
+# Schema da base devolvida por DataProcessor.tratar_sysemp.
+COLUNAS_SYSEMP_TRATADO = [
+    'Nota Fiscal', 'Chave NF_sys', 'Pedido_sys', 'UF_sys', 'Marketplace_sys', 'Transportadora_sys',
+]
+
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, instrumentacao=None, esquemas=None, layouts=None):
+        # Medição por etapa (utils.instrumentacao). Sem ela, nada é medido.
+        self.instrumentacao = instrumentacao or SEM_INSTRUMENTACAO
+        # Colunas por papel, em cache por cabeçalho (`esquemas`, padrão o
+        # ESQUEMAS do processo); a deriva de layout é desta instância,
+        # contra os últimos cabeçalhos em `layouts` (ver core.schema).
+        self.esquemas = AcompanhamentoLayout(esquemas, layouts)
         self.dict_mkt_norm = {k.upper(): v for k, v in MARKETPLACES.items()}
         # Normaliza espacos multiplos -> espaco simples nas chaves do dict de
         # transportadoras. Garante que "JADLOG  SERRA 18" (2 espacos),
@@ -25,6 +68,25 @@ class DataProcessor:
         }
         self.dict_ocorr_norm = {k.upper(): v for k, v in OCCURRENCES.items()}
 
+        # Cadeias de texto rodadas só nos valores distintos de cada coluna,
+        # com memo compartilhado entre as etapas (utils.transformacao).
+        self.transformacoes = Transformacoes({
+            'texto': texto_limpo,
+            'maiusculo': texto_maiusculo,
+            'maiusculo_sem_strip': lambda v: v.astype(str).str.upper(),
+            'exibicao': texto_exibicao,
+            'exibicao_maiusculo': encadear(texto_exibicao, lambda v: v.str.upper()),
+            'marketplace': lambda v: v.map(self._corrigir_mkt),
+            'transportadora': com_dicionario(texto_maiusculo, self.dict_transp_norm),
+            'transportadora_norm': texto_maiusculo_espacos,
+            'transportadora_canonica': com_dicionario(texto_maiusculo_espacos, self.dict_transp_norm),
+            'transportadora_no_dict': no_dicionario(texto_maiusculo_espacos, self.dict_transp_norm),
+            'ocorrencia': com_dicionario(texto_maiusculo, self.dict_ocorr_norm),
+            'ocorrencia_email': encadear(
+                texto_maiusculo, lambda v: v.replace('NAN', 'VERIFICAR').fillna("VERIFICAR")
+            ),
+        })
+
     # --------------------------------------------------------------------- #
     # Helpers internos
     # --------------------------------------------------------------------- #
@@ -40,62 +102,73 @@ class DataProcessor:
             s = s[:-2]
         return s
 
-    @staticmethod
-    def _fmt_col(df, col, default=""):
-        """Extrai uma coluna do df como string segura, mesmo se a coluna não existir."""
+    def _fmt_col(self, df, col, default="", maiusculo=False):
+        """Extrai uma coluna do df como string segura, mesmo se a coluna não existir.
+
+        Colunas category passam pelas transformações por valor distinto e
+        continuam category.
+        """
         if col is None or col not in df.columns:
             return pd.Series([default] * len(df), index=df.index)
-        return (
+        if default == "" and eh_categoria(df[col]):
+            return self.transformacoes.aplicar(df[col], 'exibicao_maiusculo' if maiusculo else 'exibicao')
+        texto = (
             df[col]
             .astype(str)
             .replace({'nan': default, 'NaT': default, 'None': default})
             .fillna(default)
             .str.strip()
         )
+        return texto.str.upper() if maiusculo else texto
+
+    @staticmethod
+    def _datas_br(df, col, default=""):
+        """
+        Formata coluna de data para padrão brasileiro e devolve a data tipada.
+        Entrada: '2026-03-29 12:51:46', '2026-03-29', datetime, NaT, etc.
+        Saída: (texto, data) — ver utils.datas.formatar_datas_br. O parse é
+        feito só nos valores únicos e espalhado pelas linhas.
+        """
+        if col is None or col not in df.columns:
+            return (
+                pd.Series([default] * len(df), index=df.index),
+                pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]'),
+            )
+        return formatar_datas_br(df[col], default)
 
     @staticmethod
     def _fmt_data_br(df, col, default=""):
         """
         Formata coluna de data para padrão brasileiro.
-        Entrada: '2026-03-29 12:51:46', '2026-03-29', datetime, NaT, etc.
         Saída:
             * Se houver hora não-zero -> 'DD/MM/YYYY HH:MM:SS'
             * Caso contrário          -> 'DD/MM/YYYY'
             * Vazio/inválido          -> default ("")
         """
-        if col is None or col not in df.columns:
-            return pd.Series([default] * len(df), index=df.index)
+        return DataProcessor._datas_br(df, col, default)[0]
 
-        # format='mixed' permite que cada linha seja parseada com o formato dela
-        # (algumas com hora, outras só data). Sem isso, pandas infere pelo primeiro
-        # elemento e torna NaT as linhas que não casam.
-        try:
-            dts = pd.to_datetime(df[col], errors='coerce', format='mixed')
-        except (TypeError, ValueError):
-            # Fallback para versões antigas do pandas (<2.0)
-            dts = pd.to_datetime(df[col], errors='coerce')
-
-        def _fmt(dt):
-            if pd.isna(dt):
-                # Tenta preservar o original quando não foi possível parsear como data
-                return default
-            if dt.hour == 0 and dt.minute == 0 and dt.second == 0:
-                return dt.strftime('%d/%m/%Y')
-            return dt.strftime('%d/%m/%Y %H:%M:%S')
-
-        formatted = dts.apply(_fmt)
-
-        # Para valores não parseáveis, devolve string original (ex.: "VERIFICAR")
-        original = df[col].astype(str).str.strip()
-        mask_fallback = dts.isna() & original.replace({'nan': '', 'NaT': '', 'None': ''}).ne('')
-        formatted = formatted.where(~mask_fallback, original)
-        return formatted
+    def _normalizar_transp(self, serie):
+        """Aplica o dicionário de transportadoras (já com chaves UPPER), por valor distinto."""
+        return self.transformacoes.aplicar(serie, 'transportadora')
 
     @staticmethod
-    def _normalizar_transp(serie, dicionario):
-        """Aplica o dicionário de transportadoras (já com chaves UPPER)."""
-        upper = serie.astype(str).str.upper().str.strip()
-        return upper.map(dicionario).fillna(upper)
+    def _mascara_historico(serie_nf, nfs_historico, chaves=None):
+        """Máscara de NFs presentes no histórico.
+
+        `nfs_historico` pode ser um core.historico.ConjuntoNF (o que
+        carregar_base_historico devolve), um set/iterável de NFs normalizadas
+        ou um core.historico.HistoricoStore (consulta em lote no banco).
+        `chaves` são as chaves int64 de `serie_nf`, quando já calculadas.
+        """
+        if nfs_historico is None or len(nfs_historico) == 0:
+            return pd.Series(False, index=serie_nf.index)
+        if isinstance(nfs_historico, HistoricoStore):
+            return pd.Series(nfs_historico.contem(serie_nf), index=serie_nf.index)
+        if not isinstance(nfs_historico, ConjuntoNF):
+            nfs_historico = ConjuntoNF.de_nfs(nfs_historico)
+        if chaves is None:
+            chaves = chave_nf_serie(serie_nf)
+        return pd.Series(nfs_historico.contem_chaves(chaves), index=serie_nf.index)
 
     @staticmethod
     def _so_data(serie):
@@ -106,66 +179,284 @@ class DataProcessor:
     # Carregamento e tratamento Sysemp (compartilhado entre módulos)
     # --------------------------------------------------------------------- #
     def carregar_base_historico(self, file_base):
-        """Carrega conjunto de NFs do histórico para exclusão."""
-        if file_base is None: return set()
-        try:
-            df_base = carregar_arquivo(file_base)
-            col_nf_base = encontrar_coluna(df_base, ['Nota Fiscal', 'NF', 'Numero NF'])
-            if col_nf_base:
-                return set(df_base[col_nf_base].apply(normalizar_nf))
-            return set()
-        except:
-            return set()
+        """Carrega o conjunto de NFs do histórico para exclusão (ConjuntoNF, chaves int64).
+
+        Planilha ilegível levanta ValueError: um histórico vazio faria NFs
+        já tratadas voltarem como novas.
+        """
+        if file_base is None: return ConjuntoNF()
+        with self.instrumentacao.etapa('histórico: leitura') as etapa:
+            try:
+                df_base = carregar_arquivo(file_base, colunas=self.projecao('historico'))
+                etapa.entrada(len(df_base))
+                col_nf_base = self.esquemas.resolver(df_base, 'historico')['nf']
+                nfs = ConjuntoNF.de_nfs(normalizar_nf_serie(df_base[col_nf_base])) if col_nf_base else ConjuntoNF()
+            except (ValueError, UnicodeDecodeError, pd.errors.ParserError, OSError) as e:
+                nome = getattr(file_base, 'name', 'histórico')
+                raise ValueError(f"Não foi possível ler a planilha de histórico '{nome}': {e}") from e
+            etapa.saida(len(nfs))
+            return nfs
 
     def tratar_sysemp(self, df):
         """Pipeline de limpeza da base Sysemp capturando UF, Marketplace e Transportadora."""
-        candidatas_empresa = [c for c in df.columns if 'EMPRESA' in c.upper()]
-        coluna_id_final = None
+        with self.instrumentacao.etapa('sysemp: tratamento', entrada=len(df)) as etapa:
+            df_novo, err = self._tratar_sysemp(df)
+            etapa.saida(len(df_novo))
+        return df_novo, err
 
-        for col in candidatas_empresa:
-            temp_series = pd.to_numeric(df[col], errors='coerce')
-            matches = temp_series.isin([16, 18, 19, 21]).sum()
-            if matches > 0:
-                coluna_id_final = col
-                break
+    @staticmethod
+    def _ids_empresa(serie):
+        """Máscara (np.ndarray) dos valores que são IDs de IDS_EMPRESA.
+
+        Só os valores distintos passam pelo pd.to_numeric (uma coluna
+        EMPRESA tem poucos); as linhas são marcadas por isin sobre eles.
+        """
+        distintos = pd.Series(pd.unique(serie.to_numpy()), dtype=object)
+        ids = distintos[pd.to_numeric(distintos, errors='coerce').isin(IDS_EMPRESA)]
+        if ids.empty:
+            return np.zeros(len(serie), dtype=bool)
+        return serie.isin(ids).to_numpy()
+
+    def _coluna_empresa(self, df, esquema):
+        """(coluna EMPRESA com IDs de empresa, máscara das linhas com esses IDs), ou (None, None).
+
+        Vale a 1ª candidata, na ordem do cabeçalho, com algum ID na coluna.
+        A escolha fica em esquema.decisoes para a leitura em blocos
+        (_carregar_sysemp) do mesmo layout.
+        """
+        for col in esquema.contendo('EMPRESA'):
+            mascara = self._ids_empresa(df[col])
+            if mascara.any():
+                esquema.decisoes['empresa'] = col
+                return col, mascara
+        return None, None
+
+    def _tratar_sysemp(self, df):
+        esquema = self.esquemas.resolver(df, 'sysemp')
+        # IDs convertidos uma vez e usados só como máscara: o DataFrame do
+        # chamador (base bruta do lookup de N° PEDIDO) não ganha colunas.
+        coluna_id_final, mascara = self._coluna_empresa(df, esquema)
 
         if not coluna_id_final:
             return pd.DataFrame(), "Coluna com IDs de empresa (16, 18, 19, 21) não encontrada no Sysemp."
 
-        df['temp_id'] = pd.to_numeric(df[coluna_id_final], errors='coerce')
-        df_filtrado = df[df['temp_id'].isin([16, 18, 19, 21])].copy()
+        df_filtrado = df[mascara]
 
         if df_filtrado.empty:
             return pd.DataFrame(), "Filtro de empresas (16, 18, 19, 21) resultou em base vazia."
 
         # Busca colunas essenciais no Sysemp
-        col_nf = encontrar_coluna(df_filtrado, ['Nota Fiscal', 'NF', 'Numero NF'])
-        col_uf = encontrar_coluna(df_filtrado, ['UF', 'Estado', 'Destinatário UF'])
-        col_mkt = encontrar_coluna(df_filtrado, ['Marketplace', 'Canal de Venda', 'Nome do Canal'])
-        col_chave = encontrar_coluna(df_filtrado, ['Chave NFe', 'Chave NF', 'Chave'])
-        col_transp = encontrar_coluna(df_filtrado, ['Transportadora', 'Transp', 'Nome Transportadora'])
+        col_nf = esquema['nf']
+        col_uf = esquema['uf']
+        col_mkt = esquema['marketplace']
+        col_chave = esquema['chave']
+        col_transp = esquema['transportadora']
 
         col_pedido_final = None
-        if 'Pedido Marketplace' in df_filtrado.columns:
+        if 'Pedido Marketplace' in esquema.cabecalho:
             col_pedido_final = 'Pedido Marketplace'
         else:
-            for col in df_filtrado.columns:
-                if "PEDIDO" in col.upper() and "MARKETPLACE" in col.upper():
-                    col_pedido_final = col
-                    break
+            col_pedido_final = next(iter(esquema.contendo('PEDIDO', 'MARKETPLACE')), None)
             if not col_pedido_final:
-                 col_pedido_final = encontrar_coluna(df_filtrado, ['Pedido'])
+                 col_pedido_final = esquema['pedido']
 
         df_novo = pd.DataFrame()
-        df_novo['Nota Fiscal'] = df_filtrado[col_nf].apply(normalizar_nf) if col_nf else []
+        df_novo['Nota Fiscal'] = normalizar_nf_serie(df_filtrado[col_nf]) if col_nf else []
         df_novo['Chave NF_sys'] = df_filtrado[col_chave].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '', case=False).str.strip() if col_chave else "N/A"
         df_novo['Pedido_sys'] = df_filtrado[col_pedido_final].astype(str).str.replace('.0', '', regex=False).str.replace('nan', '', case=False).str.strip() if col_pedido_final else "N/A"
-        df_novo['UF_sys'] = df_filtrado[col_uf].astype(str).str.upper().str.strip() if col_uf else "N/A"
-        df_novo['Marketplace_sys'] = df_filtrado[col_mkt].astype(str).str.upper().str.strip() if col_mkt else "VERIFICAR"
-        df_novo['Transportadora_sys'] = df_filtrado[col_transp].astype(str).str.strip() if col_transp else ""
+        # Colunas de poucos valores distintos saem como category.
+        transf = self.transformacoes
+        df_novo['UF_sys'] = transf.aplicar(df_filtrado[col_uf], 'maiusculo') if col_uf else "N/A"
+        df_novo['Marketplace_sys'] = transf.aplicar(df_filtrado[col_mkt], 'maiusculo') if col_mkt else "VERIFICAR"
+        df_novo['Transportadora_sys'] = transf.aplicar(df_filtrado[col_transp], 'texto') if col_transp else ""
 
         return df_novo, None
 
+    def projecao(self, *tipos):
+        """Função cabeçalho -> colunas usadas pelos fluxos `tipos`, para carregar_arquivo(colunas=...).
+
+        `tipos`: chaves de PAPEIS_ARQUIVO. Cada papel é resolvido no
+        cabeçalho pelo mesmo SchemaResolver que o motor usa — então o motor
+        encontra as mesmas colunas no arquivo projetado.
+        """
+        def _colunas(cabecalho):
+            usadas = set()
+            for tipo in tipos:
+                esquema = self.esquemas.resolver(cabecalho, tipo, acompanhar=False)
+                usadas |= esquema.usadas()
+                if tipo == 'sysemp':
+                    # Regras por substring de tratar_sysemp (coluna EMPRESA
+                    # e 'Pedido Marketplace' com outra grafia).
+                    usadas.update(esquema.contendo('EMPRESA'))
+                    usadas.update(esquema.contendo('PEDIDO', 'MARKETPLACE'))
+            return usadas
+        return _colunas
+
+    def nfs_da_origem(self, df_origem, tipo):
+        """
+        Conjunto de NFs normalizadas do arquivo de origem (Intelipost/E-mail).
+
+        Usado como filtro de semi-join em carregar_sysemp_em_blocos. Retorna
+        None quando a coluna de NF não é localizada — nesse caso o Sysemp é
+        carregado sem filtro e o motor do fluxo reporta o erro de coluna.
+        """
+        col_nf = self.esquemas.resolver(df_origem, tipo, acompanhar=False)['nf']
+        if not col_nf:
+            return None
+        return set(normalizar_nf_serie(df_origem[col_nf]))
+
+    def projetar_sysemp_bruto(self, df_sys_raw):
+        """Reduz o Sysemp bruto às colunas do lookup de N° PEDIDO (NF + Pedido Marketplace).
+
+        Retorna None quando alguma das duas não existe — o lookup é pulado.
+        """
+        esquema = self.esquemas.resolver(df_sys_raw, 'sysemp')
+        col_nf_full, col_pedido_full = esquema['nf'], esquema['pedido_marketplace']
+        if not (col_nf_full and col_pedido_full):
+            return None
+        return df_sys_raw[[col_nf_full, col_pedido_full]]
+
+    def filtrar_sysemp_por_nfs(self, df_sys_clean, df_sys_raw, nfs_filtro):
+        """Semi-join em memória das duas bases Sysemp com as NFs da origem.
+
+        Usado quando a base já está carregada (xlsx ou cache). Com
+        `nfs_filtro=None` devolve as bases sem alteração.
+        """
+        if nfs_filtro is None:
+            return df_sys_clean, df_sys_raw
+        with self.instrumentacao.etapa('sysemp: semi-join com a origem', entrada=len(df_sys_clean)) as etapa:
+            df_sys_clean = df_sys_clean[df_sys_clean['Nota Fiscal'].isin(nfs_filtro)]
+            if df_sys_raw is not None:
+                col_nf_raw = self.esquemas.resolver(df_sys_raw, 'sysemp_bruto')['nf']
+                if col_nf_raw:
+                    df_sys_raw = df_sys_raw[normalizar_nf_serie(df_sys_raw[col_nf_raw]).isin(nfs_filtro)]
+            etapa.saida(len(df_sys_clean))
+        return df_sys_clean, df_sys_raw
+
+    def indice_sysemp(self, df_sysemp, df_sys_raw=None, chave_acesso=False):
+        """SysempIndex das bases tratada e bruta (ver core.sysemp_index).
+
+        Os motores aceitam o índice no lugar do DataFrame tratado; quem roda
+        vários fluxos/origens contra o mesmo Sysemp constrói uma vez e repassa.
+        Se `df_sysemp` já é um índice, é devolvido como está.
+        `chave_acesso=True` monta também o índice por chave de acesso — para
+        o índice que vai ao cache, que mede o tamanho só ao guardar.
+        """
+        if df_sysemp is None or isinstance(df_sysemp, SysempIndex):
+            return df_sysemp
+        with self.instrumentacao.etapa('sysemp: índice', entrada=len(df_sysemp)) as etapa:
+            indice = SysempIndex(df_sysemp, df_sys_raw, chave_acesso=chave_acesso)
+            etapa.saida(len(indice.chaves))
+        return indice
+
+    def carregar_sysemp_em_blocos(self, file_sys, tamanho_bloco=TAMANHO_BLOCO_CSV, nfs_filtro=None):
+        """
+        Carrega e trata o Sysemp em streaming, sem materializar o arquivo bruto.
+
+        O CSV é lido em blocos de `tamanho_bloco` linhas e cada bloco é reduzido
+        na hora:
+            * base filtrada: só as linhas cujo ID (em alguma coluna EMPRESA)
+              está em IDS_EMPRESA — a coluna é a 1ª candidata com algum
+              match no arquivo; num layout conhecido, as candidatas depois
+              da lembrada (ver _coluna_empresa) nem são convertidas;
+            * base bruta: só as colunas de NF e 'Pedido Marketplace', usadas
+              pelo lookup de N° PEDIDO da Validação.
+        O pico de memória fica proporcional à saída filtrada, não ao arquivo.
+        Planilhas xlsx não têm leitura em blocos e caem no carregamento normal.
+        Nos dois casos só as colunas de projecao('sysemp') são parseadas.
+
+        Semi-join: com `nfs_filtro` (ver nfs_da_origem), só são mantidas as
+        linhas cuja NF normalizada está no conjunto — nas duas bases. Como
+        todos os fluxos cruzam por NF com left join a partir da origem, as
+        demais linhas nunca casariam. A detecção da coluna EMPRESA continua
+        olhando o arquivo inteiro, então a escolha não muda com o filtro.
+
+        Retorno: ((df_sysemp_tratado, df_sys_raw), erro_str_ou_None)
+        """
+        with self.instrumentacao.etapa('sysemp: leitura') as etapa:
+            (df_sys_clean, df_sys_raw), err = self._carregar_sysemp(file_sys, tamanho_bloco, nfs_filtro)
+            etapa.saida(len(df_sys_clean))
+        return (df_sys_clean, df_sys_raw), err
+
+    def _carregar_sysemp(self, file_sys, tamanho_bloco, nfs_filtro):
+        projecao = self.projecao('sysemp')
+        if not file_sys.name.endswith('.csv'):
+            df_sys_raw = carregar_arquivo(file_sys, colunas=projecao)
+            df_sys_clean, err = self.tratar_sysemp(df_sys_raw)
+            df_sys_raw = self.projetar_sysemp_bruto(df_sys_raw)
+            if not err:
+                df_sys_clean, df_sys_raw = self.filtrar_sysemp_por_nfs(df_sys_clean, df_sys_raw, nfs_filtro)
+            return (df_sys_clean, df_sys_raw), err
+
+        candidatas = None
+        lembrada = None         # coluna EMPRESA já escolhida para este layout
+        com_match = {}          # coluna EMPRESA -> teve algum ID valido no arquivo
+        blocos_filtrados = []   # (bloco_reduzido, {coluna: mascara})
+        blocos_brutos = []
+        col_nf_full = col_pedido_full = None
+
+        # Só as colunas que tratar_sysemp e o lookup bruto usam são parseadas.
+        cabecalho = ler_cabecalho(file_sys)
+        usadas = projecao(cabecalho)
+        usecols = [c for c in cabecalho if c in usadas] or None
+
+        for bloco in ler_csv_em_blocos(file_sys, tamanho_bloco, usecols=usecols):
+            if candidatas is None:
+                esquema = self.esquemas.resolver(bloco, 'sysemp')
+                candidatas = esquema.contendo('EMPRESA')
+                lembrada = esquema.decisoes.get('empresa')
+                if lembrada in candidatas:
+                    # Layout conhecido: as candidatas depois da lembrada só
+                    # contam se nenhuma até ela tiver ID neste arquivo.
+                    candidatas = candidatas[:candidatas.index(lembrada) + 1]
+                com_match = dict.fromkeys(candidatas, False)
+                col_nf_full, col_pedido_full = esquema['nf'], esquema['pedido_marketplace']
+
+            if nfs_filtro is not None and col_nf_full:
+                na_origem = normalizar_nf_serie(bloco[col_nf_full]).isin(nfs_filtro).to_numpy()
+            else:
+                na_origem = np.ones(len(bloco), dtype=bool)
+
+            if col_nf_full and col_pedido_full:
+                blocos_brutos.append(bloco.loc[na_origem, [col_nf_full, col_pedido_full]])
+
+            # A deteccao da coluna EMPRESA olha o bloco inteiro; o semi-join
+            # so decide quais linhas sao guardadas.
+            mascaras = {c: self._ids_empresa(bloco[c]) for c in candidatas}
+            if not mascaras:
+                continue
+            for c, m in mascaras.items():
+                com_match[c] = com_match[c] or bool(m.any())
+            guardar = np.logical_or.reduce(list(mascaras.values())) & na_origem
+            if guardar.any():
+                blocos_filtrados.append((
+                    bloco[guardar],
+                    {c: m[guardar] for c, m in mascaras.items()},
+                ))
+
+        df_sys_raw = pd.concat(blocos_brutos, ignore_index=True) if blocos_brutos else None
+
+        coluna_id_final = next((c for c in candidatas or [] if com_match[c]), None)
+        if not coluna_id_final and lembrada in (candidatas or []):
+            # Nenhuma até a lembrada teve ID neste arquivo: refaz com todas.
+            esquema.decisoes.pop('empresa', None)
+            file_sys.seek(0)
+            return self._carregar_sysemp(file_sys, tamanho_bloco, nfs_filtro)
+        if not coluna_id_final:
+            return (pd.DataFrame(), df_sys_raw), "Coluna com IDs de empresa (16, 18, 19, 21) não encontrada no Sysemp."
+        # tratar_sysemp (abaixo) usa a mesma coluna, sem refazer a busca.
+        esquema.decisoes['empresa'] = coluna_id_final
+
+        partes = [b[m[coluna_id_final]] for b, m in blocos_filtrados]
+        partes = [p for p in partes if not p.empty]
+        if not partes:
+            # Nenhuma NF da origem existe no Sysemp filtrado: base vazia, mas
+            # com o schema de tratar_sysemp para os merges seguirem normalmente.
+            return (pd.DataFrame(columns=COLUNAS_SYSEMP_TRATADO), df_sys_raw), None
+
+        df_sys_clean, err = self.tratar_sysemp(pd.concat(partes, ignore_index=True))
+        return (df_sys_clean, df_sys_raw), err
+
     # --------------------------------------------------------------------- #
     # Lógica compartilhada (Intelipost / E-mail)
     # --------------------------------------------------------------------- #
@@ -174,66 +465,94 @@ class DataProcessor:
         s = str(val).strip().upper()
         return self.dict_mkt_norm.get(s, str(val))
 
+    @staticmethod
+    def _projetar(df, colunas):
+        """`df` só com as `colunas` (na ordem dele), sem copiar os dados.
+
+        Evita a cópia do subconjunto de colunas que `df[lista]` faz no
+        pandas 2 (a requirements aceita 2.x; no 3, as duas formas não
+        copiam): a cópia rasa compartilha os arrays do chamador e perde as
+        demais colunas por `del`. Os motores só substituem colunas inteiras
+        (`df[col] = ...`), nunca escrevem dentro delas, então o DataFrame do
+        chamador não muda. Filtros e merges materializam só o que o fluxo lê
+        ou leva à saída, não as ~80 colunas do export.
+        """
+        projecao = df.copy(deep=False)
+        for col in df.columns.unique():
+            if col not in colunas:
+                del projecao[col]
+        return projecao
+
     def _aplicar_merge_e_filtros(self, df_entrada, df_sysemp, nfs_historico, prioritario_sysemp=False, converter_ocorrencia=True):
         """Lógica comum de merge e padronização final."""
-        df_merged = pd.merge(df_entrada, df_sysemp, on='Nota Fiscal', how='left')
-
-        # Normalização de Chave e Pedido (Sempre do Sysemp)
-        df_merged['Pedido'] = df_merged['Pedido_sys'].fillna("N/A") if 'Pedido_sys' in df_merged.columns else "N/A"
-        df_merged['Chave NF'] = df_merged['Chave NF_sys'].fillna("N/A") if 'Chave NF_sys' in df_merged.columns else "N/A"
-
-        # Lógica de UF e Marketplace (Diferenciada por fluxo)
-        if prioritario_sysemp:
-            df_merged['UF'] = df_merged['UF_sys'].fillna("N/A")
-            df_merged['Marketplace Raw'] = df_merged['Marketplace_sys'].fillna("VERIFICAR")
-        else:
-            if 'UF' not in df_merged.columns:
-                df_merged['UF'] = df_merged['UF_sys'].fillna("N/A")
-
-            if 'Marketplace' in df_merged.columns:
-                df_merged['Marketplace Raw'] = df_merged['Marketplace']
-            else:
-                df_merged['Marketplace Raw'] = df_merged['Marketplace_sys'].fillna("VERIFICAR")
-
-        # Aplicar Dicionários no Marketplace
-        df_merged['Marketplace Final'] = df_merged['Marketplace Raw'].apply(self._corrigir_mkt)
-
-        # Padronização de Transportadora
-        if 'Transportadora' in df_merged.columns:
-            transp_upper = df_merged['Transportadora'].astype(str).str.upper().str.strip()
-            df_merged['Transportadora'] = transp_upper.map(self.dict_transp_norm).fillna(transp_upper)
-
-        # Padronização de Ocorrência (Opcional por fluxo)
-        if 'Ocorrência de Entrega' in df_merged.columns:
-            ocorr_upper = df_merged['Ocorrência de Entrega'].astype(str).str.upper().str.strip()
-            if converter_ocorrencia:
-                df_merged['Ocorrência de Entrega'] = ocorr_upper.map(self.dict_ocorr_norm).fillna(ocorr_upper)
+        instr = self.instrumentacao
+        indice = self.indice_sysemp(df_sysemp)
+        with instr.etapa('merge Sysemp (NF)', entrada=len(df_entrada)) as etapa:
+            # Chave int64 da NF ao lado do texto: o merge e a exclusão por
+            # histórico comparam inteiros; a coluna não vai para a saída.
+            df_entrada = df_entrada.assign(_NF_CHAVE=chave_nf_serie(df_entrada['Nota Fiscal']))
+            df_merged = indice.juntar(df_entrada, chaves=df_entrada['_NF_CHAVE'].to_numpy())
+
+            # Normalização de Chave e Pedido (Sempre do Sysemp)
+            df_merged['Pedido'] = df_merged['Pedido_sys'].fillna("N/A") if 'Pedido_sys' in df_merged.columns else "N/A"
+            df_merged['Chave NF'] = df_merged['Chave NF_sys'].fillna("N/A") if 'Chave NF_sys' in df_merged.columns else "N/A"
+
+            # Lógica de UF e Marketplace (Diferenciada por fluxo)
+            if prioritario_sysemp:
+                df_merged['UF'] = preencher_nulos(df_merged['UF_sys'], "N/A")
+                df_merged['Marketplace Raw'] = preencher_nulos(df_merged['Marketplace_sys'], "VERIFICAR")
             else:
-                # No fluxo de e-mail, mantém o texto original mas garante que está em MAIÚSCULO
-                df_merged['Ocorrência de Entrega'] = ocorr_upper.replace('NAN', 'VERIFICAR').fillna("VERIFICAR")
-
-        df_merged['Data Tratativa'] = datetime.now().strftime('%d/%m/%Y')
+                if 'UF' not in df_merged.columns:
+                    df_merged['UF'] = preencher_nulos(df_merged['UF_sys'], "N/A")
+
+                if 'Marketplace' in df_merged.columns:
+                    df_merged['Marketplace Raw'] = df_merged['Marketplace']
+                else:
+                    df_merged['Marketplace Raw'] = preencher_nulos(df_merged['Marketplace_sys'], "VERIFICAR")
+            etapa.saida(len(df_merged))
+
+        with instr.etapa('canonicalização (mkt, transp., ocorrência)', entrada=len(df_merged)):
+            # Dicionários aplicados por categoria (poucos valores distintos),
+            # não por linha; as colunas saem como category.
+            # Aplicar Dicionários no Marketplace
+            df_merged['Marketplace Final'] = self.transformacoes.aplicar(df_merged['Marketplace Raw'], 'marketplace')
+
+            # Padronização de Transportadora
+            if 'Transportadora' in df_merged.columns:
+                df_merged['Transportadora'] = self._normalizar_transp(df_merged['Transportadora'])
+
+            # Padronização de Ocorrência (Opcional por fluxo). No fluxo de
+            # e-mail, mantém o texto original mas garante que está em MAIÚSCULO.
+            if 'Ocorrência de Entrega' in df_merged.columns:
+                df_merged['Ocorrência de Entrega'] = self.transformacoes.aplicar(
+                    df_merged['Ocorrência de Entrega'],
+                    'ocorrencia' if converter_ocorrencia else 'ocorrencia_email',
+                )
 
-        # Separação por Histórico
-        mask_exclusao = df_merged['Nota Fiscal'].isin(nfs_historico)
-        df_final = df_merged[~mask_exclusao].copy()
-        df_removidas = df_merged[mask_exclusao].copy()
+            df_merged['Data Tratativa'] = datetime.now().strftime('%d/%m/%Y')
 
-        # Ajuste Final de Colunas
-        for df in [df_final, df_removidas]:
+        with instr.etapa('divisão pelo histórico', entrada=len(df_merged)) as etapa:
+            # Separação por Histórico
+            mask_exclusao = self._mascara_historico(
+                df_merged['Nota Fiscal'], nfs_historico, chaves=df_merged['_NF_CHAVE'].to_numpy()
+            )
+            # Ajuste Final de Colunas (uma vez, antes da divisão)
             for c in FINAL_COLUMNS:
-                if c not in df.columns: df[c] = ""
-            if 'Marketplace Final' in df.columns:
-                df['Marketplace'] = df['Marketplace Final']
+                if c not in df_merged.columns: df_merged[c] = ""
+            df_merged['Marketplace'] = df_merged['Marketplace Final']
+            saida = df_merged[FINAL_COLUMNS]
+            mask_exclusao = mask_exclusao.to_numpy()
+            etapa.saida(int((~mask_exclusao).sum()))
 
-        return df_final[FINAL_COLUMNS], df_removidas[FINAL_COLUMNS]
+        return saida.iloc[np.flatnonzero(~mask_exclusao)], saida.iloc[np.flatnonzero(mask_exclusao)]
 
     def processar_intelipost(self, df_inteli, df_sysemp, nfs_historico):
         """Motor específico para fluxo Intelipost (Prioriza dados do arquivo Intelipost)."""
-        col_mkt = encontrar_coluna(df_inteli, ['Canal de Vendas', 'Marketplace'])
-        col_micro = encontrar_coluna(df_inteli, ['MicroStatus', 'Ocorrência de Entrega', 'Status'])
-        col_nf = encontrar_coluna(df_inteli, ['Nota Fiscal', 'NF', 'Pedido do Cliente'])
-        col_uf = encontrar_coluna(df_inteli, ['UF', 'Estado'])
+        esquema = self.esquemas.resolver(df_inteli, 'intelipost')
+        col_mkt = esquema['marketplace']
+        col_micro = esquema['ocorrencia']
+        col_nf = esquema['nf']
+        col_uf = esquema['uf']
 
         if col_mkt: df_inteli = df_inteli.rename(columns={col_mkt: 'Marketplace'})
         if col_micro: df_inteli = df_inteli.rename(columns={col_micro: 'Ocorrência de Entrega'})
@@ -242,20 +561,26 @@ class DataProcessor:
 
         if 'Nota Fiscal' not in df_inteli.columns:
             return (None, None), "Coluna 'Nota Fiscal' não identificada no arquivo Intelipost."
+        df_inteli = self._projetar(df_inteli, FINAL_COLUMNS)
 
-        df_inteli['Nota Fiscal'] = df_inteli['Nota Fiscal'].apply(normalizar_nf)
+        with self.instrumentacao.etapa('normalização NF + filtro de ocorrência', entrada=len(df_inteli)) as etapa:
+            df_inteli['Nota Fiscal'] = normalizar_nf_serie(df_inteli['Nota Fiscal'])
 
-        if 'Ocorrência de Entrega' in df_inteli.columns:
-            df_inteli['Ocorrência de Entrega'] = df_inteli['Ocorrência de Entrega'].astype(str).str.upper()
-            df_inteli = df_inteli[~df_inteli['Ocorrência de Entrega'].str.contains("ATRASO|INFORMATIVO", na=False)]
+            if 'Ocorrência de Entrega' in df_inteli.columns:
+                df_inteli['Ocorrência de Entrega'] = self.transformacoes.aplicar(
+                    df_inteli['Ocorrência de Entrega'], 'maiusculo_sem_strip'
+                )
+                df_inteli = df_inteli[~df_inteli['Ocorrência de Entrega'].str.contains("ATRASO|INFORMATIVO", na=False)]
+            etapa.saida(len(df_inteli))
 
         return self._aplicar_merge_e_filtros(df_inteli, df_sysemp, nfs_historico, prioritario_sysemp=False), None
 
     def processar_email(self, df_email, df_sysemp, nfs_historico):
         """Motor específico para fluxo E-mail (Puxa UF e Marketplace do Sysemp)."""
-        col_nf = encontrar_coluna(df_email, ['NOTA FISCAL', 'NF', 'NÚMERO'])
-        col_transp = encontrar_coluna(df_email, ['TRANSPORTADORA', 'TRANSP'])
-        col_ocorr = encontrar_coluna(df_email, ['OCORRÊNCIA', 'OCORRENCIA', 'STATUS'])
+        esquema = self.esquemas.resolver(df_email, 'email')
+        col_nf = esquema['nf']
+        col_transp = esquema['transportadora']
+        col_ocorr = esquema['ocorrencia']
 
         if not all([col_nf, col_transp, col_ocorr]):
             return (None, None), "Colunas obrigatórias (NF, Transportadora, Ocorrência) não encontradas."
@@ -265,20 +590,136 @@ class DataProcessor:
             col_transp: 'Transportadora',
             col_ocorr: 'Ocorrência de Entrega'
         })
+        df_email = self._projetar(df_email, FINAL_COLUMNS)
 
-        df_email['Nota Fiscal'] = df_email['Nota Fiscal'].apply(normalizar_nf)
+        with self.instrumentacao.etapa('normalização NF', entrada=len(df_email)):
+            df_email['Nota Fiscal'] = normalizar_nf_serie(df_email['Nota Fiscal'])
 
         # Seta a flag prioritario_sysemp=True para puxar UF e Mkt da base Sysemp
         # Seta converter_ocorrencia=False para manter o texto original da planilha de e-mail
         return self._aplicar_merge_e_filtros(df_email, df_sysemp, nfs_historico, prioritario_sysemp=True, converter_ocorrencia=False), None
 
+    def processar_fluxo(self, tipo, df_origem, df_sysemp, nfs_historico, por_chave_acesso=False):
+        """
+        Roda o fluxo `tipo` do app: 'intelipost', 'email', 'validacao'
+        (Atraso), 'prevencao' ou 'atraso_prevencao' (os dois de uma vez).
+
+        Retorno: ({fluxo_de_saida: (df_final, df_removidas)}, erro_str_ou_None)
+        — 'atraso_prevencao' devolve 'validacao' e 'prevencao'.
+        """
+        if tipo == 'atraso_prevencao':
+            por_modo, err = self.processar_validacao_multimodo(
+                df_origem, df_sysemp, nfs_historico, por_chave_acesso=por_chave_acesso
+            )
+            if err:
+                return {}, err
+            return {'validacao': por_modo['atraso'], 'prevencao': por_modo['prevencao']}, None
+        if tipo == 'intelipost':
+            par, err = self.processar_intelipost(df_origem, df_sysemp, nfs_historico)
+        elif tipo == 'email':
+            par, err = self.processar_email(df_origem, df_sysemp, nfs_historico)
+        elif tipo in ('validacao', 'prevencao'):
+            par, err = self.processar_validacao_transportadora(
+                df_origem, df_sysemp, nfs_historico,
+                modo='atraso' if tipo == 'validacao' else 'prevencao', por_chave_acesso=por_chave_acesso,
+            )
+        else:
+            return {}, f"Fluxo desconhecido: {tipo}"
+        return ({}, err) if err else ({tipo: par}, None)
+
     # --------------------------------------------------------------------- #
     # NOVO MÓDULO — Validação de Transportadora
     # --------------------------------------------------------------------- #
-    def processar_validacao_transportadora(self, df_inteli, df_sysemp, nfs_historico, df_sys_raw=None, modo='atraso'):
+    def processar_validacao_transportadora(self, df_inteli, df_sysemp, nfs_historico, df_sys_raw=None, modo='atraso',
+                                           por_chave_acesso=False):
         """
         Motor do fluxo "Validação de Transportadora".
 
+        ETAPAS 1 a 3 — ver _validacao_base (e `por_chave_acesso` lá).
+        ETAPA 4/5    — janela de DATA PREVISTA e colunas finais do `modo`
+                       (ver MODOS_VALIDACAO e _aplicar_modo).
+
+        Retorno: ((df_final, df_descartadas), erro_str_ou_None)
+        """
+        hoje = datetime.now(TZ_BR).date()
+        base, err = self._validacao_base(df_inteli, df_sysemp, nfs_historico, df_sys_raw, por_chave_acesso,
+                                         modos=[modo], hoje=hoje)
+        if err:
+            return (None, None), err
+        return self._aplicar_modo(base, modo, hoje), None
+
+    def processar_validacao_multimodo(self, df_inteli, df_sysemp, nfs_historico, df_sys_raw=None,
+                                      modos=('atraso', 'prevencao'), por_chave_acesso=False):
+        """
+        Executa as ETAPAS 1 a 3 uma única vez e aplica a janela de cada modo.
+
+        Equivale a chamar processar_validacao_transportadora uma vez por modo,
+        mas mapeamento de colunas, histórico, merges com o Sysemp,
+        canonicalização de transportadora e formatação de datas são feitos
+        só uma vez — para as linhas dentro da janela de algum dos `modos`.
+
+        Retorno: ({modo: (df_final, df_descartadas)}, erro_str_ou_None)
+        """
+        hoje = datetime.now(TZ_BR).date()
+        base, err = self._validacao_base(df_inteli, df_sysemp, nfs_historico, df_sys_raw, por_chave_acesso,
+                                         modos=modos, hoje=hoje)
+        if err:
+            return {}, err
+        return {modo: self._aplicar_modo(base, modo, hoje) for modo in modos}, None
+
+    def _aplicar_modo(self, base, modo, hoje):
+        """
+        ETAPA 4 — Filtra DATA PREVISTA pela janela do modo (data de hoje em BRT).
+                   Usa a data tipada do motor de datas; linhas com DATA
+                   PREVISTA invalida (NaT) sao descartadas. Com a janela
+                   já aplicada em _validacao_base, só separa os modos.
+        ETAPA 5 — Renomeia/seleciona as colunas finais do modo, se houver.
+
+        Modos desconhecidos seguem a regra de 'atraso' (comportamento antigo).
+        """
+        spec = MODOS_VALIDACAO.get(modo, MODOS_VALIDACAO['atraso'])
+        tabela, historico = base['saida'], base['historico']
+        saida = []
+        with self.instrumentacao.etapa(f'filtro de DATA PREVISTA ({modo})', entrada=len(tabela)) as etapa:
+            na_janela = np.asarray(spec['janela'](base['datas'], pd.Timestamp(hoje)), dtype=bool)
+            pos_validas = np.flatnonzero(na_janela & ~historico)
+            pos_descartadas = np.flatnonzero(na_janela & historico)
+            for df in (tabela.iloc[pos_validas].set_axis(pd.Index(base['indice_validas'][pos_validas])),
+                       tabela.iloc[pos_descartadas]):
+                # Categorias só dos valores da aba: a saída não depende de
+                # quais modos foram calculados juntos (multimodo).
+                df = df.assign(**{c: df[c].cat.remove_unused_categories() for c in df.columns if eh_categoria(df[c])})
+                if spec['colunas']:
+                    if df.empty:
+                        df = pd.DataFrame(columns=spec['colunas'])
+                    else:
+                        df = df.rename(columns=spec['renomear'])[spec['colunas']]
+                saida.append(df)
+            etapa.saida(len(saida[0]))
+        return tuple(saida)
+
+    @staticmethod
+    def _janela_modos(datas, modos, hoje):
+        """Máscara (np.ndarray) das DATAS PREVISTAS dentro da janela de algum dos `modos`."""
+        mascara = np.zeros(len(datas), dtype=bool)
+        for modo in modos:
+            spec = MODOS_VALIDACAO.get(modo, MODOS_VALIDACAO['atraso'])
+            mascara |= np.asarray(spec['janela'](datas, pd.Timestamp(hoje)), dtype=bool)
+        return mascara
+
+    def _validacao_base(self, df_inteli, df_sysemp, nfs_historico, df_sys_raw=None, por_chave_acesso=False,
+                        modos=None, hoje=None):
+        """
+        Parte da Validação de Transportadora comum a todos os modos.
+
+        Plano — A DATA PREVISTA tipada (com a troca de coluna da SHOPEE) é
+                   calculada primeiro e, com `modos`, as linhas fora da
+                   janela de todos eles (data de `hoje`) saem antes do
+                   histórico, dos merges e da formatação. Elas seriam
+                   descartadas na ETAPA 4 de qualquer forma: o resultado
+                   (linhas, valores e índice) é o mesmo de rodar tudo e
+                   filtrar no fim. Sem `modos`, nenhuma linha sai.
+
         ETAPA 1 — Cruza Intelipost x Histórico/NFs em tratamento por 'Nota Fiscal'.
                    Linhas presentes no histórico são DESCARTADAS.
         ETAPA 2 — Cruza Intelipost x Sysemp pela NOTA FISCAL (chave mais
@@ -292,6 +733,9 @@ class DataProcessor:
                        match + iguais (após dict)     -> usa canonical, STATUS = 'Verdadeiro'
                        match + diferentes (após dict) -> usa Sysemp,    STATUS = 'Falso'
                        sem match                      -> mantém Intelipost, STATUS = 'Não Localizado'
+                   Com `por_chave_acesso`, linhas cuja NF não está no Sysemp
+                   ou aparece nele mais de uma vez casam pela CHAVE DA NF
+                   (44 dígitos, DV conferido) quando ela existe no Sysemp.
         ETAPA 3 — Monta planilha final na ordem fixa de FINAL_COLUMNS_VALIDACAO.
                    DATA PEDIDO e DATA PREVISTA são exportadas SEM hora.
                    Detecção de SHOPEE é por substring (canal contém 'SHOPEE').
@@ -299,32 +743,37 @@ class DataProcessor:
                    ('Previsão Entrega Transp. Original'); demais canais usam
                    'Previsão Entrega Cliente Original'.
 
-        Retorno: ((df_final, df_descartadas), erro_str_ou_None)
+        `df_sysemp` pode ser o DataFrame tratado ou um SysempIndex (que já
+        traz a base bruta — `df_sys_raw` é ignorado nesse caso).
+
+        Retorno: (base, erro_str_ou_None), onde base é um dict com
+            'saida'          -> DataFrame em FINAL_COLUMNS_VALIDACAO, válidas e
+                                descartadas juntas (índice do arquivo de origem)
+            'datas'          -> DATA PREVISTA tipada de cada linha
+            'historico'      -> máscara (np.ndarray) das descartadas pelo histórico
+            'indice_validas' -> posição de cada linha entre as não descartadas
+        _aplicar_modo separa as duas abas: o índice da aba principal é a
+        posição entre as não descartadas; o das descartadas, o da origem.
         """
         if df_inteli is None or df_inteli.empty:
-            return (None, None), "Arquivo Intelipost vazio ou inválido."
-        if df_sysemp is None or df_sysemp.empty:
-            return (None, None), "Base Sysemp tratada está vazia. Verifique IDs de empresa (16, 18, 19, 21)."
-
-        df = df_inteli.copy()
+            return None, "Arquivo Intelipost vazio ou inválido."
+        # Base sem colunas = tratar_sysemp falhou. Base com schema e sem
+        # linhas e valida: o semi-join nao achou nenhuma NF da origem.
+        if df_sysemp is None or (isinstance(df_sysemp, pd.DataFrame) and 'Nota Fiscal' not in df_sysemp.columns):
+            return None, "Base Sysemp tratada está vazia. Verifique IDs de empresa (16, 18, 19, 21)."
 
         # ----- Mapeamento de colunas Intelipost ---------------------------- #
-        col_data_criacao = encontrar_coluna(df, ['Data Criação', 'Data Criacao', 'Data de Criação', 'Data de Criacao'])
-        col_previsao     = encontrar_coluna(df, [
-            'Previsão Entrega Cliente Original', 'Previsao Entrega Cliente Original',
-            'Previsão Entrega', 'Previsao Entrega', 'Data Prevista'
-        ])
-        col_previsao_shopee = encontrar_coluna(df, [
-            'Previsão Entrega Transp. Original', 'Previsao Entrega Transp. Original',
-            'Previsão Entrega Transp Original', 'Previsao Entrega Transp Original',
-        ])
-        col_uf           = encontrar_coluna(df, ['UF', 'Estado'])
-        col_transp       = encontrar_coluna(df, ['Transportadora', 'Transp'])
-        col_pedido_inte  = encontrar_coluna(df, ['Pedido', 'Pedido Intelipost', 'Pedido ID'])
-        col_chave_nf     = encontrar_coluna(df, ['Chave da Nota', 'Chave NF', 'Chave da NF', 'Chave NFe'])
-        col_canal        = encontrar_coluna(df, ['Canal de Vendas', 'Canal de Venda'])
-        col_num_pedido   = encontrar_coluna(df, ['marketplace', 'Marketplace', 'Pedido Marketplace', 'N° Pedido', 'Nº Pedido'])
-        col_nf           = encontrar_coluna(df, ['Nota Fiscal', 'NF', 'Numero NF'])
+        esquema = self.esquemas.resolver(df_inteli, 'validacao')
+        col_data_criacao    = esquema['data_criacao']
+        col_previsao        = esquema['previsao']
+        col_previsao_shopee = esquema['previsao_shopee']
+        col_uf           = esquema['uf']
+        col_transp       = esquema['transportadora']
+        col_pedido_inte  = esquema['pedido']
+        col_chave_nf     = esquema['chave_nf']
+        col_canal        = esquema['canal']
+        col_num_pedido   = esquema['num_pedido']
+        col_nf           = esquema['nf']
 
         # ----- Validações obrigatórias ------------------------------------- #
         # col_num_pedido nao eh mais obrigatorio: o merge eh por NF.
@@ -333,42 +782,84 @@ class DataProcessor:
         if not col_nf:           faltando.append("Nota Fiscal")
         if not col_transp:       faltando.append("Transportadora")
         if faltando:
-            return (None, None), (
+            return None, (
                 "Colunas obrigatórias não localizadas no Intelipost: "
                 + ", ".join(faltando)
             )
 
+        instr = self.instrumentacao
+        # Só as colunas dos papéis, sem cópia (ver _projetar): as auxiliares
+        # abaixo não alteram o DataFrame do chamador e o corte da janela
+        # materializa só estas colunas.
+        df = self._projetar(df_inteli, esquema.usadas())
+
+        # ----- Plano — DATA PREVISTA e janela dos modos -------------------- #
+        # DATA PREVISTA por canal: SHOPEE usa 'Previsão Entrega Transp. Original';
+        # demais canais usam 'Previsão Entrega Cliente Original'.
+        # Detecção de Shopee é por substring (canal contém 'SHOPEE').
+        with instr.etapa('DATA PREVISTA + janela dos modos', entrada=len(df)) as etapa:
+            canal_upper = self._fmt_col(df, col_canal, maiusculo=True)
+            eh_shopee   = canal_upper.str.contains('SHOPEE', na=False, regex=False)
+            previsao_geral,  previsao_geral_dt  = self._datas_br(df, col_previsao)
+            previsao_shopee, previsao_shopee_dt = self._datas_br(df, col_previsao_shopee)
+            data_prevista    = previsao_geral.where(~eh_shopee, previsao_shopee)
+            data_prevista_dt = previsao_geral_dt.where(~eh_shopee, previsao_shopee_dt)
+            if modos is None:
+                na_janela = np.ones(len(df), dtype=bool)
+            else:
+                na_janela = self._janela_modos(data_prevista_dt, modos, hoje or datetime.now(TZ_BR).date())
+            etapa.saida(int(na_janela.sum()))
+
         # ----- Normalizações ----------------------------------------------- #
-        df['_NF_NORM']     = df[col_nf].apply(normalizar_nf)
-        df['_PEDIDO_NORM'] = df[col_num_pedido].apply(self._normalizar_pedido) if col_num_pedido else ""
+        # A NF de todas as linhas ainda é necessária: o índice das válidas
+        # conta as válidas de fora da janela (ver Retorno).
+        with instr.etapa('normalização NF/pedido', entrada=len(df)):
+            df['_NF_NORM']     = normalizar_nf_serie(df[col_nf])
+            df['_NF_CHAVE']    = chave_nf_serie(df['_NF_NORM'])
 
         # ----- ETAPA 1 — Filtro pelo histórico ----------------------------- #
-        if not isinstance(nfs_historico, set):
-            nfs_historico = set(nfs_historico) if nfs_historico else set()
-
-        mask_hist = df['_NF_NORM'].isin(nfs_historico) if nfs_historico else pd.Series(False, index=df.index)
-        df_descartadas_raw = df[mask_hist].copy()
-        df_validas         = df[~mask_hist].copy()
+        with instr.etapa('divisão pelo histórico', entrada=len(df)) as etapa:
+            mask_hist = self._mascara_historico(
+                df['_NF_NORM'], nfs_historico, chaves=df['_NF_CHAVE'].to_numpy()
+            ).to_numpy()
+            posicao_valida = np.cumsum(~mask_hist) - 1
+            etapa.saida(int((~mask_hist).sum()))
+            df = df[na_janela]
+            canal_upper, data_prevista, data_prevista_dt = (
+                s[na_janela] for s in (canal_upper, data_prevista, data_prevista_dt)
+            )
+            historico, posicao_valida = mask_hist[na_janela], posicao_valida[na_janela]
+            df['_PEDIDO_NORM'] = normalizar_pedido_serie(df[col_num_pedido]) if col_num_pedido else ""
+            # Uma tabela só: o histórico é uma marca por linha. As etapas 2 e
+            # 3 tomam as posições de cada grupo; a saída só se divide no fim.
+            pos_validas     = np.flatnonzero(~historico)
+            pos_descartadas = np.flatnonzero(historico)
 
         # ----- ETAPA 2 — Cruzamento Sysemp por NOTA FISCAL + validação ----- #
-        # Renomeia 'Nota Fiscal' do Sysemp para '_NF_SYS_KEY' para evitar
-        # colisao com a coluna do Intelipost no merge.
-        df_sysemp_lookup = (
-            df_sysemp[['Nota Fiscal', 'Pedido_sys', 'Transportadora_sys']]
-            .copy()
-            .rename(columns={'Nota Fiscal': '_NF_SYS_KEY'})
-            .assign(Pedido_sys=lambda x: x['Pedido_sys'].apply(self._normalizar_pedido))
-        )
-        df_sysemp_lookup = df_sysemp_lookup[df_sysemp_lookup['_NF_SYS_KEY'] != ""]
-        df_sysemp_lookup = df_sysemp_lookup.drop_duplicates(subset='_NF_SYS_KEY', keep='first')
-
-        df_merged = pd.merge(
-            df_validas,
-            df_sysemp_lookup,
-            left_on='_NF_NORM',
-            right_on='_NF_SYS_KEY',
-            how='left'
-        )
+        indice = self.indice_sysemp(df_sysemp, df_sys_raw)
+        with instr.etapa('merge Sysemp (NF)', entrada=len(pos_validas)) as etapa:
+            # 1ª linha do Sysemp de cada NF (NF vazia não casa), com o pedido
+            # já normalizado no índice. Só as válidas cruzam com o Sysemp.
+            chaves_validas = df['_NF_CHAVE'].to_numpy()[pos_validas]
+            linhas_sys = indice.primeira_linha(chaves_validas)
+            etapa.saida(len(pos_validas))
+        casadas_por_chave = np.zeros(len(pos_validas), dtype=bool)
+
+        if por_chave_acesso and col_chave_nf:
+            # NF ausente ou repetida no Sysemp (séries/emitentes diferentes):
+            # a chave de acesso identifica a nota exata.
+            pendentes = np.flatnonzero((linhas_sys < 0) | (indice.ocorrencias(chaves_validas) > 1))
+            with instr.etapa('merge Sysemp (chave de acesso)', entrada=len(pendentes)) as etapa:
+                por_chave = indice.linha_por_chave_acesso(df[col_chave_nf].iloc[pos_validas[pendentes]])
+                casou = por_chave >= 0
+                linhas_sys[pendentes[casou]] = por_chave[casou]
+                casadas_por_chave[pendentes[casou]] = True
+                etapa.saida(int(casou.sum()))
+
+        do_sysemp = {
+            nome: pd.Series(valores)
+            for nome, valores in indice.colunas(linhas_sys, ['Pedido_sys', 'Transportadora_sys']).items()
+        }
 
         # Lookup adicional de N° PEDIDO contra o Sysemp BRUTO (sem o filtro
         # de empresa de tratar_sysemp). Necessario porque pedidos B2B/TIKTOK
@@ -376,248 +867,141 @@ class DataProcessor:
         # NF e o Pedido Marketplace existem no arquivo do Sysemp.
         # Esse lookup soh alimenta a coluna N° PEDIDO; status/transportadora
         # continuam usando o Sysemp filtrado.
-        if df_sys_raw is not None and not df_sys_raw.empty:
-            col_nf_full     = encontrar_coluna(df_sys_raw, ['Nota Fiscal', 'NF', 'Numero NF'])
-            col_pedido_full = encontrar_coluna(df_sys_raw, ['Pedido Marketplace'])
-            if col_nf_full and col_pedido_full:
-                pedido_full_lookup = pd.DataFrame({
-                    '_NF_FULL_KEY': df_sys_raw[col_nf_full].apply(normalizar_nf),
-                    '_PEDIDO_FULL': df_sys_raw[col_pedido_full].apply(self._normalizar_pedido),
-                })
-                pedido_full_lookup = pedido_full_lookup[
-                    (pedido_full_lookup['_NF_FULL_KEY'] != '')
-                    & (pedido_full_lookup['_PEDIDO_FULL'] != '')
-                ]
-                pedido_full_lookup = pedido_full_lookup.drop_duplicates(
-                    subset='_NF_FULL_KEY', keep='first'
-                )
-                df_merged = pd.merge(
-                    df_merged,
-                    pedido_full_lookup,
-                    left_on='_NF_NORM',
-                    right_on='_NF_FULL_KEY',
-                    how='left',
-                )
-
-        # Comparacao usa o dicionario CARRIERS dos dois lados.
-        # .map() retorna NaN quando a chave nao existe no dict — usamos isso
-        # para detectar "transp nao esta no dicionario" (status Não Localizado).
-        # Normaliza espacos multiplos -> espaco simples (consistente com as
-        # chaves do dict_transp_norm criado em __init__) para que variantes
-        # como "FRONTLOG  EXTREMA SDF 21" (2 espacos) casem corretamente.
-        transp_inteli_norm = (
-            df_merged[col_transp].astype(str).str.upper()
-            .str.replace(r'\s+', ' ', regex=True).str.strip()
-        )
-        transp_sys_norm = (
-            df_merged['Transportadora_sys'].astype(str).str.upper()
-            .str.replace(r'\s+', ' ', regex=True).str.strip()
-        )
-
-        transp_inteli_dict = transp_inteli_norm.map(self.dict_transp_norm)
-        transp_sys_dict    = transp_sys_norm.map(self.dict_transp_norm)
-
-        inteli_in_dict = transp_inteli_dict.notna()
-        sys_in_dict    = transp_sys_dict.notna()
-
-        # Canonical para a comparacao (usa raw upper se nao tiver no dict).
-        transp_inteli_canon = transp_inteli_dict.fillna(transp_inteli_norm)
-        transp_sys_canon    = transp_sys_dict.fillna(transp_sys_norm)
-
-        # Valores brutos (preservam capitalizacao original) — usados quando
-        # a transportadora nao esta no dicionario e queremos manter como veio.
-        transp_inteli_out = df_merged[col_transp].astype(str).str.strip()
-        transp_sys_out    = df_merged['Transportadora_sys'].astype(str).str.strip()
-
-        # 'encontrado' = NF foi localizada no Sysemp (Transportadora_sys valida).
-        encontrado = (
-            df_merged['Transportadora_sys'].notna()
-            & (transp_sys_norm != '')
-            & (transp_sys_norm != 'NAN')
-        )
-
-        # Ambas transportadoras (Intelipost E Sysemp) FORA do dicionario.
-        ambos_fora_dict = encontrado & (~inteli_in_dict) & (~sys_in_dict)
-
-        # Comparacao apos canonicalizacao (so significativa quando pelo menos
-        # um lado esta no dicionario).
-        iguais     = encontrado & ~ambos_fora_dict & (transp_inteli_canon == transp_sys_canon)
-        diferentes = encontrado & ~ambos_fora_dict & (transp_inteli_canon != transp_sys_canon)
-
-        # Status final:
-        #   transportadora canonicas iguais (apos dict)     -> 'Verdadeiro'
-        #   transportadora canonicas diferentes (apos dict) -> 'Falso'
-        #   ambas fora do dicionario (ou NF nao casou)      -> 'Não Localizado'
-        status = np.where(
-            (~encontrado) | ambos_fora_dict, "Não Localizado",
-            np.where(iguais, "Verdadeiro", "Falso")
-        )
+        if indice.tem_bruto:
+            with instr.etapa('merge Sysemp bruto (N° PEDIDO)', entrada=len(pos_validas)):
+                # O bruto é indexado por NF: numa NF repetida daria o pedido
+                # de outra nota. Casada pela chave, vale o Pedido_sys da linha.
+                do_sysemp['_PEDIDO_FULL'] = pd.Series(indice.pedido_bruto(chaves_validas)).mask(casadas_por_chave)
+
+        with instr.etapa('canonicalização de transportadora + status', entrada=len(pos_validas)):
+            # Comparacao usa o dicionario CARRIERS dos dois lados.
+            # .map() retorna NaN quando a chave nao existe no dict — usamos isso
+            # para detectar "transp nao esta no dicionario" (status Não Localizado).
+            # Normaliza espacos multiplos -> espaco simples (consistente com as
+            # chaves do dict_transp_norm criado em __init__) para que variantes
+            # como "FRONTLOG  EXTREMA SDF 21" (2 espacos) casem corretamente.
+            # Cada coluna é fatorada uma vez; as cadeias rodam só nos valores
+            # distintos (poucas dezenas de transportadoras).
+            transf = self.transformacoes
+            transp_inteli = como_categoria(df[col_transp]).iloc[pos_validas].reset_index(drop=True)
+            transp_sys    = como_categoria(do_sysemp['Transportadora_sys'])
+
+            transp_sys_norm = transf.aplicar(transp_sys, 'transportadora_norm')
+
+            inteli_in_dict = transf.aplicar(transp_inteli, 'transportadora_no_dict').astype(bool)
+            sys_in_dict    = transf.aplicar(transp_sys, 'transportadora_no_dict').astype(bool)
+
+            # Canonical para a comparacao (usa raw upper se nao tiver no dict).
+            transp_inteli_canon = transf.aplicar(transp_inteli, 'transportadora_canonica')
+            transp_sys_canon    = transf.aplicar(transp_sys, 'transportadora_canonica')
+
+            # Valores brutos (preservam capitalizacao original) — usados quando
+            # a transportadora nao esta no dicionario e queremos manter como veio.
+            transp_sys_out = transf.aplicar(transp_sys, 'texto')
+
+            # 'encontrado' = NF foi localizada no Sysemp (Transportadora_sys valida).
+            encontrado = (
+                do_sysemp['Transportadora_sys'].notna()
+                & (transp_sys_norm != '')
+                & (transp_sys_norm != 'NAN')
+            )
 
-        # Transportadora final:
-        #   ambos_fora_dict -> Sysemp RAW (mantem a transportadora do Sysemp)
-        #   diferentes      -> Sysemp canonical (do dicionario)
-        #   demais          -> Intelipost canonical (do dicionario)
-        transp_final = np.select(
-            [ambos_fora_dict, diferentes],
-            [transp_sys_out,  transp_sys_canon],
-            default=transp_inteli_canon,
-        )
+            # Ambas transportadoras (Intelipost E Sysemp) FORA do dicionario.
+            ambos_fora_dict = encontrado & (~inteli_in_dict) & (~sys_in_dict)
 
-        # N° PEDIDO final — VLOOKUP por NF, com cadeia de fallback que
-        # garante que NENHUMA linha fique sem informação:
-        #   1. Sysemp BRUTO 'Pedido Marketplace' (sem filtro de empresa —
-        #      cobre B2B/TIKTOK direto que ficam fora de [16,18,19,21])
-        #   2. Sysemp FILTRADO 'Pedido_sys' (do merge principal)
-        #   3. Intelipost 'marketplace' (_PEDIDO_NORM)
-        #   4. 'NÃO INFORMADO' (trava anti-branco final)
-        _NULOS = ['nan', 'NaN', 'None', '<NA>', '']
-        if '_PEDIDO_FULL' in df_merged.columns:
-            pedido_sys_full = (
-                df_merged['_PEDIDO_FULL'].astype(str).str.strip().replace(_NULOS, pd.NA)
+            # Comparacao apos canonicalizacao (so significativa quando pelo menos
+            # um lado esta no dicionario). As categorias dos dois lados diferem,
+            # entao compara pelos valores.
+            canon_iguais = (
+                np.asarray(transp_inteli_canon, dtype=object) == np.asarray(transp_sys_canon, dtype=object)
             )
-        else:
-            pedido_sys_full = pd.Series(pd.NA, index=df_merged.index)
-        pedido_sys_filt = (
-            df_merged['Pedido_sys'].astype(str).str.strip().replace(_NULOS, pd.NA)
-        )
-        pedido_int = (
-            df_merged['_PEDIDO_NORM'].astype(str).str.strip().replace(_NULOS, pd.NA)
-        )
-        serie_pedido_final = (
-            pedido_sys_full
-            .fillna(pedido_sys_filt)
-            .fillna(pedido_int)
-            .fillna('')
-        )
+            iguais     = encontrado & ~ambos_fora_dict & canon_iguais
+            diferentes = encontrado & ~ambos_fora_dict & ~canon_iguais
+
+            # Status final:
+            #   transportadora canonicas iguais (apos dict)     -> 'Verdadeiro'
+            #   transportadora canonicas diferentes (apos dict) -> 'Falso'
+            #   ambas fora do dicionario (ou NF nao casou)      -> 'Não Localizado'
+            # Códigos da tabela toda: as descartadas ficam com o último.
+            status = np.full(len(df), 3, dtype=np.int8)
+            status[pos_validas] = np.where((~encontrado) | ambos_fora_dict, 0, np.where(iguais, 1, 2))
+
+            # Transportadora final:
+            #   ambos_fora_dict -> Sysemp RAW (mantem a transportadora do Sysemp)
+            #   diferentes      -> Sysemp canonical (do dicionario)
+            #   demais          -> Intelipost canonical (do dicionario)
+            transp_final = pd.Series(np.select(
+                [ambos_fora_dict, diferentes],
+                [np.asarray(transp_sys_out, dtype=object), np.asarray(transp_sys_canon, dtype=object)],
+                default=np.asarray(transp_inteli_canon, dtype=object),
+            )).astype('category')
+
+        with instr.etapa('N° PEDIDO (cadeia de fallback)', entrada=len(pos_validas)):
+            # N° PEDIDO final — VLOOKUP por NF, com cadeia de fallback que
+            # garante que NENHUMA linha fique sem informação:
+            #   1. Sysemp BRUTO 'Pedido Marketplace' (sem filtro de empresa —
+            #      cobre B2B/TIKTOK direto que ficam fora de [16,18,19,21])
+            #   2. Sysemp FILTRADO 'Pedido_sys' (do merge principal)
+            #   3. Intelipost 'marketplace' (_PEDIDO_NORM)
+            #   4. 'NÃO INFORMADO' (trava anti-branco final)
+            # Descartadas: só o pedido da Intelipost, sem a cadeia.
+            _NULOS = ['nan', 'NaN', 'None', '<NA>', '']
+            pedido_norm = df['_PEDIDO_NORM'].astype(str).str.strip()
+            if '_PEDIDO_FULL' in do_sysemp:
+                pedido_sys_full = do_sysemp['_PEDIDO_FULL'].astype(str).str.strip().replace(_NULOS, pd.NA)
+            else:
+                pedido_sys_full = pd.Series(pd.NA, index=range(len(pos_validas)))
+            pedido_sys_filt = do_sysemp['Pedido_sys'].astype(str).str.strip().replace(_NULOS, pd.NA)
+            pedido_int = pedido_norm.iloc[pos_validas].reset_index(drop=True).replace(_NULOS, pd.NA)
+            serie_pedido_final = (
+                pedido_sys_full
+                .fillna(pedido_sys_filt)
+                .fillna(pedido_int)
+                .fillna('')
+            )
+            pedido_desc = pedido_norm.iloc[pos_descartadas].replace(_NULOS, '')
 
         # ----- ETAPA 3 — Montagem do dataframe final ----------------------- #
-        hoje = datetime.now().strftime('%d/%m/%Y')
-
-        # DATA PREVISTA por canal: SHOPEE usa 'Previsão Entrega Transp. Original';
-        # demais canais usam 'Previsão Entrega Cliente Original'.
-        # Detecção de Shopee é por substring (canal contém 'SHOPEE').
-        canal_upper = self._fmt_col(df_merged, col_canal).str.upper()
-        eh_shopee   = canal_upper.str.contains('SHOPEE', na=False, regex=False)
-        previsao_geral  = self._fmt_data_br(df_merged, col_previsao)
-        previsao_shopee = self._fmt_data_br(df_merged, col_previsao_shopee)
-        data_prevista = previsao_geral.where(~eh_shopee, previsao_shopee)
-
-        df_final = pd.DataFrame({
-            'DIA DA TRATATIVA':         hoje,
-            'DATA PEDIDO':              self._so_data(self._fmt_data_br(df_merged, col_data_criacao)),
-            'DATA PREVISTA':            self._so_data(data_prevista),
-            'UF':                       self._fmt_col(df_merged, col_uf).str.upper(),
-            'TRANSPORTADORA':           pd.Series(transp_final, index=df_merged.index),
-            'PEDIDO INTELIPOST':        self._fmt_col(df_merged, col_pedido_inte),
-            'CHAVE DA NF':              self._fmt_col(df_merged, col_chave_nf),
-            'MARKETPLACE':              self._fmt_col(df_merged, col_canal).str.upper(),
-            'N° PEDIDO':                serie_pedido_final,
-            'NOTA FISCAL':              df_merged['_NF_NORM'].astype(str),
-            'STATUS DA TRANSPORTADORA': pd.Series(status, index=df_merged.index),
-        })
-
-        # Garante presença e ordem exata das colunas finais
-        for c in FINAL_COLUMNS_VALIDACAO:
-            if c not in df_final.columns:
-                df_final[c] = ""
-        df_final = df_final[FINAL_COLUMNS_VALIDACAO]
-
-        # Linhas descartadas pelo histórico — mesmo schema, para auditoria.
-        # Aplica também o dicionário de transportadora para padronizar a saída.
-        transp_desc = self._normalizar_transp(
-            self._fmt_col(df_descartadas_raw, col_transp),
-            self.dict_transp_norm,
-        )
-        canal_desc = self._fmt_col(df_descartadas_raw, col_canal).str.upper()
-        eh_shopee_desc = canal_desc.str.contains('SHOPEE', na=False, regex=False)
-        previsao_desc_geral  = self._fmt_data_br(df_descartadas_raw, col_previsao)
-        previsao_desc_shopee = self._fmt_data_br(df_descartadas_raw, col_previsao_shopee)
-        data_prev_desc = previsao_desc_geral.where(~eh_shopee_desc, previsao_desc_shopee)
-
-        df_descartadas = pd.DataFrame({
-            'DIA DA TRATATIVA':         hoje,
-            'DATA PEDIDO':              self._so_data(self._fmt_data_br(df_descartadas_raw, col_data_criacao)),
-            'DATA PREVISTA':            self._so_data(data_prev_desc),
-            'UF':                       self._fmt_col(df_descartadas_raw, col_uf).str.upper(),
-            'TRANSPORTADORA':           transp_desc,
-            'PEDIDO INTELIPOST':        self._fmt_col(df_descartadas_raw, col_pedido_inte),
-            'CHAVE DA NF':              self._fmt_col(df_descartadas_raw, col_chave_nf),
-            'MARKETPLACE':              self._fmt_col(df_descartadas_raw, col_canal).str.upper(),
-            'N° PEDIDO':                (
-                df_descartadas_raw['_PEDIDO_NORM'].astype(str).str.strip()
-                .replace(['nan', 'NaN', 'None', '<NA>', ''], '')
-                if '_PEDIDO_NORM' in df_descartadas_raw.columns else ''
-            ),
-            'NOTA FISCAL':              df_descartadas_raw['_NF_NORM'].astype(str) if '_NF_NORM' in df_descartadas_raw.columns else "",
-            'STATUS DA TRANSPORTADORA': "DESCARTADA - HISTÓRICO",
-        })
-
-        if not df_descartadas.empty:
+        hoje_br = datetime.now().strftime('%d/%m/%Y')
+
+        # DATA PREVISTA e canal vêm do plano; aqui só a DATA PEDIDO.
+        with instr.etapa('formatação de datas', entrada=len(df)):
+            data_pedido = self._so_data(self._fmt_data_br(df, col_data_criacao))
+
+        with instr.etapa('montagem da saída', entrada=len(df)) as etapa:
+            # Linhas descartadas pelo histórico — mesmo schema, para auditoria.
+            # Aplica também o dicionário de transportadora para padronizar a saída.
+            transp_desc = self._normalizar_transp(self._fmt_col(df.iloc[pos_descartadas], col_transp))
+            saida = pd.DataFrame({
+                'DIA DA TRATATIVA':         hoje_br,
+                'DATA PEDIDO':              data_pedido,
+                'DATA PREVISTA':            self._so_data(data_prevista),
+                'UF':                       self._fmt_col(df, col_uf, maiusculo=True),
+                'TRANSPORTADORA':           intercalar(
+                    [(pos_validas, transp_final), (pos_descartadas, transp_desc)], len(df), df.index
+                ),
+                'PEDIDO INTELIPOST':        self._fmt_col(df, col_pedido_inte),
+                'CHAVE DA NF':              self._fmt_col(df, col_chave_nf),
+                'MARKETPLACE':              canal_upper,
+                'N° PEDIDO':                intercalar(
+                    [(pos_validas, serie_pedido_final), (pos_descartadas, pedido_desc)], len(df), df.index
+                ),
+                'NOTA FISCAL':              df['_NF_NORM'].astype(str),
+                'STATUS DA TRANSPORTADORA': pd.Categorical.from_codes(
+                    status, categories=["Não Localizado", "Verdadeiro", "Falso", "DESCARTADA - HISTÓRICO"],
+                ),
+            }, index=df.index)
+
+            # Garante presença e ordem exata das colunas finais
             for c in FINAL_COLUMNS_VALIDACAO:
-                if c not in df_descartadas.columns:
-                    df_descartadas[c] = ""
-            df_descartadas = df_descartadas[FINAL_COLUMNS_VALIDACAO]
-        else:
-            df_descartadas = pd.DataFrame(columns=FINAL_COLUMNS_VALIDACAO)
-
-        # ----- ETAPA 4 — Filtra DATA PREVISTA por modo (BRT) --------------- #
-        # modo='atraso' (padrao): mantem apenas linhas com DATA PREVISTA
-        #                          ate ontem (ontem + todas as anteriores).
-        # modo='prevencao'       : mantem apenas linhas com DATA PREVISTA
-        #                          HOJE ou HOJE + 1 DIA (hoje e amanha).
-        # Usa timezone do Brasil para evitar bug de fuso em servidor UTC.
-        # Linhas com DATA PREVISTA invalida (NaT apos parse) sao descartadas.
-        if modo == 'prevencao':
-            hoje_dt   = datetime.now(TZ_BR).date()
-            amanha_dt = hoje_dt + timedelta(days=1)
-
-            def _filtra_data(df):
-                if df.empty:
-                    return df
-                datas = pd.to_datetime(
-                    df['DATA PREVISTA'], errors='coerce', dayfirst=True, format='mixed'
-                )
-                mask = datas.dt.date.isin([hoje_dt, amanha_dt])
-                return df[mask].copy()
-        else:
-            ontem_dt = (datetime.now(TZ_BR) - timedelta(days=1)).date()
-
-            def _filtra_data(df):
-                if df.empty:
-                    return df
-                datas = pd.to_datetime(
-                    df['DATA PREVISTA'], errors='coerce', dayfirst=True, format='mixed'
-                )
-                mask = datas.dt.date <= ontem_dt
-                return df[mask].copy()
-
-        df_final       = _filtra_data(df_final)
-        df_descartadas = _filtra_data(df_descartadas)
-
-        # ----- ETAPA 5 (apenas modo='prevencao') — Ajusta colunas finais --- #
-        # Output da Prevencao:
-        #   - renomeia 'DIA DA TRATATIVA' -> 'DATA TRATATIVA'
-        #   - remove 'DATA PEDIDO' e 'STATUS DA TRANSPORTADORA'
-        if modo == 'prevencao':
-            PREVENCAO_COLS = [
-                'DATA TRATATIVA',
-                'DATA PREVISTA',
-                'UF',
-                'TRANSPORTADORA',
-                'PEDIDO INTELIPOST',
-                'CHAVE DA NF',
-                'MARKETPLACE',
-                'N° PEDIDO',
-                'NOTA FISCAL',
-            ]
-
-            def _to_prevencao(df):
-                if df.empty:
-                    return pd.DataFrame(columns=PREVENCAO_COLS)
-                df = df.rename(columns={'DIA DA TRATATIVA': 'DATA TRATATIVA'})
-                return df[PREVENCAO_COLS]
-
-            df_final       = _to_prevencao(df_final)
-            df_descartadas = _to_prevencao(df_descartadas)
-
-        return (df_final, df_descartadas), None
+                if c not in saida.columns:
+                    saida[c] = ""
+            saida = saida[FINAL_COLUMNS_VALIDACAO]
+            etapa.saida(len(saida))
+
+        return {
+            'saida': saida,
+            'datas': data_prevista_dt,
+            'historico': historico,
+            'indice_validas': posicao_valida,
+        }, None
@@ -0,0 +1,187 @@
+"""Resolução das colunas de um arquivo por papel, com perfis em cache por cabeçalho.
+
+Cada motor localizava suas colunas com várias chamadas a
+utils.helpers.encontrar_coluna — dois laços por papel, refazendo
+`upper().strip()` de todo o cabeçalho a cada chamada, e de novo sobre a
+base bruta do Sysemp. O SchemaResolver normaliza o cabeçalho uma vez e
+resolve todos os papéis do fluxo (core.config.PAPEIS_ARQUIVO) de uma vez,
+com a mesma regra de encontrar_coluna: 1º candidato com nome exato; senão,
+1º candidato igual a alguma coluna ignorando caixa e espaços nas pontas.
+
+    esquema = ESQUEMAS.resolver(df, 'validacao')
+    esquema['nf'], esquema['uf']      nome real da coluna, ou None
+    esquema.faltantes                  papéis não localizados
+    esquema.contendo('EMPRESA')        colunas cujo nome contém os termos
+    esquema.decisoes                   escolhas feitas sobre os dados deste
+                                       layout (ex.: a coluna EMPRESA com IDs)
+
+O Esquema fica em cache pela assinatura (hash) do cabeçalho: os layouts
+recorrentes de exportação do Intelipost/Sysemp resolvem sem varrer nada.
+Esse cache (ESQUEMAS) é do processo e compartilhado entre as sessões.
+
+Mudança de layout é acompanhada por execução, não no cache: cada
+DataProcessor tem um AcompanhamentoLayout, semeado com o último cabeçalho
+de cada fluxo visto pela sessão. Quando um fluxo passa a receber outro
+cabeçalho, a diferença (papéis que mudaram de coluna ou sumiram, colunas
+novas/removidas) vira uma Deriva em `derivas` — o único lugar onde
+mudança de layout é reportada. Tarefas de sessões diferentes rodando ao
+mesmo tempo não veem as derivas uma da outra.
+"""
+import hashlib
+import threading
+
+from core.config import PAPEIS_ARQUIVO
+
+# Perfis (fluxo, cabeçalho) guardados; acima disso o mais antigo sai.
+LIMITE_PERFIS = 256
+
+
+def assinatura_cabecalho(cabecalho):
+    """Hash estável (hex, 16 caracteres) da sequência de nomes de coluna."""
+    texto = '\x1f'.join(str(c) for c in cabecalho)
+    return hashlib.sha1(texto.encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+
+
+class Esquema:
+    """Papéis de um fluxo resolvidos num cabeçalho: esquema[papel] -> coluna real ou None."""
+
+    __slots__ = ('fluxo', 'assinatura', 'cabecalho', 'colunas', 'decisoes', '_maiusculas')
+
+    def __init__(self, fluxo, cabecalho, papeis, assinatura=None):
+        self.fluxo = fluxo
+        self.cabecalho = tuple(cabecalho)
+        self.assinatura = assinatura or assinatura_cabecalho(self.cabecalho)
+        self._maiusculas = tuple(str(c).upper().strip() for c in self.cabecalho)
+        # Lembradas junto com o perfil, para o mesmo layout não refazer a escolha.
+        self.decisoes = {}
+
+        exatas = set(self.cabecalho)
+        normalizadas = {}
+        for nome, col in zip(self._maiusculas, self.cabecalho):
+            normalizadas.setdefault(nome, col)
+        self.colunas = {}
+        for papel, candidatas in papeis.items():
+            col = next((c for c in candidatas if c in exatas), None)
+            if col is None:
+                col = next((normalizadas[c.upper()] for c in candidatas if c.upper() in normalizadas), None)
+            self.colunas[papel] = col
+
+    def __getitem__(self, papel):
+        return self.colunas[papel]
+
+    def get(self, papel, padrao=None):
+        return self.colunas.get(papel, padrao)
+
+    @property
+    def faltantes(self):
+        return tuple(p for p, c in self.colunas.items() if c is None)
+
+    def usadas(self):
+        """Colunas do cabeçalho resolvidas por algum papel."""
+        return {c for c in self.colunas.values() if c is not None}
+
+    def contendo(self, *termos):
+        """Colunas (na ordem do cabeçalho) cujo nome, em maiúsculas, contém todos os termos."""
+        return [
+            col for col, nome in zip(self.cabecalho, self._maiusculas)
+            if all(t in nome for t in termos)
+        ]
+
+
+class Deriva:
+    """Mudança de cabeçalho de um fluxo entre duas execuções."""
+
+    __slots__ = ('fluxo', 'papeis', 'colunas_novas', 'colunas_removidas')
+
+    def __init__(self, anterior, atual):
+        self.fluxo = atual.fluxo
+        # papel -> (coluna antes, coluna agora), só os que mudaram
+        self.papeis = {
+            p: (anterior.colunas.get(p), c)
+            for p, c in atual.colunas.items() if anterior.colunas.get(p) != c
+        }
+        self.colunas_novas = [c for c in atual.cabecalho if c not in set(anterior.cabecalho)]
+        self.colunas_removidas = [c for c in anterior.cabecalho if c not in set(atual.cabecalho)]
+
+    def descricao(self):
+        partes = []
+        for papel, (antes, agora) in self.papeis.items():
+            if agora is None:
+                partes.append(f"'{papel}' não localizado (antes '{antes}')")
+            else:
+                partes.append(f"'{papel}': '{antes}' -> '{agora}'")
+        if self.colunas_novas:
+            partes.append(f"{len(self.colunas_novas)} coluna(s) nova(s): {', '.join(map(str, self.colunas_novas))}")
+        if self.colunas_removidas:
+            partes.append(f"{len(self.colunas_removidas)} removida(s): {', '.join(map(str, self.colunas_removidas))}")
+        return f"{self.fluxo}: " + ('; '.join(partes) or 'mesmas colunas em outra ordem')
+
+
+class SchemaResolver:
+    """Resolve e guarda os Esquemas por (fluxo, assinatura do cabeçalho). Thread-safe."""
+
+    def __init__(self, papeis_por_fluxo=None, limite=LIMITE_PERFIS):
+        self.papeis_por_fluxo = papeis_por_fluxo or PAPEIS_ARQUIVO
+        self.limite = limite
+        self.acertos = self.falhas = 0
+        self._perfis = {}     # (fluxo, assinatura) -> Esquema
+        self._lock = threading.Lock()
+
+    def resolver(self, colunas, fluxo):
+        """Esquema de `fluxo` para `colunas` (DataFrame ou lista de nomes)."""
+        cabecalho = tuple(colunas.columns if hasattr(colunas, 'columns') else colunas)
+        assinatura = assinatura_cabecalho(cabecalho)
+        chave = (fluxo, assinatura)
+        with self._lock:
+            esquema = self._perfis.get(chave)
+            if esquema is None:
+                self.falhas += 1
+                esquema = Esquema(fluxo, cabecalho, self.papeis_por_fluxo[fluxo], assinatura)
+                self._perfis[chave] = esquema
+                if len(self._perfis) > self.limite:
+                    del self._perfis[next(iter(self._perfis))]
+            else:
+                self.acertos += 1
+        return esquema
+
+    def __len__(self):
+        return len(self._perfis)
+
+
+class AcompanhamentoLayout:
+    """Resolve pelo SchemaResolver compartilhado e acompanha a deriva de uma execução.
+
+    `ultimos`: {fluxo: cabeçalho} com o último cabeçalho visto de cada
+    fluxo — o app guarda um por sessão e o passa a cada execução; o dict é
+    atualizado aqui. Sem ele, só há deriva entre arquivos desta execução.
+    """
+
+    def __init__(self, resolvedor=None, ultimos=None):
+        self.resolvedor = ESQUEMAS if resolvedor is None else resolvedor
+        self.ultimos = {} if ultimos is None else ultimos
+        self.derivas = []
+
+    def resolver(self, colunas, fluxo, acompanhar=True):
+        """Esquema de `fluxo` para `colunas` (ver SchemaResolver.resolver).
+
+        Com `acompanhar`, o cabeçalho entra no acompanhamento de deriva do
+        fluxo; a leitura projetada (DataProcessor.projecao) resolve o
+        cabeçalho completo do arquivo e não acompanha — os motores veem o
+        projetado.
+        """
+        esquema = self.resolvedor.resolver(colunas, fluxo)
+        if acompanhar:
+            anterior = self.ultimos.get(fluxo)
+            self.ultimos[fluxo] = list(esquema.cabecalho)
+            if anterior is not None and tuple(anterior) != esquema.cabecalho:
+                self.derivas.append(Deriva(self.resolvedor.resolver(anterior, fluxo), esquema))
+        return esquema
+
+    def retirar_derivas(self):
+        """Derivas registradas desde a última chamada (e as descarta)."""
+        derivas, self.derivas = self.derivas, []
+        return derivas
+
+
+# Compartilhado pelo processo: os perfis sobrevivem aos reruns do app.
+ESQUEMAS = SchemaResolver()
@@ -0,0 +1,210 @@
+"""Índice de consulta do Sysemp por Nota Fiscal, construído uma vez por arquivo.
+
+A cada execução os fluxos refaziam o mesmo preparo sobre o Sysemp:
+projetar, renomear a chave, normalizar o pedido, filtrar NFs vazias,
+`drop_duplicates` e `pd.merge` — e, na Validação, tudo de novo para o
+Sysemp bruto (lookup de N° PEDIDO). O SysempIndex guarda esse preparo:
+
+    * base tratada: NF -> linhas do Sysemp (pedido, chave, UF, marketplace,
+      transportadora), agrupadas por NF num layout CSR (`ordem` / `inicio`
+      / `contagem`), com o pedido já normalizado;
+    * base bruta: NF -> primeiro 'Pedido Marketplace' não vazio.
+
+As NFs são indexadas pela chave int64 de utils.normalizacao.chave_nf_serie
+(fatoração, get_indexer e deduplicação sobre inteiros, não sobre texto); as
+consultas aceitam as chaves já calculadas ou as NFs normalizadas.
+
+Consultas são vetorizadas (`Index.get_indexer` + `take`):
+    juntar(df)          left join com TODAS as linhas de cada NF — mesmo
+                        resultado (linhas, ordem, colunas) de
+                        pd.merge(df, base, on='Nota Fiscal', how='left');
+                        usado por Intelipost e E-mail;
+    primeira_linha(nfs) posição da 1ª linha de cada NF (NF vazia não casa) —
+                        o drop_duplicates(keep='first') da Validação;
+    pedido_bruto(nfs)   N° PEDIDO do Sysemp bruto;
+    linha_por_chave_acesso(chaves)
+                        1ª linha com a mesma chave de acesso (44 dígitos, DV
+                        ok) — o cruzamento opcional da Validação quando a NF
+                        falta ou se repete no Sysemp. O índice por chave é
+                        montado na construção com `chave_acesso=True` (o
+                        índice que vai para o cache, que mede o tamanho ao
+                        guardar) e, sem ele, no primeiro uso, sob lock.
+
+O app guarda o índice no cache pelo hash do arquivo: rodadas seguintes
+contra o mesmo Sysemp (inclusive em outro módulo) não reconstroem nada.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+from core.schema import ESQUEMAS
+from utils.chave_acesso import IndiceChaveAcesso
+from utils.normalizacao import NF_VAZIA, chave_nf_serie, normalizar_nf_serie, normalizar_pedido_serie
+
+
+def _tomar(valores, posicoes):
+    """valores[posicoes], com posição -1 virando nulo (preserva o dtype quando possível)."""
+    if isinstance(valores, pd.arrays.NumpyExtensionArray):
+        # Coluna object: o pandas 2 avisa (FutureWarning) ao receber o wrapper.
+        valores = valores.to_numpy()
+    return take(valores, posicoes, allow_fill=True)
+
+
+def _como_chaves(nfs):
+    """Chaves int64 de `nfs` — já chaves (inteiros) ou NFs normalizadas (texto)."""
+    arr = np.asarray(nfs) if not isinstance(nfs, pd.Series) else nfs.to_numpy()
+    if arr.dtype == np.int64:
+        return arr
+    return chave_nf_serie(pd.Series(arr, dtype=object))
+
+
+class SysempIndex:
+    """Sysemp tratado (e, opcionalmente, bruto) indexado por Nota Fiscal."""
+
+    def __init__(self, df_sys_clean, df_sys_raw=None, chave_acesso=False):
+        """`chave_acesso=True` monta já o índice por chave de acesso (ver linha_por_chave_acesso)."""
+        self.base = df_sys_clean.reset_index(drop=True)
+        self.valido = 'Nota Fiscal' in self.base.columns
+        self._indexar_base()
+        self._indexar_bruto(df_sys_raw)
+        self._indice_acesso = None
+        self._lock_acesso = threading.Lock()
+        if chave_acesso:
+            self._indexar_chave_acesso()
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        del estado['_lock_acesso']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock_acesso = threading.Lock()
+
+    def __len__(self):
+        return len(self.base)
+
+    def _indexar_base(self):
+        nfs = self.base['Nota Fiscal'] if self.valido else pd.Series([], dtype=object)
+        codigos, chaves = pd.factorize(chave_nf_serie(nfs))
+        self.chaves = pd.Index(chaves)
+        # Linhas agrupadas por NF, na ordem original dentro de cada grupo
+        # (argsort estável) — a mesma ordem em que o merge devolve os pares.
+        self.ordem = np.argsort(codigos, kind='stable')
+        self.contagem = np.bincount(codigos[codigos >= 0], minlength=len(chaves))
+        self.inicio = int((codigos < 0).sum()) + np.cumsum(self.contagem) - self.contagem
+        self.pedido_norm = (
+            normalizar_pedido_serie(self.base['Pedido_sys']).to_numpy()
+            if 'Pedido_sys' in self.base.columns else None
+        )
+
+    def _indexar_bruto(self, df_sys_raw):
+        self.tem_bruto = False
+        self.chaves_bruto = pd.Index([], dtype=np.int64)
+        self.pedidos_bruto = np.array([], dtype=object)
+        if df_sys_raw is None or df_sys_raw.empty:
+            return
+        esquema = ESQUEMAS.resolver(df_sys_raw, 'sysemp_bruto')
+        col_nf, col_pedido = esquema['nf'], esquema['pedido_marketplace']
+        if not (col_nf and col_pedido):
+            return
+        chaves = chave_nf_serie(normalizar_nf_serie(df_sys_raw[col_nf]))
+        pedidos = normalizar_pedido_serie(df_sys_raw[col_pedido]).to_numpy()
+        validas = (chaves != NF_VAZIA) & (pedidos != '')
+        chaves, pedidos = chaves[validas], pedidos[validas]
+        primeira = ~pd.Series(chaves).duplicated(keep='first').to_numpy()
+        self.tem_bruto = True
+        self.chaves_bruto = pd.Index(chaves[primeira])
+        self.pedidos_bruto = pedidos[primeira]
+
+    def memoria_bytes(self):
+        """Tamanho aproximado (base + arrays do índice), para o cache."""
+        total = int(self.base.memory_usage(index=True, deep=True).sum())
+        total += self.ordem.nbytes + self.contagem.nbytes + self.inicio.nbytes
+        total += self.chaves.nbytes + self.chaves_bruto.nbytes
+        for arr in (self.pedido_norm, self.pedidos_bruto):
+            if arr is not None:
+                total += int(pd.Series(arr).memory_usage(deep=True))
+        if self._indice_acesso is not None:
+            total += self._indice_acesso.memoria_bytes()
+        return total
+
+    # ----------------------------------------------------------------- #
+    # Consultas
+    # ----------------------------------------------------------------- #
+    def juntar(self, df, coluna_nf='Nota Fiscal', chaves=None):
+        """Left join de `df` com a base tratada por NF (todas as linhas de cada NF).
+
+        Equivale a pd.merge(df, base, left_on=coluna_nf, right_on='Nota Fiscal',
+        how='left') com coluna_nf == 'Nota Fiscal'. Se `df` já tiver alguma
+        coluna da base (o merge criaria sufixos), delega ao próprio merge.
+        `chaves`: chaves int64 de df[coluna_nf], quando o chamador já as tem.
+        """
+        colunas_base = [c for c in self.base.columns if c != 'Nota Fiscal']
+        if coluna_nf != 'Nota Fiscal' or set(colunas_base) & set(df.columns):
+            return pd.merge(df, self.base, on='Nota Fiscal', how='left')
+
+        pos = self.chaves.get_indexer(_como_chaves(df[coluna_nf] if chaves is None else chaves))
+        casou = pos >= 0
+        if casou.any():
+            repeticoes = np.where(casou, self.contagem[np.where(casou, pos, 0)], 1)
+            primeira = np.where(casou, self.inicio[np.where(casou, pos, 0)], -1)
+        else:
+            repeticoes = np.ones(len(df), dtype=np.int64)
+            primeira = np.full(len(df), -1, dtype=np.int64)
+
+        # Cada linha de df repete uma vez por linha da NF na base; o par k
+        # do grupo pega a base em ordem[inicio + k].
+        esquerda = np.repeat(np.arange(len(df)), repeticoes)
+        deslocamento = np.arange(len(esquerda)) - np.repeat(np.cumsum(repeticoes) - repeticoes, repeticoes)
+        inicio_rep = np.repeat(primeira, repeticoes)
+        direita = np.full(len(esquerda), -1, dtype=np.int64)
+        tem_par = inicio_rep >= 0
+        direita[tem_par] = self.ordem[inicio_rep[tem_par] + deslocamento[tem_par]]
+
+        resultado = df.iloc[esquerda].reset_index(drop=True)
+        for col in colunas_base:
+            resultado[col] = _tomar(self.base[col].array, direita)
+        return resultado
+
+    def primeira_linha(self, nfs):
+        """Posição (na base) da 1ª linha de cada NF; -1 quando não há ou a NF é vazia."""
+        chaves = _como_chaves(nfs)
+        pos = self.chaves.get_indexer(chaves)
+        casou = (pos >= 0) & (chaves != NF_VAZIA)
+        if not casou.any():
+            return np.full(len(pos), -1, dtype=np.int64)
+        return np.where(casou, self.ordem[self.inicio[np.where(casou, pos, 0)]], -1)
+
+    def ocorrencias(self, nfs):
+        """Quantas linhas do Sysemp tem cada NF (0 quando não há)."""
+        pos = self.chaves.get_indexer(_como_chaves(nfs))
+        return np.where(pos >= 0, self.contagem[np.maximum(pos, 0)], 0)
+
+    def linha_por_chave_acesso(self, chaves_acesso):
+        """Posição (na base) da 1ª linha com a mesma chave de acesso; -1 quando não há."""
+        return self._indexar_chave_acesso().linhas(chaves_acesso)
+
+    def _indexar_chave_acesso(self):
+        # As tarefas do app (utils.tarefas) consultam o mesmo índice em threads.
+        with self._lock_acesso:
+            if self._indice_acesso is None:
+                coluna = self.base['Chave NF_sys'] if 'Chave NF_sys' in self.base.columns else pd.Series([], dtype=object)
+                self._indice_acesso = IndiceChaveAcesso(coluna)
+            return self._indice_acesso
+
+    def colunas(self, linhas, nomes):
+        """Colunas da base nas `linhas` dadas (-1 -> nulo). 'Pedido_sys' sai normalizado."""
+        saida = {}
+        for nome in nomes:
+            if nome == 'Pedido_sys' and self.pedido_norm is not None:
+                saida[nome] = _tomar(self.pedido_norm, linhas)
+            else:
+                saida[nome] = _tomar(self.base[nome].array, linhas)
+        return saida
+
+    def pedido_bruto(self, nfs):
+        """N° PEDIDO do Sysemp bruto para cada NF (nulo quando não há)."""
+        return _tomar(self.pedidos_bruto, self.chaves_bruto.get_indexer(_como_chaves(nfs)))
@@ -0,0 +1,80 @@
+"""
+Testes do cache de arquivos parseados.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_cache.py -v
+"""
+import io
+import os
+import stat
+
+import pandas as pd
+import pytest
+
+from utils.cache import CacheArquivos, hash_arquivo
+
+
+def _df(n):
+    return pd.DataFrame({"Nota Fiscal": [str(i) for i in range(n)]})
+
+
+def test_hash_depende_so_do_conteudo():
+    a, b, c = io.BytesIO(b"NF\n1\n"), io.BytesIO(b"NF\n1\n"), io.BytesIO(b"NF\n2\n")
+    assert hash_arquivo(a) == hash_arquivo(b) != hash_arquivo(c)
+    assert a.tell() == 0
+
+
+def test_acerto_falha_e_obter_ou_calcular(tmp_path):
+    cache = CacheArquivos(diretorio=str(tmp_path))
+    chamadas = []
+
+    def carregar():
+        chamadas.append(1)
+        return _df(3)
+
+    cache.obter_ou_calcular("h:sysemp", carregar)
+    df = cache.obter_ou_calcular("h:sysemp", carregar)
+
+    assert len(chamadas) == 1
+    assert df["Nota Fiscal"].tolist() == ["0", "1", "2"]
+    stats = cache.estatisticas()
+    assert (stats["acertos_memoria"], stats["falhas"]) == (1, 1)
+
+
+def test_lru_expulsa_para_o_disco_e_recupera(tmp_path):
+    grande = _df(1000)
+    limite = int(grande.memory_usage(deep=True).sum() * 1.5)
+    cache = CacheArquivos(limite_memoria=limite, diretorio=str(tmp_path))
+
+    cache.guardar("a", grande)
+    cache.guardar("b", _df(1000))   # expulsa "a" da memória
+
+    assert cache.estatisticas()["itens_memoria"] == 1
+    recuperado = cache.obter("a")
+    pd.testing.assert_frame_equal(recuperado, grande)
+    assert cache.estatisticas()["acertos_disco"] == 1
+
+
+def test_disco_respeita_limite(tmp_path):
+    cache = CacheArquivos(limite_memoria=0, limite_disco=1, diretorio=str(tmp_path))
+    cache.guardar("a", _df(10))
+    cache.guardar("b", _df(10))
+    assert cache.obter("a") is None
+
+
+def test_disco_privado_e_gravacao_sem_arquivo_pela_metade(tmp_path, monkeypatch):
+    cache = CacheArquivos(limite_memoria=0)
+    cache.guardar("a", _df(10))
+    cache.guardar("conjunto", {"1", "2"}, gravar_disco=True)
+
+    assert stat.S_IMODE(os.stat(cache.diretorio).st_mode) == 0o700
+    assert sorted(os.path.splitext(n)[1] for n in os.listdir(cache.diretorio)) == [".parquet", ".pkl"]
+
+    # Falha no meio da gravação: nada fica no lugar do arquivo final.
+    def falha(*args, **kwargs):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr("utils.cache.pickle.dump", falha)
+    with pytest.raises(OSError):
+        cache.guardar("b", {"3"}, gravar_disco=True)
+    assert len(os.listdir(cache.diretorio)) == 2
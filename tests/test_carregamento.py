@@ -0,0 +1,188 @@
+"""
+Testes de carregamento de arquivos (detecção de formato e leitura em blocos).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_carregamento.py -v
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from core.processor import DataProcessor
+from core.schema import SchemaResolver
+from utils.helpers import TAMANHO_AMOSTRA_CSV, carregar_arquivo, detectar_formato_csv
+
+
+def _arquivo(conteudo, nome="sysemp.csv", encoding="utf-8"):
+    buf = io.BytesIO(conteudo.encode(encoding))
+    buf.name = nome
+    return buf
+
+
+SYSEMP_CSV = (
+    "Empresa;Nota Fiscal;Chave NFe;Pedido Marketplace;UF;Marketplace;Transportadora\n"
+    "10;100;CHV0;PED-0;SP;SHOPEE;JADLOG\n"
+    "16;364.982,;CHV1;ML-100;SP;MERCADO LIVRE;JADLOG\n"
+    "99;200;CHV2;B2B-200;RJ;TIKTOK;PATRUS\n"
+    "21;12346;CHV3;SH-200;RJ;SHOPEE;TOTAL\n"
+    "18;12347;CHV4;SH-300;MG;Magazine Ferreira;Patrus\n"
+)
+
+
+@pytest.fixture
+def processor():
+    return DataProcessor()
+
+
+def test_detecta_separador_e_encoding():
+    assert detectar_formato_csv(_arquivo(SYSEMP_CSV)) == ("utf-8", ";")
+    assert detectar_formato_csv(_arquivo("NF,Transportadora\n1,JADLOG\n")) == ("utf-8", ",")
+    assert detectar_formato_csv(_arquivo("Região;NF\nSão Paulo;1\n", encoding="latin1")) == ("latin1", ";")
+
+
+def test_sysemp_em_blocos_latin1_com_acento_depois_da_amostra(processor):
+    linhas = [SYSEMP_CSV.rstrip("\n")]
+    linhas += [f"16;{1000 + i};CHV;PED-{i};SP;SHOPEE;JADLOG" for i in range(5_000)]
+    linhas.append("16;9999;CHV;PED-X;SP;SHOPEE;TRANSPORTES SÃO JOÃO")
+    conteudo = "\n".join(linhas) + "\n"
+    assert conteudo.index("Ã") > TAMANHO_AMOSTRA_CSV
+
+    esperado, _ = processor.tratar_sysemp(carregar_arquivo(_arquivo(conteudo, encoding="latin1")))
+    (df_clean, _), err = processor.carregar_sysemp_em_blocos(
+        _arquivo(conteudo, encoding="latin1"), tamanho_bloco=1000
+    )
+
+    assert err is None
+    assert df_clean["Transportadora_sys"].iloc[-1] == esperado["Transportadora_sys"].iloc[-1]
+    # A carga completa (> MIN_LINHAS_CATEGORIA) guarda categorias de linhas descartadas.
+    pd.testing.assert_frame_equal(
+        df_clean.reset_index(drop=True).astype(object), esperado.reset_index(drop=True).astype(object)
+    )
+
+
+def test_carregar_arquivo_csv_ponto_e_virgula():
+    df = carregar_arquivo(_arquivo(SYSEMP_CSV))
+    assert list(df.columns)[:2] == ["Empresa", "Nota Fiscal"]
+    assert len(df) == 5
+
+
+@pytest.mark.parametrize("tamanho_bloco", [1, 2, 100])
+def test_sysemp_em_blocos_igual_ao_carregamento_completo(processor, tamanho_bloco):
+    esperado, err_esperado = processor.tratar_sysemp(carregar_arquivo(_arquivo(SYSEMP_CSV)))
+
+    (df_clean, df_raw), err = processor.carregar_sysemp_em_blocos(
+        _arquivo(SYSEMP_CSV), tamanho_bloco=tamanho_bloco
+    )
+
+    assert err is err_esperado is None
+    pd.testing.assert_frame_equal(
+        df_clean.reset_index(drop=True), esperado.reset_index(drop=True)
+    )
+    # Base bruta mantém todas as linhas (inclusive empresas fora do filtro),
+    # mas só as colunas usadas pelo lookup de N° PEDIDO.
+    assert list(df_raw.columns) == ["Nota Fiscal", "Pedido Marketplace"]
+    assert df_raw["Pedido Marketplace"].tolist() == ["PED-0", "ML-100", "B2B-200", "SH-200", "SH-300"]
+
+
+def test_sysemp_em_blocos_sem_coluna_empresa(processor):
+    (df_clean, _), err = processor.carregar_sysemp_em_blocos(_arquivo("Nota Fiscal;UF\n1;SP\n"))
+    assert df_clean.empty
+    assert "não encontrada" in err
+
+
+@pytest.mark.parametrize("nome", ["sysemp.csv", "sysemp.xlsx"])
+def test_semi_join_mantem_so_nfs_da_origem(processor, nome, tmp_path):
+    if nome.endswith(".xlsx"):
+        caminho = tmp_path / nome
+        carregar_arquivo(_arquivo(SYSEMP_CSV)).to_excel(caminho, index=False)
+        arquivo = open(caminho, "rb")
+    else:
+        arquivo = _arquivo(SYSEMP_CSV)
+    origem = pd.DataFrame({"Nota Fiscal": ["364982", "200", "999"]})
+
+    nfs = processor.nfs_da_origem(origem, "validacao")
+    with arquivo:
+        (df_clean, df_raw), err = processor.carregar_sysemp_em_blocos(
+            arquivo, tamanho_bloco=2, nfs_filtro=nfs
+        )
+
+    assert err is None
+    assert df_clean["Nota Fiscal"].tolist() == ["364982"]      # 200 é da empresa 99
+    assert df_raw["Pedido Marketplace"].tolist() == ["ML-100", "B2B-200"]
+
+
+def test_semi_join_sem_nenhum_match_devolve_base_vazia_com_schema(processor):
+    (df_clean, _), err = processor.carregar_sysemp_em_blocos(
+        _arquivo(SYSEMP_CSV), nfs_filtro={"424242"}
+    )
+    assert err is None
+    assert df_clean.empty and "Nota Fiscal" in df_clean.columns
+
+
+def test_projecao_carrega_so_as_colunas_usadas_e_mantem_o_resultado(processor):
+    origem = (
+        "Extra 1;Nota Fiscal;Transportadora;Observação;marketplace;UF\n"
+        "a;100;JADLOG;x;PED-0;SP\n"
+        "b;364982;JADLOG;y;ML-100;SP\n"
+    )
+    sysemp = processor.indice_sysemp(processor.tratar_sysemp(carregar_arquivo(_arquivo(SYSEMP_CSV)))[0])
+
+    completo = carregar_arquivo(_arquivo(origem, nome="inteli.csv"))
+    projetado = carregar_arquivo(_arquivo(origem, nome="inteli.csv"), colunas=processor.projecao("intelipost"))
+
+    assert set(projetado.columns) == {"Nota Fiscal", "Transportadora", "marketplace", "UF"}
+    (esperado, _), _ = processor.processar_intelipost(completo, sysemp, set())
+    (obtido, _), _ = processor.processar_intelipost(projetado, sysemp, set())
+    pd.testing.assert_frame_equal(obtido.reset_index(drop=True), esperado.reset_index(drop=True))
+
+
+def test_projecao_sem_coluna_conhecida_carrega_o_arquivo_inteiro(processor):
+    df = carregar_arquivo(_arquivo("A;B\n1;2\n"), colunas=processor.projecao("intelipost"))
+    assert list(df.columns) == ["A", "B"]
+
+
+def test_tratar_sysemp_nao_altera_a_base_e_lembra_a_coluna_empresa():
+    processor = DataProcessor(esquemas=SchemaResolver())
+    bruto = carregar_arquivo(_arquivo(SYSEMP_CSV))
+    colunas = list(bruto.columns)
+
+    primeiro, _ = processor.tratar_sysemp(bruto)
+    segundo, _ = processor.tratar_sysemp(bruto)
+
+    assert list(bruto.columns) == colunas
+    assert processor.esquemas.resolver(bruto, "sysemp").decisoes == {"empresa": "Empresa"}
+    pd.testing.assert_frame_equal(primeiro, segundo)
+
+
+def test_coluna_empresa_e_a_primeira_candidata_com_id():
+    processor = DataProcessor(esquemas=SchemaResolver())
+    df = pd.DataFrame({
+        "Empresa Origem": ["1", "2", "3", "4"],
+        "Empresa": ["99", "99", "99", "16"],
+        "Nota Fiscal": ["1", "2", "3", "4"],
+    })
+
+    df_clean, err = processor.tratar_sysemp(df)
+
+    assert err is None
+    assert df_clean["Nota Fiscal"].tolist() == ["4"]
+    # Mesmo layout, outro arquivo: vale de novo a 1ª candidata com ID.
+    outro = df.assign(Empresa="99", **{"Empresa Origem": ["18", "1", "1", "1"]})
+    df_clean, err = processor.tratar_sysemp(outro)
+    assert err is None and df_clean["Nota Fiscal"].tolist() == ["1"]
+
+
+def test_coluna_empresa_com_ids_so_depois_da_amostra_mantem_a_ordem_das_candidatas():
+    processor = DataProcessor(esquemas=SchemaResolver())
+    linhas = ["Empresa;Nota Fiscal;Cod Empresa Destino"]
+    linhas += [f"{99 if i < 1500 else 16};{i};18" for i in range(3000)]
+    csv = "\n".join(linhas) + "\n"
+
+    # Em memória e em blocos, em qualquer ordem, com o layout já lembrado.
+    em_memoria, _ = processor.tratar_sysemp(carregar_arquivo(_arquivo(csv)))
+    (em_blocos, _), _ = processor.carregar_sysemp_em_blocos(_arquivo(csv), tamanho_bloco=1000)
+    de_novo, _ = processor.tratar_sysemp(carregar_arquivo(_arquivo(csv)))
+
+    for df_clean in (em_memoria, em_blocos, de_novo):
+        assert len(df_clean) == 1500 and df_clean["Nota Fiscal"].iloc[0] == "1500"
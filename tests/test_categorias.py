@@ -0,0 +1,93 @@
+"""
+Testes das colunas category (utils/categorias.py) e do pipeline com elas.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_categorias.py -v
+"""
+import numpy as np
+import pandas as pd
+
+from core.processor import DataProcessor
+from utils.categorias import categorizar_colunas, intercalar, mapear_categorias, preencher_nulos
+
+
+def test_mapear_categorias_transforma_por_valor_distinto_e_mantem_nulos():
+    serie = pd.Series([" jadlog", "JADLOG ", None, "Patrus", " jadlog"], index=[10, 11, 12, 13, 14])
+    chamadas = []
+
+    def _upper(valores):
+        chamadas.append(len(valores))
+        return valores.str.upper().str.strip()
+
+    resultado = mapear_categorias(serie, _upper)
+
+    assert chamadas == [4]   # 3 distintos + o nulo
+    assert isinstance(resultado.dtype, pd.CategoricalDtype)
+    assert list(resultado.index) == [10, 11, 12, 13, 14]
+    assert resultado.tolist()[:2] == ["JADLOG", "JADLOG"]
+    assert pd.isna(resultado.iloc[2])
+    assert sorted(resultado.cat.categories) == ["JADLOG", "PATRUS"]
+    assert preencher_nulos(resultado, "N/A").tolist()[2] == "N/A"
+
+
+def test_categorizar_colunas_so_converte_baixa_cardinalidade():
+    n = 2_000
+    df = pd.DataFrame({
+        "Nota Fiscal": [str(i) for i in range(n)],
+        "UF": np.where(np.arange(n) % 2, "SP", "RJ"),
+        "Valor": np.arange(n),
+    })
+    categorizar_colunas(df)
+
+    assert isinstance(df["UF"].dtype, pd.CategoricalDtype)
+    assert not isinstance(df["Nota Fiscal"].dtype, pd.CategoricalDtype)
+    assert df["Valor"].dtype == np.int64
+
+
+def test_intercalar_une_categorias_e_respeita_posicoes():
+    a = pd.Series(["JADLOG", None, "PATRUS"], dtype="category")
+    b = pd.Series(["TOTAL", "JADLOG"], dtype="category")
+
+    resultado = intercalar([(np.array([0, 2, 4]), a), (np.array([1, 3]), b)], 5, index=[7, 8, 9, 10, 11])
+
+    assert isinstance(resultado.dtype, pd.CategoricalDtype)
+    assert list(resultado.index) == [7, 8, 9, 10, 11]
+    assert resultado.tolist()[:2] == ["JADLOG", "TOTAL"]
+    assert pd.isna(resultado.iloc[2])
+    assert resultado.tolist()[3:] == ["JADLOG", "PATRUS"]
+    assert list(resultado.cat.categories) == ["JADLOG", "PATRUS", "TOTAL"]
+
+    texto = intercalar([(np.array([1]), pd.Series(["x"])), (np.array([0]), a.iloc[:1])], 2)
+    assert texto.tolist() == ["JADLOG", "x"]
+
+
+def test_validacao_com_entrada_category_igual_a_entrada_texto():
+    df_inteli = pd.DataFrame({
+        "Data Criação": ["2026-04-01 10:00:00", "2026-04-02", "2026-04-03"],
+        "Previsão Entrega Cliente Original": ["2026-04-10", "2026-04-11", "2026-04-12"],
+        "UF": ["sp", "RJ", None],
+        "Transportadora": ["JADLOG", "Total", "Desconhecida"],
+        "Pedido": ["PED-1", "PED-2", "PED-3"],
+        "Chave da Nota": ["CHV1", "CHV2", "CHV3"],
+        "Canal de Vendas": ["Mercado Livre", "Magalu", "magalu"],
+        "marketplace": ["ML-100", "SH-200", "SH-300"],
+        "Nota Fiscal": ["12345", "12346", "12347"],
+    })
+    df_sys = pd.DataFrame({
+        "Nota Fiscal": ["12345", "12346", "12347"],
+        "Chave NF_sys": ["CHV1", "CHV2", "CHV3"],
+        "Pedido_sys": ["ML-100", "SH-200", "SH-300"],
+        "UF_sys": ["SP", "RJ", "MG"],
+        "Marketplace_sys": ["MERCADO LIVRE", "SHOPEE", "SHOPEE"],
+        "Transportadora_sys": ["JADLOG", "PATRUS", "Outra"],
+    })
+    baixa = ["UF", "Transportadora", "Canal de Vendas"]
+    df_inteli_cat = df_inteli.astype({c: "category" for c in baixa})
+    processor = DataProcessor()
+
+    (texto, _), _ = processor.processar_validacao_transportadora(df_inteli, df_sys, set())
+    (cat, _), _ = processor.processar_validacao_transportadora(df_inteli_cat, df_sys, set())
+
+    pd.testing.assert_frame_equal(texto.astype(object), cat.astype(object))
+    assert isinstance(cat["STATUS DA TRANSPORTADORA"].dtype, pd.CategoricalDtype)
+    assert cat["STATUS DA TRANSPORTADORA"].tolist() == ["Verdadeiro", "Falso", "Não Localizado"]
@@ -0,0 +1,106 @@
+"""
+Testes da chave de acesso compacta (utils/chave_acesso.py) e do cruzamento
+opcional da Validação por chave.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_chave_acesso.py -v
+"""
+import pandas as pd
+
+from core.processor import DataProcessor
+from utils.chave_acesso import IndiceChaveAcesso, chave_acesso_valida
+
+
+def _com_dv(chave43):
+    """Completa 43 dígitos com o DV do módulo 11 (pesos 2..9 da direita para a esquerda)."""
+    soma = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(chave43)))
+    resto = soma % 11
+    return chave43 + str(0 if resto < 2 else 11 - resto)
+
+
+CHAVE_A = _com_dv("3526041234567800019055001000012345100012345")
+CHAVE_B = _com_dv("3526049876543200019055002000012345100054321")
+
+
+def test_valida_formato_e_digito_verificador():
+    errada = CHAVE_A[:-1] + str((int(CHAVE_A[-1]) + 1) % 10)
+    serie = pd.Series([CHAVE_A, errada, CHAVE_A[:-1], "", None, "N/A", float(CHAVE_B), " " + CHAVE_B])
+
+    assert chave_acesso_valida(serie).tolist() == [True, False, False, False, False, False, False, True]
+
+
+def test_indice_devolve_primeira_linha_da_chave_exata():
+    indice = IndiceChaveAcesso(pd.Series(["N/A", CHAVE_B, CHAVE_A, CHAVE_B, ""]))
+
+    linhas = indice.linhas(pd.Series([CHAVE_A, CHAVE_B, CHAVE_A[:-1] + "0", "", CHAVE_B + ".0"]))
+
+    assert len(indice) == 2
+    assert linhas.tolist() == [2, 1, -1, -1, 1]
+
+
+def test_validacao_casa_pela_chave_quando_a_nf_se_repete():
+    df_inteli = pd.DataFrame({
+        "Data Criação": ["2026-04-01"],
+        "Previsão Entrega Cliente Original": ["2026-04-10"],
+        "UF": ["SP"],
+        "Transportadora": ["PATRUS"],
+        "Pedido": ["PED-1"],
+        "Chave da Nota": [CHAVE_B],
+        "Canal de Vendas": ["Magalu"],
+        "marketplace": ["SH-2"],
+        "Nota Fiscal": ["12345"],
+    })
+    # Mesma NF em duas séries: pelo número, a 1ª linha (JADLOG) seria usada.
+    df_sys = pd.DataFrame({
+        "Nota Fiscal": ["12345", "12345"],
+        "Chave NF_sys": [CHAVE_A, CHAVE_B],
+        "Pedido_sys": ["ML-1", "SH-2"],
+        "UF_sys": ["SP", "SP"],
+        "Marketplace_sys": ["MAGALU", "MAGALU"],
+        "Transportadora_sys": ["JADLOG", "PATRUS"],
+    })
+    processor = DataProcessor()
+    indice = processor.indice_sysemp(df_sys)
+
+    (por_nf, _), _ = processor.processar_validacao_transportadora(df_inteli.copy(), indice, set())
+    (por_chave, _), _ = processor.processar_validacao_transportadora(
+        df_inteli.copy(), indice, set(), por_chave_acesso=True
+    )
+
+    assert por_nf["STATUS DA TRANSPORTADORA"].tolist() == ["Falso"]
+    assert por_chave["STATUS DA TRANSPORTADORA"].tolist() == ["Verdadeiro"]
+    assert por_chave["N° PEDIDO"].tolist() == ["SH-2"]
+
+
+def test_pedido_da_nota_casada_pela_chave_nao_vem_do_bruto_por_nf():
+    df_inteli = pd.DataFrame({
+        "Data Criação": ["2026-04-01"],
+        "Previsão Entrega Cliente Original": ["2026-04-10"],
+        "UF": ["SP"],
+        "Transportadora": ["PATRUS"],
+        "Pedido": ["PED-1"],
+        "Chave da Nota": [CHAVE_B],
+        "Canal de Vendas": ["Magalu"],
+        "marketplace": ["MGL-9"],
+        "Nota Fiscal": ["12345"],
+    })
+    df_sys = pd.DataFrame({
+        "Nota Fiscal": ["12345", "12345"],
+        "Chave NF_sys": [CHAVE_A, CHAVE_B],
+        "Pedido_sys": ["ML-1", "SH-2"],
+        "UF_sys": ["SP", "SP"],
+        "Marketplace_sys": ["MAGALU", "MAGALU"],
+        "Transportadora_sys": ["JADLOG", "PATRUS"],
+    })
+    # O bruto só tem NF e pedido: pela NF, o pedido seria o da 1ª nota.
+    df_sys_raw = pd.DataFrame({"Nota Fiscal": ["12345", "12345"], "Pedido Marketplace": ["ML-1", "SH-2"]})
+    processor = DataProcessor()
+    indice = processor.indice_sysemp(df_sys, df_sys_raw)
+
+    (por_nf, _), _ = processor.processar_validacao_transportadora(df_inteli.copy(), indice, set())
+    (por_chave, _), _ = processor.processar_validacao_transportadora(
+        df_inteli.copy(), indice, set(), por_chave_acesso=True
+    )
+
+    assert por_nf["N° PEDIDO"].tolist() == ["ML-1"]
+    assert por_chave["N° PEDIDO"].tolist() == ["SH-2"]
@@ -0,0 +1,41 @@
+"""
+Testes do motor de datas (parse dos únicos + broadcast).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_datas.py -v
+"""
+import numpy as np
+import pandas as pd
+
+from utils.datas import formatar_datas_br
+
+
+def test_formata_texto_e_data_tipada():
+    serie = pd.Series([
+        "2026-03-29 12:51:46", "2026-03-29", "13/04/2026", "VERIFICAR", None, "",
+    ], index=[5, 6, 7, 8, 9, 10])
+    texto, datas = formatar_datas_br(serie)
+
+    assert texto.tolist() == [
+        "29/03/2026 12:51:46", "29/03/2026", "13/04/2026", "VERIFICAR", "", "",
+    ]
+    assert texto.index.tolist() == [5, 6, 7, 8, 9, 10]
+    assert datas.iloc[0] == pd.Timestamp("2026-03-29")  # hora descartada
+    assert datas.iloc[2] == pd.Timestamp("2026-04-13")
+    assert datas.iloc[3:].isna().all()
+
+
+def test_data_tipada_bate_com_reparse_do_texto_exibido():
+    """O filtro de modo usava o texto DD/MM/YYYY reparseado com dayfirst."""
+    serie = pd.Series(["2026-04-01", "2026-04-01 08:00:00", "10/04/2026 manhã", np.nan] * 50)
+    texto, datas = formatar_datas_br(serie)
+
+    reparse = pd.to_datetime(
+        texto.str.split(" ", n=1).str[0], errors="coerce", dayfirst=True, format="mixed"
+    )
+    assert datas.tolist() == reparse.astype("datetime64[ns]").tolist()
+
+
+def test_serie_vazia():
+    texto, datas = formatar_datas_br(pd.Series([], dtype=object))
+    assert texto.empty and datas.empty
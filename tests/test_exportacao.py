@@ -0,0 +1,67 @@
+"""
+Testes da exportação .xlsx em streaming.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_exportacao.py -v
+"""
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from utils.exportacao import gerar_planilha_excel
+
+CHAVE = "35260412345678000190550010003649821000000017"
+
+
+def _abrir(conteudo):
+    return openpyxl.load_workbook(io.BytesIO(conteudo))
+
+
+def test_planilha_abre_no_openpyxl_com_as_abas_e_valores():
+    df = pd.DataFrame({
+        "NOTA FISCAL": ["000123", "456", None],
+        "Chave NF": [CHAVE, None, ""],
+        "OCORRÊNCIA": ["A & B <teste>", "ÇÃO", "\x01controle"],
+        "VALOR": [1.5, np.nan, 3.0],
+    })
+    wb = _abrir(gerar_planilha_excel({"Validação": df, "Descartadas (Histórico)": df.iloc[:0]}))
+
+    assert wb.sheetnames == ["Validação", "Descartadas (Histórico)"]
+    linhas = list(wb["Validação"].iter_rows(values_only=True))
+    assert linhas[0] == ("NOTA FISCAL", "Chave NF", "OCORRÊNCIA", "VALOR")
+    assert linhas[1] == ("000123", CHAVE, "A & B <teste>", 1.5)
+    assert linhas[2] == ("456", None, "ÇÃO", None)
+    assert linhas[3] == (None, None, "controle", 3.0)
+    assert list(wb["Descartadas (Histórico)"].iter_rows(values_only=True)) == [linhas[0]]
+
+
+def test_chave_nf_sai_como_texto_e_cabecalho_em_negrito():
+    df = pd.DataFrame({"NOTA FISCAL": ["1", "2"], "Chave NF": [CHAVE, CHAVE]})
+    ws = _abrir(gerar_planilha_excel({"Aba": df})).active
+
+    assert ws["A1"].font.b and ws["B1"].font.b
+    assert [c.number_format for c in ws["B"][1:]] == ["@", "@"]
+    assert ws["A2"].number_format == "General"
+    assert ws["B2"].value == CHAVE
+
+
+def test_grava_em_caminho_igual_aos_bytes(tmp_path):
+    df = pd.DataFrame({"NOTA FISCAL": [str(i) for i in range(5)]})
+    destino = tmp_path / "saida.xlsx"
+
+    assert gerar_planilha_excel({"Aba": df}, destino=destino) is None
+    lido = pd.read_excel(destino, dtype=str)
+    assert lido["NOTA FISCAL"].tolist() == df["NOTA FISCAL"].tolist()
+
+
+def test_pd_na_sai_como_celula_vazia():
+    df = pd.DataFrame({
+        "MISTA": pd.Series([1, "texto", pd.NA, np.datetime64("NaT")], dtype=object),
+        "NULAVEL": pd.Series(["a", pd.NA, "c", None], dtype="string"),
+        "INTEIRO": pd.Series([1, pd.NA, 3, 4], dtype="Int64"),
+    })
+    linhas = list(_abrir(gerar_planilha_excel({"Aba": df})).active.iter_rows(values_only=True))
+
+    assert linhas[1:] == [(1, "a", 1), ("texto", None, None), (None, "c", 3), (None, None, 4)]
@@ -0,0 +1,94 @@
+"""
+Testes do histórico persistente de NFs.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_historico.py -v
+"""
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from core.historico import ConjuntoNF, HistoricoStore
+from core.processor import DataProcessor
+
+
+@pytest.fixture
+def store(tmp_path):
+    return HistoricoStore(str(tmp_path / "historico.sqlite"))
+
+
+def test_registrar_normaliza_e_ignora_repetidas(store):
+    assert store.registrar(["364.982,", "364982", "12345.0", "", None]) == 2
+    assert store.registrar(["12345"]) == 0
+    assert len(store) == 2
+
+
+def test_contem_em_lote(store):
+    store.registrar(["100", "200"])
+    mask = store.contem(pd.Series(["100", "300", "", "200", "100"]))
+    assert mask.tolist() == [True, False, False, True, True]
+
+
+def test_conjunto_nf_por_chave_igual_ao_set():
+    hist = ConjuntoNF.de_nfs({"100", "0100", "200"}) | {"300"}
+    serie = pd.Series(["100", "0100", "00100", "300", "", "400"])
+
+    assert len(hist) == 4
+    assert hist.contem(serie).tolist() == serie.isin({"100", "0100", "200", "300"}).tolist()
+    assert len(ConjuntoNF()) == 0
+
+
+def test_importar_planilha(store):
+    buf = io.BytesIO("NF;Status\n1.234;ok\n5678;ok\n".encode("utf-8"))
+    buf.name = "hist.csv"
+    assert store.importar_planilha(buf) == 2
+    assert store.contem(pd.Series(["1234"])).tolist() == [True]
+
+
+def test_validacao_aceita_store_no_lugar_do_set(store):
+    store.registrar(["12345"])
+    df_inteli = pd.DataFrame({
+        "Nota Fiscal": ["12345", "12346"],
+        "Transportadora": ["JADLOG", "TOTAL"],
+        "Previsão Entrega Cliente Original": ["2020-01-01", "2020-01-01"],
+    })
+    df_sys = pd.DataFrame(
+        [["12346", "CHV2", "SH-200", "RJ", "SHOPEE", "TOTAL"]],
+        columns=["Nota Fiscal", "Chave NF_sys", "Pedido_sys", "UF_sys",
+                 "Marketplace_sys", "Transportadora_sys"],
+    )
+    (df_final, df_desc), err = DataProcessor().processar_validacao_transportadora(df_inteli, df_sys, store)
+
+    assert err is None
+    assert df_final["NOTA FISCAL"].tolist() == ["12346"]
+    assert df_desc["NOTA FISCAL"].tolist() == ["12345"]
+
+
+def test_conexoes_sao_fechadas_apos_cada_chamada(store, monkeypatch):
+    abertas = []
+    conectar = sqlite3.connect
+
+    def conectar_e_guardar(*args, **kwargs):
+        abertas.append(conectar(*args, **kwargs))
+        return abertas[-1]
+
+    monkeypatch.setattr("core.historico.sqlite3.connect", conectar_e_guardar)
+
+    store.registrar(["100"])
+    store.contem(pd.Series(["100"]))
+    len(store)
+
+    assert len(abertas) == 3
+    for con in abertas:
+        with pytest.raises(sqlite3.ProgrammingError):
+            con.execute("SELECT 1")
+
+
+def test_planilha_de_historico_ilegivel_levanta_erro():
+    arquivo = io.BytesIO(b"nao e um xlsx")
+    arquivo.name = "historico.xlsx"
+
+    with pytest.raises(ValueError, match="historico.xlsx"):
+        DataProcessor().carregar_base_historico(arquivo)
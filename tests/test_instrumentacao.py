@@ -0,0 +1,104 @@
+"""
+Testes da medição por etapa (utils/instrumentacao.py) no DataProcessor.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_instrumentacao.py -v
+"""
+import numpy as np
+import pandas as pd
+
+from core.processor import DataProcessor
+from utils.instrumentacao import SEM_INSTRUMENTACAO, Instrumentacao
+
+
+def _entradas():
+    df_inteli = pd.DataFrame({
+        "Data Criação": ["01/04/2026", "02/04/2026", "03/04/2026"],
+        "Previsão Entrega Cliente Original": ["10/04/2026", "11/04/2026", "12/04/2026"],
+        "UF": ["SP", "RJ", "MG"],
+        "Transportadora": ["JADLOG", "Total", "JADLOG"],
+        "Pedido": ["PED-1", "PED-2", "PED-3"],
+        "Chave da Nota": ["CHV1", "CHV2", "CHV3"],
+        "Canal de Vendas": ["MERCADO LIVRE", "SHOPEE", "SHOPEE"],
+        "marketplace": ["ML-100", "SH-200", "SH-300"],
+        "Nota Fiscal": ["12345", "12346", "12347"],
+    })
+    df_sys = pd.DataFrame({
+        "Nota Fiscal": ["12345", "12346"],
+        "Chave NF_sys": ["CHV1", "CHV2"],
+        "Pedido_sys": ["ML-100", "SH-200"],
+        "UF_sys": ["SP", "RJ"],
+        "Marketplace_sys": ["MERCADO LIVRE", "SHOPEE"],
+        "Transportadora_sys": ["JADLOG", "PATRUS"],
+    })
+    return df_inteli, df_sys
+
+
+def test_etapas_da_validacao_registram_linhas_e_tempo():
+    instr = Instrumentacao()
+    df_inteli, df_sys = _entradas()
+    (df_final, _), err = DataProcessor(instr).processar_validacao_transportadora(
+        df_inteli, df_sys, {"12347"}
+    )
+
+    assert err is None
+    medidas = {m.nome: m for m in instr.etapas}
+    # As SHOPEE não têm a coluna de previsão delas (DATA PREVISTA vazia):
+    # saem na janela, antes do histórico e dos merges.
+    assert medidas["DATA PREVISTA + janela dos modos"].linhas_entrada == 3
+    assert medidas["DATA PREVISTA + janela dos modos"].linhas_saida == 1
+    assert medidas["divisão pelo histórico"].linhas_entrada == 3
+    assert medidas["divisão pelo histórico"].linhas_saida == 2
+    assert medidas["merge Sysemp (NF)"].linhas_saida == 1
+    assert medidas["montagem da saída"].linhas_saida == 1
+    assert medidas["filtro de DATA PREVISTA (atraso)"].linhas_saida == len(df_final)
+    assert all(m.tempo_s is not None and m.tempo_s >= 0 for m in instr.etapas)
+
+    tabela = instr.como_dataframe()
+    assert list(tabela.columns) == [
+        "nome", "linhas_entrada", "linhas_saida", "tempo_s", "memoria_delta_mb", "memoria_pico_mb",
+    ]
+    assert tabela["memoria_pico_mb"].isna().all()   # pico só com pico_memoria=True
+    assert len(tabela) == len(instr.etapas)
+
+
+def test_etapas_aninhadas_e_callback():
+    concluidas = []
+    instr = Instrumentacao(callback=lambda m: concluidas.append(m.nome))
+    with instr.etapa("externa", entrada=10) as externa:
+        with instr.etapa("interna"):
+            pass
+        externa.saida(4)
+
+    assert [m.nivel for m in instr.etapas] == [0, 1]
+    assert concluidas == ["interna", "externa"]
+    assert instr.etapas[0].linhas_saida == 4
+    assert "  interna" in instr.tabela()
+
+
+def test_pico_de_memoria_por_etapa_inclui_o_das_aninhadas():
+    import tracemalloc
+
+    instr = Instrumentacao(pico_memoria=True)
+    with instr.etapa("externa"):
+        with instr.etapa("interna"):
+            blocos = [np.ones(2**20, dtype=np.uint8) for _ in range(8)]   # ~8 MB
+            del blocos
+        with instr.etapa("leve"):
+            pass
+
+    pico = {m.nome: m.memoria_pico_mb for m in instr.etapas}
+    assert 7.5 < pico["interna"] < 9
+    assert pico["externa"] >= pico["interna"]
+    assert pico["leve"] < 1
+    assert "pico" in instr.tabela()
+    assert not tracemalloc.is_tracing()
+
+
+def test_sem_instrumentacao_por_padrao():
+    processor = DataProcessor()
+    df_inteli, df_sys = _entradas()
+    processor.processar_validacao_transportadora(df_inteli, df_sys, set())
+
+    assert processor.instrumentacao is SEM_INSTRUMENTACAO
+    assert list(processor.instrumentacao.etapas) == []
@@ -0,0 +1,86 @@
+"""
+Testes de paridade da normalização vetorizada de NF / Pedido.
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_normalizacao.py -v
+"""
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.processor import DataProcessor
+from utils.helpers import normalizar_nf
+from utils.normalizacao import CHAVE_NF_LONGA, NF_VAZIA, chave_nf_serie, normalizar_nf_serie, normalizar_pedido_serie
+
+
+VALORES_SUJOS = [
+    "364.982,", "364982", " 12345 ", "12345.0", 12345.0, 12345, "NaN", "nan",
+    "NAN", None, np.nan, "", "   ", "ML-100", "SH-200.0", "1.0.0", "0.0",
+    "12.345.678/0001", "abc", "12345.00", ".0", "nan.0", "\t987\n",
+]
+
+
+@pytest.mark.parametrize("dtype", [object, None])
+def test_normalizar_nf_serie_igual_a_versao_escalar(dtype):
+    serie = pd.Series(VALORES_SUJOS, dtype=dtype)
+    esperado = [normalizar_nf(v) for v in serie]
+    assert normalizar_nf_serie(serie).tolist() == esperado
+
+
+@pytest.mark.parametrize("dtype", [object, None])
+def test_normalizar_pedido_serie_igual_a_versao_escalar(dtype):
+    serie = pd.Series(VALORES_SUJOS, dtype=dtype)
+    esperado = [DataProcessor._normalizar_pedido(v) for v in serie]
+    assert normalizar_pedido_serie(serie).tolist() == esperado
+
+
+def test_preserva_indice_e_aceita_serie_vazia():
+    serie = pd.Series(["1.0", "2"], index=[10, 20])
+    assert normalizar_nf_serie(serie).index.tolist() == [10, 20]
+    assert normalizar_nf_serie(pd.Series([], dtype=object)).empty
+
+
+def test_coluna_numerica_lida_como_float():
+    serie = pd.Series([364982.0, np.nan, 7.0])
+    assert normalizar_nf_serie(serie).tolist() == ["364982", "", "7"]
+    assert normalizar_pedido_serie(serie).tolist() == ["364982", "", "7"]
+
+
+def test_chave_nf_distingue_zeros_a_esquerda_e_nfs_longas():
+    nfs = ["364982", "0364982", "00364982", "", "0", "1" * 18, "1" * 19, "0" + "1" * 18, "364982"]
+    chaves = chave_nf_serie(pd.Series(nfs))
+
+    assert chaves.dtype == np.int64
+    assert chaves[0] == 364982 and chaves[3] == NF_VAZIA
+    assert chaves[0] == chaves[-1]
+    assert len(set(chaves[:-1].tolist())) == len(nfs) - 1
+    assert chave_nf_serie(pd.Series(["1" * 19]))[0] == chaves[6]
+
+
+def test_chave_de_nf_longa_nao_depende_do_processo():
+    longas = ["4" * 44, "0" + "9" * 20, "1" * 19]
+    codigo = (
+        "import pandas as pd; from utils.normalizacao import chave_nf_serie; "
+        f"print(chave_nf_serie(pd.Series({longas!r})).tolist())"
+    )
+    # Outra ordem de primeira aparição, em outro processo: mesmas chaves.
+    chave_nf_serie(pd.Series(["8" * 30] + longas[::-1]))
+    saida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    chaves = chave_nf_serie(pd.Series(longas))
+    assert saida.stdout.strip() == str(chaves.tolist())
+    assert (chaves <= CHAVE_NF_LONGA).all()
+
+
+def test_chaves_de_nfs_longas_ficam_fora_da_faixa_das_exatas():
+    exatas = chave_nf_serie(pd.Series(["9" * 18, "1", "0", "0" + "9" * 16, "1" * 17]))
+    longas = chave_nf_serie(pd.Series([str(10 ** 18 + i) for i in range(5_000)] + ["0" * 18, "4" * 44]))
+
+    assert longas.max() <= CHAVE_NF_LONGA < exatas.min()
+    assert NF_VAZIA not in longas
+    assert len(set(longas.tolist())) == len(longas)
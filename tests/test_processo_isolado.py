@@ -0,0 +1,94 @@
+"""
+Testes do processamento em processo isolado (core/processo_isolado.py).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_processo_isolado.py -v
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from core.processo_isolado import FalhaProcessoIsolado, executar_isolado, gravar_arrow, ler_arrow
+from core.processor import DataProcessor
+from utils.helpers import carregar_arquivo
+from utils.instrumentacao import Instrumentacao
+
+
+def _arquivo(conteudo, nome):
+    buf = io.BytesIO(conteudo if isinstance(conteudo, bytes) else conteudo.encode("utf-8"))
+    buf.name = nome
+    return buf
+
+
+SYSEMP_CSV = (
+    "Empresa;Nota Fiscal;Chave NFe;Pedido Marketplace;UF;Marketplace;Transportadora\n"
+    "10;100;CHV0;PED-0;SP;SHOPEE;JADLOG\n"
+    "16;364982;CHV1;ML-100;SP;MERCADO LIVRE;JADLOG\n"
+    "21;12346;CHV3;SH-200;RJ;SHOPEE;TOTAL\n"
+)
+INTELIPOST_CSV = (
+    "Nota Fiscal;Transportadora;marketplace;UF;MicroStatus\n"
+    "100;JADLOG;PED-0;SP;EXTRAVIO CONFIRMADO\n"
+    "364982;JADLOG;ML-100;SP;AVARIA\n"
+    "12346;TOTAL;SH-200;RJ;EXTRAVIO CONFIRMADO\n"
+    "555;PATRUS;X-1;MG;AVARIA\n"
+)
+HISTORICO_CSV = "Nota Fiscal\n12346\n"
+
+
+def test_arrow_ida_e_volta_mantem_indice_categorias_e_frame_vazio(tmp_path):
+    df = pd.DataFrame(
+        {"NF": ["1", None, "3"], "UF": pd.Categorical(["SP", "RJ", "SP"]), "DATA": pd.to_datetime(["2026-01-02", None, "2026-03-04"])},
+        index=[7, 3, 9],
+    )
+    gravar_arrow(df, tmp_path / "df.arrow")
+    gravar_arrow(df.iloc[:0], tmp_path / "vazio.arrow")
+
+    pd.testing.assert_frame_equal(ler_arrow(tmp_path / "df.arrow"), df)
+    vazio = ler_arrow(tmp_path / "vazio.arrow")
+    assert vazio.empty and list(vazio.columns) == list(df.columns)
+    assert isinstance(vazio["UF"].dtype, pd.CategoricalDtype)
+
+
+def test_resultado_isolado_igual_ao_do_processo_do_app():
+    instr = Instrumentacao()
+    avisos = []
+    arquivos = {
+        "origem": _arquivo(INTELIPOST_CSV, "inteli.csv"),
+        "sysemp": _arquivo(SYSEMP_CSV, "sysemp.csv"),
+        "historico": _arquivo(HISTORICO_CSV, "hist.csv"),
+    }
+    layouts = {}
+    resultado, err = executar_isolado(
+        "intelipost", arquivos, avisar=avisos.append, instrumentacao=instr, layouts=layouts
+    )
+    assert err is None
+
+    processor = DataProcessor()
+    origem = carregar_arquivo(_arquivo(INTELIPOST_CSV, "inteli.csv"), colunas=processor.projecao("intelipost"))
+    sysemp = processor.indice_sysemp(*processor.carregar_sysemp_em_blocos(_arquivo(SYSEMP_CSV, "sysemp.csv"))[0])
+    historico = processor.carregar_base_historico(_arquivo(HISTORICO_CSV, "hist.csv"))
+    esperado, _ = processor.processar_fluxo("intelipost", origem, sysemp, historico)
+
+    (df_f, df_r), (esp_f, esp_r) = resultado["resultados"]["intelipost"], esperado["intelipost"]
+    pd.testing.assert_frame_equal(df_f, esp_f)
+    pd.testing.assert_frame_equal(df_r, esp_r)
+    assert len(df_r) == 1
+    # Progresso e etapas medidas no filho chegam ao processo do app.
+    assert avisos[0].startswith("📖")
+    assert {"leitura da origem", "gravação Arrow IPC"} <= {m.nome for m in instr.etapas}
+    # Os cabeçalhos vistos no filho voltam para o acompanhamento da sessão.
+    assert layouts["intelipost"] == list(origem.columns)
+
+
+def test_erro_do_motor_e_falha_inesperada_no_filho():
+    sysemp = _arquivo(SYSEMP_CSV, "sysemp.csv")
+    sem_nf = _arquivo("Transportadora;UF\nJADLOG;SP\n", "inteli.csv")
+    resultado, err = executar_isolado("intelipost", {"origem": sem_nf, "sysemp": sysemp})
+    assert resultado is None and err
+
+    corrompido = _arquivo(b"nao e um xlsx", "inteli.xlsx")
+    with pytest.raises(FalhaProcessoIsolado) as falha:
+        executar_isolado("intelipost", {"origem": corrompido, "sysemp": sysemp})
+    assert "Traceback" in falha.value.log
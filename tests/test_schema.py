@@ -0,0 +1,70 @@
+"""
+Testes da resolução de colunas por papel (core/schema.py).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_schema.py -v
+"""
+from core.config import PAPEIS_SYSEMP, PAPEIS_VALIDACAO
+from core.schema import AcompanhamentoLayout, SchemaResolver
+from utils.helpers import encontrar_coluna
+
+
+def test_resolve_igual_a_encontrar_coluna():
+    cabecalhos = [
+        ["nota fiscal", " NF ", "Transportadora", "UF", "Estado", "Data Criacao", "CANAL DE VENDAS"],
+        ["Numero NF", "Nota Fiscal ", "transp", " Estado", "Pedido ID", "Chave NFe", "Marketplace"],
+        ["Empresa", "Pedido", "Pedido Marketplace", "Destinatário UF", "Chave"],
+        [],
+    ]
+    resolvedor = SchemaResolver()
+    for cabecalho in cabecalhos:
+        for fluxo, papeis in (("validacao", PAPEIS_VALIDACAO), ("sysemp", PAPEIS_SYSEMP)):
+            esquema = resolvedor.resolver(cabecalho, fluxo)
+            esperado = {papel: encontrar_coluna(cabecalho, c) for papel, c in papeis.items()}
+            assert esquema.colunas == esperado
+            assert set(esquema.faltantes) == {p for p, c in esperado.items() if c is None}
+
+
+def test_perfil_fica_em_cache_pela_assinatura_do_cabecalho():
+    resolvedor = SchemaResolver()
+    primeiro = resolvedor.resolver(["Nota Fiscal", "Cod Empresa", "Pedido do Marketplace"], "sysemp")
+    segundo = resolvedor.resolver(["Nota Fiscal", "Cod Empresa", "Pedido do Marketplace"], "sysemp")
+
+    assert segundo is primeiro
+    assert (resolvedor.falhas, resolvedor.acertos) == (1, 1)
+    assert primeiro.contendo("EMPRESA") == ["Cod Empresa"]
+    assert primeiro.contendo("PEDIDO", "MARKETPLACE") == ["Pedido do Marketplace"]
+
+
+def test_mudanca_de_layout_vira_deriva_do_fluxo():
+    resolvedor = AcompanhamentoLayout(SchemaResolver())
+    resolvedor.resolver(["Nota Fiscal", "Transportadora", "UF"], "validacao")
+    # Cabeçalho completo da leitura projetada não entra no acompanhamento.
+    resolvedor.resolver(["Nota Fiscal", "Transportadora", "UF", "Extra"], "validacao", acompanhar=False)
+    resolvedor.resolver(["NF", "Transportadora", "Estado"], "validacao")
+
+    derivas = resolvedor.retirar_derivas()
+
+    assert len(derivas) == 1
+    assert derivas[0].papeis == {"nf": ("Nota Fiscal", "NF"), "uf": ("UF", "Estado")}
+    assert derivas[0].colunas_novas == ["NF", "Estado"]
+    assert derivas[0].descricao().startswith("validacao: 'uf': 'UF' -> 'Estado'")
+    assert resolvedor.retirar_derivas() == []
+
+
+def test_deriva_e_por_sessao_e_o_cache_de_perfis_e_compartilhado():
+    compartilhado = SchemaResolver()
+    sessao_a, sessao_b = {}, {}
+    AcompanhamentoLayout(compartilhado, sessao_a).resolver(["Nota Fiscal", "UF"], "validacao")
+    AcompanhamentoLayout(compartilhado, sessao_b).resolver(["Nota Fiscal", "UF"], "validacao")
+
+    # Outra sessão com outro layout, ao mesmo tempo: não é deriva da sessão A.
+    rodada_b = AcompanhamentoLayout(compartilhado, sessao_b)
+    rodada_b.resolver(["NF", "Estado"], "validacao")
+    rodada_a = AcompanhamentoLayout(compartilhado, sessao_a)
+    rodada_a.resolver(["Nota Fiscal", "UF"], "validacao")
+
+    assert rodada_a.retirar_derivas() == []
+    assert [d.papeis["nf"] for d in rodada_b.retirar_derivas()] == [("Nota Fiscal", "NF")]
+    assert sessao_b == {"validacao": ["NF", "Estado"]}
+    assert (compartilhado.falhas, len(compartilhado)) == (2, 2)
@@ -0,0 +1,95 @@
+"""
+Testes do índice do Sysemp por Nota Fiscal (core/sysemp_index.py).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_sysemp_index.py -v
+"""
+import pickle
+
+import pandas as pd
+
+from core.processor import DataProcessor
+from core.sysemp_index import SysempIndex
+
+
+def _chave_acesso(i):
+    """Chave de acesso válida (44 dígitos, DV do módulo 11) terminada em `i`."""
+    chave43 = f"35260412345678000190550010000123451000{i:05d}"
+    soma = sum(int(d) * (2 + k % 8) for k, d in enumerate(reversed(chave43)))
+    return chave43 + str(0 if soma % 11 < 2 else 11 - soma % 11)
+
+
+def _sysemp():
+    return pd.DataFrame({
+        "Nota Fiscal": ["100", "200", "100", "", "300", ""],
+        "Chave NF_sys": ["C1", "C2", "C3", "C4", "C5", "C6"],
+        "Pedido_sys": ["ML-1", "sh-2", "ML-3", "X-4", "ML-5", "X-6"],
+        "UF_sys": ["SP", "RJ", "SP", "MG", "PR", "BA"],
+        "Transportadora_sys": ["JADLOG", "PATRUS", "TOTAL", "JADLOG", "PATRUS", "TOTAL"],
+    })
+
+
+def test_juntar_igual_ao_merge_com_nfs_repetidas_e_vazias():
+    base = _sysemp()
+    df = pd.DataFrame({"Nota Fiscal": ["100", "999", "", "300", "100"], "Valor": [1, 2, 3, 4, 5]},
+                      index=[7, 8, 9, 10, 11])
+
+    resultado = SysempIndex(base).juntar(df)
+
+    esperado = pd.merge(df, base, on="Nota Fiscal", how="left")
+    pd.testing.assert_frame_equal(resultado.astype(object), esperado.astype(object))
+
+
+def test_primeira_linha_e_pedido_bruto_pegam_a_primeira_ocorrencia():
+    bruto = pd.DataFrame({
+        "Nota Fiscal": ["200.0", "100", "100", "300"],
+        "Pedido Marketplace": ["PED-A", "", "PED-B", "PED-C"],
+    })
+    indice = SysempIndex(_sysemp(), bruto)
+    nfs = pd.Series(["100", "200", "", "404"])
+
+    linhas = indice.primeira_linha(nfs)
+    colunas = indice.colunas(linhas, ["Chave NF_sys", "Pedido_sys"])
+
+    assert linhas.tolist() == [0, 1, -1, -1]
+    assert list(colunas["Chave NF_sys"][:2]) == ["C1", "C2"]
+    assert pd.isna(colunas["Chave NF_sys"][2])
+    assert list(indice.pedido_bruto(nfs)[:2]) == ["PED-B", "PED-A"]
+    assert pd.isna(indice.pedido_bruto(nfs)[3])
+
+
+def test_validacao_com_indice_igual_a_validacao_com_dataframe():
+    df_inteli = pd.DataFrame({
+        "Data Criação": ["2026-04-01", "2026-04-02", "2026-04-03"],
+        "Previsão Entrega Cliente Original": ["2026-04-10", "2026-04-11", "2026-04-12"],
+        "UF": ["SP", "RJ", "PR"],
+        "Transportadora": ["JADLOG", "Total", "Patrus"],
+        "Pedido": ["PED-1", "PED-2", "PED-3"],
+        "Chave da Nota": ["C1", "C2", "C5"],
+        "Canal de Vendas": ["Mercado Livre", "Magalu", "Magalu"],
+        "marketplace": ["ML-1", "SH-2", "ML-5"],
+        "Nota Fiscal": ["100", "200", "300"],
+    })
+    processor = DataProcessor()
+    df_sys = _sysemp()
+
+    (com_df, desc_df), _ = processor.processar_validacao_transportadora(df_inteli.copy(), df_sys, set())
+    indice = processor.indice_sysemp(df_sys)
+    (com_indice, desc_indice), _ = processor.processar_validacao_transportadora(df_inteli.copy(), indice, set())
+
+    assert processor.indice_sysemp(indice) is indice
+    pd.testing.assert_frame_equal(com_df.astype(object), com_indice.astype(object))
+    pd.testing.assert_frame_equal(desc_df.astype(object), desc_indice.astype(object))
+
+
+def test_indice_para_o_cache_ja_conta_a_chave_de_acesso():
+    base = _sysemp().assign(**{"Chave NF_sys": [_chave_acesso(i) for i in range(6)]})
+    preguicoso = SysempIndex(base)
+    completo = SysempIndex(base, chave_acesso=True)
+
+    # O cache mede o tamanho ao guardar: o índice por chave já tem de estar lá.
+    assert completo.memoria_bytes() > preguicoso.memoria_bytes()
+    copia = pickle.loads(pickle.dumps(completo))
+    chaves = base["Chave NF_sys"].iloc[[4, 1]]
+    assert copia.linha_por_chave_acesso(chaves).tolist() == [4, 1]
+    assert preguicoso.linha_por_chave_acesso(chaves).tolist() == [4, 1]
@@ -0,0 +1,60 @@
+"""
+Testes das tarefas em segundo plano do app (utils/tarefas.py).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_tarefas.py -v
+"""
+import threading
+
+import pytest
+
+from utils.tarefas import CONCLUIDA, ERRO, EXECUTANDO, NA_FILA, FilaCheia, GerenciadorTarefas
+
+
+def test_resultado_erro_e_excecao_ficam_na_tarefa():
+    gerenciador = GerenciadorTarefas(max_simultaneas=1)
+
+    def com_etapa(tarefa):
+        tarefa.avisar("lendo")
+        with tarefa.instrumentacao.etapa("leitura", entrada=3) as etapa:
+            etapa.saida(2)
+        return {"linhas": 2}, None
+
+    ok = gerenciador.submeter(com_etapa, "ok")
+    recusada = gerenciador.submeter(lambda t: (None, "Coluna não encontrada."), "erro")
+    quebrou = gerenciador.submeter(lambda t: 1 / 0, "exceção")
+    for tarefa in (ok, recusada, quebrou):
+        assert tarefa.aguardar(5)
+
+    assert (ok.estado, ok.resultado, ok.avisos) == (CONCLUIDA, {"linhas": 2}, ["lendo"])
+    assert [m.nome for m in ok.instrumentacao.etapas] == ["leitura"]
+    assert (recusada.estado, recusada.erro, recusada.log) == (ERRO, "Coluna não encontrada.", None)
+    assert quebrou.estado == ERRO and "ZeroDivisionError" in quebrou.log
+    assert gerenciador.obter(ok.id) is ok
+
+
+def test_fila_limitada_e_uma_tarefa_ativa_por_sessao():
+    gerenciador = GerenciadorTarefas(max_simultaneas=1, max_fila=1)
+    comecou, liberar = threading.Event(), threading.Event()
+
+    def presa(tarefa):
+        comecou.set()
+        liberar.wait(5)
+        return None, None
+
+    primeira = gerenciador.submeter(presa, "a", sessao="s1")
+    assert comecou.wait(5)
+    segunda = gerenciador.submeter(presa, "b", sessao="s2")
+    with pytest.raises(RuntimeError, match="em andamento"):
+        gerenciador.submeter(presa, "c", sessao="s1")
+    with pytest.raises(FilaCheia, match="1 processamentos já aguardam na fila"):
+        gerenciador.submeter(presa, "d", sessao="s3")
+
+    assert primeira.estado == EXECUTANDO
+    assert segunda.estado == NA_FILA and gerenciador.posicao_na_fila(segunda) == 0
+    assert gerenciador.estatisticas()[NA_FILA] == 1
+
+    liberar.set()
+    assert segunda.aguardar(5)
+    # Terminadas não ocupam a fila nem bloqueiam a sessão.
+    assert gerenciador.submeter(lambda t: (None, None), "e", sessao="s1").aguardar(5)
@@ -0,0 +1,65 @@
+"""
+Testes das transformações por valor distinto com memo (utils/transformacao.py).
+
+Como rodar (a partir da raiz do repositório):
+    pytest tests/test_transformacao.py -v
+"""
+import numpy as np
+import pandas as pd
+
+from utils.transformacao import (
+    Transformacoes, com_dicionario, texto_maiusculo, texto_maiusculo_espacos,
+)
+
+
+def test_resultado_igual_a_cadeia_linha_a_linha():
+    serie = pd.Series(["jadlog  serra 18", " Patrus", None, "JADLOG SERRA 18", "outra"])
+    dicionario = {"JADLOG SERRA 18": "JADLOG", "PATRUS": "PATRUS"}
+    transf = Transformacoes({"canon": com_dicionario(texto_maiusculo_espacos, dicionario)})
+
+    resultado = transf.aplicar(serie, "canon")
+
+    normalizado = texto_maiusculo_espacos(serie)
+    esperado = normalizado.map(dicionario).fillna(normalizado)
+    assert resultado.astype(object).where(resultado.notna(), None).tolist() == \
+        esperado.astype(object).where(esperado.notna(), None).tolist()
+    assert isinstance(resultado.dtype, pd.CategoricalDtype)
+
+
+def test_none_e_nan_na_mesma_coluna_object_seguem_a_cadeia():
+    serie = pd.Series(["sp", None, np.nan, "sp", None], dtype=object)
+    transf = Transformacoes({"upper": texto_maiusculo})
+
+    primeira = transf.aplicar(serie, "upper")
+    segunda = transf.aplicar(serie, "upper")   # agora pelo memo
+
+    esperado = texto_maiusculo(serie)
+    for resultado in (primeira, segunda):
+        assert resultado.astype(object).where(resultado.notna(), None).tolist() == \
+            esperado.astype(object).where(esperado.notna(), None).tolist()
+
+
+def test_memo_so_transforma_valores_ainda_nao_vistos():
+    vistos = []
+
+    def _upper(valores):
+        vistos.extend(valores.tolist())
+        return texto_maiusculo(valores)
+
+    transf = Transformacoes({"upper": _upper})
+    transf.aplicar(pd.Series(["sp", "rj", "sp", None]), "upper")
+    segunda = transf.aplicar(pd.Series(["rj", "mg", None, "sp"], index=[7, 8, 9, 10]), "upper")
+
+    assert vistos[:2] == ["rj", "sp"] and pd.isna(vistos[2])
+    assert vistos[3:] == ["mg"]
+    assert transf.valores_transformados == 4
+    assert list(segunda.index) == [7, 8, 9, 10]
+    assert segunda.tolist()[:2] == ["RJ", "MG"] and segunda.tolist()[3] == "SP"
+
+
+def test_colunas_quase_chave_nao_entram_no_memo():
+    transf = Transformacoes({"upper": texto_maiusculo}, max_valores=3)
+    resultado = transf.aplicar(pd.Series(["a", "b", "c", "d"]), "upper")
+
+    assert resultado.tolist() == ["A", "B", "C", "D"]
+    assert transf._memo == {}
@@ -176,3 +176,101 @@ def test_normalizacao_de_pedido_com_sufixo_ponto_zero(processor):
     assert err is None
     assert df_final.iloc[0]["STATUS DA TRANSPORTADORA"] == "Verdadeiro"
     assert df_final.iloc[0]["N° PEDIDO"] == "12345"
+
+
+def test_multimodo_igual_a_chamadas_separadas(processor):
+    hoje = pd.Timestamp.now(tz="America/Sao_Paulo").normalize().tz_localize(None)
+    d = lambda dias: (hoje + pd.Timedelta(days=dias)).strftime("%Y-%m-%d")
+    df_inteli = _df_intelipost([
+        [d(-9), d(-3), "SP", "JADLOG", "PED-1", "CHV1", "MERCADO LIVRE", "ML-100", "12345"],
+        [d(-9), d(0),  "RJ", "TOTAL",  "PED-2", "CHV2", "MERCADO LIVRE", "ML-200", "12346"],
+        [d(-9), d(1),  "MG", "PATRUS", "PED-3", "CHV3", "MERCADO LIVRE", "ML-300", "12347"],
+        [d(-9), d(-1), "PR", "TOTAL",  "PED-4", "CHV4", "MERCADO LIVRE", "ML-400", "12348"],
+    ])
+    df_sys = _df_sysemp_tratado([
+        ["12345", "CHV1", "ML-100", "SP", "MERCADO LIVRE", "JADLOG"],
+        ["12346", "CHV2", "ML-200", "RJ", "MERCADO LIVRE", "PATRUS"],
+    ])
+
+    resultados, err = processor.processar_validacao_multimodo(df_inteli, df_sys, {"12348"})
+
+    assert err is None
+    for modo in ("atraso", "prevencao"):
+        (esperado_f, esperado_d), _ = processor.processar_validacao_transportadora(
+            df_inteli, df_sys, {"12348"}, modo=modo
+        )
+        pd.testing.assert_frame_equal(resultados[modo][0], esperado_f)
+        pd.testing.assert_frame_equal(resultados[modo][1], esperado_d)
+    assert resultados["atraso"][0]["NOTA FISCAL"].tolist() == ["12345"]
+    assert resultados["atraso"][1]["NOTA FISCAL"].tolist() == ["12348"]
+    assert resultados["prevencao"][0]["NOTA FISCAL"].tolist() == ["12346", "12347"]
+
+
+def test_janela_antes_dos_merges_mantem_linhas_valores_e_indice(processor):
+    hoje = pd.Timestamp.now(tz="America/Sao_Paulo").normalize().tz_localize(None)
+    d = lambda dias: (hoje + pd.Timedelta(days=dias)).strftime("%Y-%m-%d")
+    df_inteli = _df_intelipost([
+        [d(-9), d(0),  "SP", "JADLOG", "PED-1", "CHV1", "MERCADO LIVRE", "ML-100", "12345"],
+        [d(-9), d(-2), "RJ", "TOTAL",  "PED-2", "CHV2", "MERCADO LIVRE", "ML-200", "12346"],
+        [d(-9), d(1),  "MG", "PATRUS", "PED-3", "CHV3", "MERCADO LIVRE", "ML-300", "12347"],
+        [d(-9), d(5),  "PR", "TOTAL",  "PED-4", "CHV4", "MERCADO LIVRE", "ML-400", "12348"],
+        [d(-9), d(-1), "BA", "JADLOG", "PED-5", "CHV5", "MERCADO LIVRE", "ML-500", "12349"],
+    ]).set_axis([10, 11, 12, 13, 14])
+    df_sys = _df_sysemp_tratado([["12347", "CHV3", "ML-300", "MG", "MERCADO LIVRE", "PATRUS"]])
+    historico = {"12346"}
+
+    for modo in ("atraso", "prevencao"):
+        # Sem `modos`, a base é montada com todas as linhas e só a ETAPA 4 filtra.
+        base, _ = processor._validacao_base(df_inteli, df_sys, historico)
+        esperado = processor._aplicar_modo(base, modo, hoje.date())
+        (final, descartadas), _ = processor.processar_validacao_transportadora(
+            df_inteli, df_sys, historico, modo=modo
+        )
+        pd.testing.assert_frame_equal(final, esperado[0])
+        pd.testing.assert_frame_equal(descartadas, esperado[1])
+
+    assert final.index.tolist() == [0, 1]           # posições entre as não descartadas
+    assert final["NOTA FISCAL"].tolist() == ["12345", "12347"]
+
+
+def test_descartadas_saem_da_mesma_tabela_com_indice_da_origem(processor):
+    hoje = pd.Timestamp.now(tz="America/Sao_Paulo").normalize().tz_localize(None)
+    d = lambda dias: (hoje + pd.Timedelta(days=dias)).strftime("%Y-%m-%d")
+    df_inteli = _df_intelipost([
+        [d(-9), d(-1), "sp", "jadlog", "PED-1", "CHV1", "MERCADO LIVRE", "ML-100", "12345"],
+        [d(-9), d(-2), "rj", "Total",  "PED-2", "CHV2", "magalu",        "MG-200", "12346"],
+        [d(-9), d(-3), "MG", "JADLOG", "PED-3", "CHV3", "MERCADO LIVRE", "12.0",   "12347"],
+    ]).set_axis([5, 6, 7])
+    df_sys = _df_sysemp_tratado([["12345", "CHV1", "ML-100", "SP", "MERCADO LIVRE", "PATRUS"]])
+
+    (df_final, df_desc), err = processor.processar_validacao_transportadora(
+        df_inteli, df_sys, {"12346", "12347"}, modo="atraso"
+    )
+
+    assert err is None
+    assert df_final.index.tolist() == [0]
+    assert df_final["STATUS DA TRANSPORTADORA"].tolist() == ["Falso"]
+    assert df_final["TRANSPORTADORA"].tolist() == ["PATRUS"]
+    assert list(df_desc.columns) == FINAL_COLUMNS_VALIDACAO
+    assert df_desc.index.tolist() == [6, 7]
+    assert df_desc["STATUS DA TRANSPORTADORA"].tolist() == ["DESCARTADA - HISTÓRICO"] * 2
+    assert df_desc["TRANSPORTADORA"].tolist() == ["TOTAL", "JADLOG"]
+    assert df_desc["UF"].tolist() == ["RJ", "MG"]
+    assert df_desc["N° PEDIDO"].tolist() == ["MG-200", "12"]
+    assert df_desc["MARKETPLACE"].tolist() == ["MAGALU", "MERCADO LIVRE"]
+
+
+def test_motor_trabalha_na_projecao_sem_alterar_a_entrada(processor):
+    hoje = pd.Timestamp.now(tz="America/Sao_Paulo").normalize().tz_localize(None)
+    df_inteli = _df_intelipost([
+        ["", (hoje - pd.Timedelta(days=1)).strftime("%Y-%m-%d"), "SP", "JADLOG", "PED-1", "CHV1",
+         "MERCADO LIVRE", "ML-100", "12.345"],
+    ]).assign(**{f"Extra {i}": "x" for i in range(5)})
+    antes = df_inteli.copy()
+    df_sys = _df_sysemp_tratado([["12345", "CHV1", "ML-100", "SP", "MERCADO LIVRE", "JADLOG"]])
+
+    (df_final, _), err = processor.processar_validacao_transportadora(df_inteli, df_sys, set())
+
+    assert err is None
+    assert df_final["NOTA FISCAL"].tolist() == ["12345"]
+    pd.testing.assert_frame_equal(df_inteli, antes)
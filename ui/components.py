@@ -1,28 +1,21 @@
-import streamlit as st
-import pandas as pd
-import io
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openpyxl.utils import get_column_letter
 
-# Colunas que devem ser exportadas como TEXTO (preserva zeros à esquerda
-# e impede o Excel de renderizar chaves longas em notação científica).
-COLUNAS_FORCAR_TEXTO = {
-    'Chave NF', 'CHAVE DA NF', 'Chave da NF', 'Chave NFe', 'Chave da Nota',
-}
+import pandas as pd
+import streamlit as st
 
-def _forcar_colunas_texto(worksheet, df, colunas_alvo=COLUNAS_FORCAR_TEXTO):
-    """Aplica number_format='@' (texto) nas células das colunas alvo.
+from utils.exportacao import gerar_planilha_excel
 
-    Necessário porque o Excel, ao abrir, converte strings que parecem números
-    (como chaves de NF de 44 dígitos) em notação científica quando o formato
-    da célula é 'Geral'.
-    """
-    for idx, col_name in enumerate(df.columns, start=1):
-        if col_name in colunas_alvo:
-            letra = get_column_letter(idx)
-            # Linha 1 é cabeçalho; aplica do dado em diante.
-            for cell in worksheet[letra][1:]:
-                cell.number_format = '@'
+# A planilha de download só é gerada quando o usuário clica em "baixar" e
+# fica guardada na sessão, indexada pelo resultado. Opcional: com
+# EXPORTACAO_EM_SEGUNDO_PLANO = True ela começa a ser montada numa thread
+# assim que o resultado aparece (o clique só espera terminar) — ao custo de
+# gerar a planilha mesmo quando ninguém baixa.
+EXPORTACAO_EM_SEGUNDO_PLANO = False
+MAX_PLANILHAS_SESSAO = 4
+_EXPORTADOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="exportacao")
 
 def render_header(title, subtitle):
     """Renderiza o cabeçalho da página."""
@@ -83,6 +76,41 @@ def render_metric_card(label, value, delta=None, color="#1e293b"):
     </div>
     """, unsafe_allow_html=True)
 
+def _chave_planilha(abas):
+    """Identidade do resultado: nomes das abas, colunas e hash das linhas."""
+    h = hashlib.sha256()
+    for nome_aba, df in abas.items():
+        h.update(repr((nome_aba, list(df.columns), len(df))).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _planilha_sob_demanda(abas, chave=None):
+    """Callable que devolve os bytes do .xlsx, para o `data` do download_button.
+
+    Reaproveita a mesma planilha entre reruns enquanto o resultado for igual.
+    `chave` identifica o resultado (ex.: id da tarefa + fluxo) e evita hashear
+    as linhas a cada rerun; sem ela, vale o conteúdo (_chave_planilha).
+    """
+    planilhas = st.session_state.setdefault("planilhas_exportadas", OrderedDict())
+    chave = (chave, tuple(abas)) if chave is not None else _chave_planilha(abas)
+    if chave in planilhas:
+        planilhas.move_to_end(chave)
+        return planilhas[chave]
+
+    if EXPORTACAO_EM_SEGUNDO_PLANO:
+        obter = _EXPORTADOR.submit(gerar_planilha_excel, abas).result
+    else:
+        gerada = {}
+        def obter():
+            if "planilha" not in gerada:
+                gerada["planilha"] = gerar_planilha_excel(abas)
+            return gerada["planilha"]
+
+    planilhas[chave] = obter
+    while len(planilhas) > MAX_PLANILHAS_SESSAO:
+        planilhas.popitem(last=False)
+    return obter
+
 def render_results_tabs(
     df_final,
     df_removidas,
@@ -93,11 +121,14 @@ def render_results_tabs(
     label_removidas="🗑️ Removidas pelo Histórico",
     msg_vazio_principal="Nenhuma nova pendência para tratar.",
     msg_vazio_removidas="Nenhum registro foi removido.",
+    chave=None,
 ):
     """Renderiza as tabs de resultados e exportação.
 
     Mantém retrocompatibilidade: chamar sem parâmetros adicionais reproduz
     exatamente o comportamento anterior dos fluxos Intelipost e E-mail.
+    `chave`: identidade do resultado para o cache da planilha (ver
+    _planilha_sob_demanda).
     """
     tab1, tab2 = st.tabs([label_principal, label_removidas])
 
@@ -105,17 +136,17 @@ def render_results_tabs(
         if not df_final.empty:
             st.dataframe(df_final, use_container_width=True)
 
-            # Preparar buffer Excel
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                df_final.to_excel(writer, index=False, sheet_name=sheet_principal)
-                df_removidas.to_excel(writer, index=False, sheet_name=sheet_removidas)
-                _forcar_colunas_texto(writer.sheets[sheet_principal], df_final)
-                _forcar_colunas_texto(writer.sheets[sheet_removidas], df_removidas)
+            # Planilha gerada só quando pedida (ver _planilha_sob_demanda); o
+            # on_click="ignore" evita o rerun que apagaria os resultados.
+            planilha = _planilha_sob_demanda({
+                sheet_principal: df_final,
+                sheet_removidas: df_removidas,
+            }, chave)
 
             st.download_button(
                 label="📥 BAIXAR PLANILHA COMPLETA (.xlsx)",
-                data=buffer.getvalue(),
+                data=planilha,
+                on_click="ignore",
                 file_name=f"{nome_arquivo}_{datetime.now().strftime('%d-%m')}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 type="primary",
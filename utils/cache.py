@@ -0,0 +1,236 @@
+"""Cache de arquivos parseados, indexado pelo hash do conteúdo.
+
+Operadores sobem o mesmo Sysemp nos quatro módulos em poucos minutos. Com
+o cache, o segundo upload do mesmo conteúdo pula leitura e tratamento.
+
+Camadas:
+    * memória — LRU limitado em bytes (tamanho real dos DataFrames);
+    * disco   — itens expulsos da memória são gravados em parquet
+                (DataFrames) ou pickle (demais objetos) e também são
+                limitados em bytes, removendo os mais antigos.
+O diretório em disco é privado do processo (mkdtemp, modo 0700, removido
+na saída): o pickle lido de volta só pode ter sido gravado por ele. Cada
+arquivo é escrito num temporário e renomeado (os.replace) — uma leitura
+concorrente nunca vê um arquivo pela metade.
+Contadores de acerto/falha ficam disponíveis em `estatisticas()`.
+
+Uso:
+    chave = f"{hash_arquivo(arquivo)}:sysemp"
+    df = CACHE_ARQUIVOS.obter_ou_calcular(chave, lambda: carregar(arquivo))
+"""
+import atexit
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Incrementar quando o formato do que é guardado mudar (invalida o disco).
+VERSAO_CACHE = 1
+
+LIMITE_MEMORIA_BYTES = 1024 * 1024 * 1024      # 1 GB
+LIMITE_DISCO_BYTES = 4 * 1024 * 1024 * 1024    # 4 GB
+_SUFIXO_PARCIAL = '.parcial'
+
+_BLOCO_HASH = 1024 * 1024
+
+
+def hash_arquivo(arquivo):
+    """SHA-256 do conteúdo de um arquivo aberto (upload do Streamlit ou handle)."""
+    h = hashlib.sha256()
+    arquivo.seek(0)
+    while True:
+        bloco = arquivo.read(_BLOCO_HASH)
+        if not bloco:
+            break
+        h.update(bloco if isinstance(bloco, bytes) else bloco.encode('utf-8'))
+    arquivo.seek(0)
+    return h.hexdigest()
+
+
+def _tamanho(valor):
+    if hasattr(valor, 'memoria_bytes'):
+        return valor.memoria_bytes()
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, (set, frozenset, list, tuple)):
+        return sys.getsizeof(valor) + sum(_tamanho(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheArquivos:
+    """Cache LRU em memória com transbordo para disco. Thread-safe."""
+
+    def __init__(self, limite_memoria=LIMITE_MEMORIA_BYTES, limite_disco=LIMITE_DISCO_BYTES,
+                 diretorio=None):
+        """`diretorio`: pasta do disco; sem ela, uma privada é criada no 1º uso."""
+        self.limite_memoria = limite_memoria
+        self.limite_disco = limite_disco
+        self.diretorio = diretorio
+        self._itens = OrderedDict()   # chave -> (valor, tamanho)
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.falhas = 0
+
+    # ----------------------------------------------------------------- #
+    # API
+    # ----------------------------------------------------------------- #
+    def obter(self, chave, default=None):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos_memoria += 1
+                return self._itens[chave][0]
+
+        valor = self._ler_disco(chave)
+        with self._lock:
+            if valor is None:
+                self.falhas += 1
+                return default
+            self.acertos_disco += 1
+        self.guardar(chave, valor, gravar_disco=False)
+        return valor
+
+    def guardar(self, chave, valor, gravar_disco=False):
+        """Guarda em memória; `gravar_disco=True` também persiste de imediato."""
+        tamanho = _tamanho(valor)
+        expulsos = []
+        with self._lock:
+            if chave in self._itens:
+                self._bytes_memoria -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self._bytes_memoria += tamanho
+            while self._bytes_memoria > self.limite_memoria and len(self._itens) > 1:
+                chave_velha, (valor_velho, tam_velho) = self._itens.popitem(last=False)
+                self._bytes_memoria -= tam_velho
+                expulsos.append((chave_velha, valor_velho))
+        for chave_velha, valor_velho in expulsos:
+            self._gravar_disco(chave_velha, valor_velho)
+        if gravar_disco:
+            self._gravar_disco(chave, valor)
+
+    def obter_ou_calcular(self, chave, calcular):
+        valor = self.obter(chave)
+        if valor is None:
+            valor = calcular()
+            if valor is not None:
+                self.guardar(chave, valor)
+        return valor
+
+    def limpar(self, incluir_disco=False):
+        with self._lock:
+            self._itens.clear()
+            self._bytes_memoria = 0
+        if incluir_disco and self.diretorio and os.path.isdir(self.diretorio):
+            for nome in os.listdir(self.diretorio):
+                os.remove(os.path.join(self.diretorio, nome))
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'itens_memoria': len(self._itens),
+                'bytes_memoria': self._bytes_memoria,
+                'acertos_memoria': self.acertos_memoria,
+                'acertos_disco': self.acertos_disco,
+                'falhas': self.falhas,
+            }
+
+    # ----------------------------------------------------------------- #
+    # Disco
+    # ----------------------------------------------------------------- #
+    def _caminho(self, chave):
+        nome = hashlib.sha256(f"v{VERSAO_CACHE}:{chave}".encode('utf-8')).hexdigest()
+        return os.path.join(self.diretorio, nome)
+
+    def _garantir_diretorio(self):
+        with self._lock:
+            if self.diretorio is None:
+                self.diretorio = tempfile.mkdtemp(prefix='conversao_pendencia_cache_')
+                atexit.register(shutil.rmtree, self.diretorio, ignore_errors=True)
+            else:
+                os.makedirs(self.diretorio, mode=0o700, exist_ok=True)
+
+    def _gravar_atomico(self, destino, escrever):
+        """Escreve via `escrever(caminho)` num temporário da pasta e renomeia para `destino`."""
+        fd, parcial = tempfile.mkstemp(dir=self.diretorio, suffix=_SUFIXO_PARCIAL)
+        os.close(fd)
+        try:
+            escrever(parcial)
+            os.replace(parcial, destino)
+        except BaseException:
+            os.remove(parcial)
+            raise
+
+    @staticmethod
+    def _escrever_pickle(valor):
+        def escrever(caminho):
+            with open(caminho, 'wb') as f:
+                pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return escrever
+
+    def _gravar_disco(self, chave, valor):
+        if self.limite_disco <= 0:
+            return
+        self._garantir_diretorio()
+        base = self._caminho(chave)
+        try:
+            if isinstance(valor, pd.DataFrame):
+                self._gravar_atomico(base + '.parquet', valor.to_parquet)
+            else:
+                self._gravar_atomico(base + '.pkl', self._escrever_pickle(valor))
+        except (ImportError, ValueError, TypeError):
+            # Sem pyarrow (ou tipo não suportado em parquet): pickle resolve.
+            self._gravar_atomico(base + '.pkl', self._escrever_pickle(valor))
+        self._aparar_disco()
+
+    def _ler_disco(self, chave):
+        if self.diretorio is None:
+            return None
+        base = self._caminho(chave)
+        try:
+            if os.path.exists(base + '.parquet'):
+                valor = pd.read_parquet(base + '.parquet')
+                os.utime(base + '.parquet')
+                return valor
+            if os.path.exists(base + '.pkl'):
+                with open(base + '.pkl', 'rb') as f:
+                    valor = pickle.load(f)
+                os.utime(base + '.pkl')
+                return valor
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            return None
+        return None
+
+    def _aparar_disco(self):
+        """Remove os arquivos menos usados até caber em limite_disco."""
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(_SUFIXO_PARCIAL):
+                continue    # gravação em andamento em outra thread
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                st = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            arquivos.append((st.st_mtime, st.st_size, caminho))
+        total = sum(a[1] for a in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_disco:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+
+# Instância compartilhada pelo processo (o Streamlit importa o módulo uma
+# vez; todos os módulos e sessões enxergam o mesmo cache).
+CACHE_ARQUIVOS = CacheArquivos()
@@ -0,0 +1,134 @@
+"""Colunas de baixa cardinalidade como `category`.
+
+UF, Marketplace, Transportadora, Ocorrência de Entrega e STATUS DA
+TRANSPORTADORA têm poucas dezenas de valores distintos em milhões de
+linhas. Como `category`, cada linha guarda só um código inteiro e as
+transformações de texto (upper/strip, dicionários CARRIERS / MARKETPLACES /
+OCCURRENCES) rodam uma vez por categoria em vez de uma vez por linha.
+
+    categorizar_colunas(df)              # na carga: texto repetitivo -> category
+    mapear_categorias(serie, transformar) # transformação por valor distinto
+    preencher_nulos(serie, valor)         # fillna que aceita category
+"""
+import numpy as np
+import pandas as pd
+
+# Coluna vira category quando tem no máximo esta fração de valores distintos.
+FRACAO_MAX_UNICOS = 0.05
+# Abaixo disso a conversão não compensa (e planilhas pequenas ficam como estão).
+MIN_LINHAS_CATEGORIA = 1_000
+# Linhas olhadas antes de contar os distintos da coluna inteira.
+TAMANHO_AMOSTRA = 10_000
+
+
+def eh_categoria(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype)
+
+
+def categorizar_colunas(df, fracao_max=FRACAO_MAX_UNICOS, min_linhas=MIN_LINHAS_CATEGORIA):
+    """Converte para `category` as colunas de texto com poucos valores distintos.
+
+    Chaves (NF, Chave NF, pedidos) têm quase um valor por linha e ficam como
+    texto; a amostra inicial descarta essas colunas sem contar a coluna toda.
+    Altera `df` e o devolve.
+    """
+    if len(df) < min_linhas:
+        return df
+    limite = int(len(df) * fracao_max)
+    for col in df.columns:
+        serie = df[col]
+        if eh_categoria(serie) or not (serie.dtype == object or pd.api.types.is_string_dtype(serie)):
+            continue
+        if serie.iloc[:TAMANHO_AMOSTRA].nunique() > limite:
+            continue
+        if serie.nunique() <= limite:
+            df[col] = serie.astype('category')
+    return df
+
+
+def como_categoria(serie):
+    """`serie` como category (sem cópia quando já é). Fatora a coluna uma única vez."""
+    return serie if eh_categoria(serie) else serie.astype('category')
+
+
+def codigos_e_valores(serie):
+    """(códigos por linha, Series de valores distintos) — os nulos, se houver, são os últimos valores.
+
+    Numa coluna object cada tipo de nulo (None, NaN, pd.NA, NaT) é um valor
+    à parte, com o próprio objeto: `astype(str)` dá 'None', 'nan', '<NA>' e
+    'NaT', e o resultado tem de ser o mesmo da cadeia linha a linha.
+    """
+    cat = como_categoria(serie)
+    codigos = cat.cat.codes.to_numpy()
+    categorias = cat.cat.categories
+    valores = pd.Series(categorias, dtype=categorias.dtype)
+    nulos = codigos < 0
+    if nulos.any():
+        if eh_categoria(serie):
+            codigos_nulos, representantes = 0, [np.nan]
+        else:
+            objetos = np.asarray(serie, dtype=object)[nulos]
+            codigos_nulos, _ = pd.factorize(np.array([type(v).__name__ for v in objetos], dtype=object))
+            primeiros = np.unique(codigos_nulos, return_index=True)[1]
+            representantes = list(objetos[primeiros])
+        dtype = object if serie.dtype == object else categorias.dtype
+        codigos = codigos.copy()
+        codigos[nulos] = len(valores) + codigos_nulos
+        valores = pd.concat(
+            [valores.astype(dtype), pd.Series(representantes, dtype=dtype)], ignore_index=True
+        )
+    return codigos, valores
+
+
+def espalhar(resultado, codigos, serie):
+    """Espalha o resultado por valor distinto de volta às linhas, como category."""
+    novos_codigos, novas_categorias = pd.factorize(np.asarray(resultado, dtype=object))
+    return pd.Series(
+        pd.Categorical.from_codes(novos_codigos.take(codigos), categories=novas_categorias),
+        index=serie.index,
+        name=serie.name,
+    )
+
+
+def mapear_categorias(serie, transformar):
+    """Aplica `transformar` só aos valores distintos de `serie` e devolve uma Series category.
+
+    `transformar` recebe uma Series com os valores distintos (o nulo incluído,
+    se houver) e devolve outra do mesmo tamanho — as mesmas operações `.str`
+    / `.map` que seriam aplicadas à coluna inteira. Valores que o resultado
+    torna iguais viram uma única categoria; resultados nulos viram NaN.
+    """
+    codigos, valores = codigos_e_valores(serie)
+    return espalhar(transformar(valores), codigos, serie)
+
+
+def preencher_nulos(serie, valor):
+    """`fillna(valor)` que também funciona em category (inclui `valor` nas categorias)."""
+    if eh_categoria(serie) and valor not in serie.cat.categories:
+        serie = serie.cat.add_categories([valor])
+    return serie.fillna(valor)
+
+
+def intercalar(partes, tamanho, index=None):
+    """Series de `tamanho` linhas montada de partes disjuntas [(posições, Series), ...].
+
+    Partes category viram uma category só (união das categorias, remapeando
+    os códigos — sem passar por texto); nas demais o dtype da 1ª parte é
+    mantido quando todas têm o mesmo (senão, object). Posições não
+    cobertas ficam nulas.
+    """
+    series = [serie for _, serie in partes]
+    if series and all(eh_categoria(s) for s in series):
+        categorias = series[0].cat.categories
+        for s in series[1:]:
+            categorias = categorias.append(s.cat.categories[~s.cat.categories.isin(categorias)])
+        codigos = np.full(tamanho, -1, dtype=np.int64)
+        for posicoes, s in partes:
+            mapa = np.append(categorias.get_indexer(s.cat.categories), -1)
+            codigos[posicoes] = mapa[s.cat.codes.to_numpy()]   # código -1 -> último do mapa (-1)
+        return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=index)
+    valores = np.full(tamanho, np.nan, dtype=object)
+    for posicoes, s in partes:
+        valores[posicoes] = np.asarray(s, dtype=object)
+    dtypes = {s.dtype for s in series}
+    return pd.Series(valores, index=index, dtype=dtypes.pop() if len(dtypes) == 1 else object)
@@ -0,0 +1,101 @@
+"""Chave de acesso da NF-e (44 dígitos) como chave compacta de cruzamento.
+
+A chave de acesso identifica a nota sem ambiguidade (UF, emissão, CNPJ,
+modelo, série, número, código e DV), ao contrário do número da NF, que se
+repete entre séries/emitentes e depende da limpeza de normalizar_nf. Aqui
+ela vira três palavras uint64 de 15/15/14 dígitos — 24 bytes por linha,
+hash de inteiros; 44 dígitos precisam de 147 bits, então duas uint64 não
+bastam — e o DV (módulo 11) é conferido em lote.
+
+    digitos_chave(serie)        matriz (m, 44) de dígitos + máscara de formato
+    chave_acesso_valida(serie)  44 dígitos e DV correto
+    IndiceChaveAcesso(serie)    chave -> 1ª linha; linhas(serie) casa chaves exatas
+
+O texto da chave continua indo para a saída como veio (e como texto no
+Excel, ver exportacao.COLUNAS_FORCAR_TEXTO).
+"""
+import numpy as np
+import pandas as pd
+
+TAMANHO_CHAVE = 44
+# Fatias de dígitos de cada palavra uint64 (10**15 < 2**64).
+_FATIAS = ((0, 15), (15, 30), (30, 44))
+# Pesos do módulo 11 para os 43 primeiros dígitos: 2..9 da direita para a esquerda.
+_PESOS_DV = np.array([2 + (TAMANHO_CHAVE - 2 - i) % 8 for i in range(TAMANHO_CHAVE - 1)], dtype=np.int32)
+
+
+def digitos_chave(serie, so_digitos=True):
+    """(matriz uint8 (m, 44) dos dígitos, máscara das n linhas no formato).
+
+    A matriz só tem as linhas no formato (44 dígitos), na ordem. Com
+    `so_digitos`, as linhas fora do formato perdem o sufixo ".0" (célula
+    numérica) e os separadores (pontos, espaços) antes de serem conferidas.
+    """
+    texto = pd.Series(serie, dtype=object) if not isinstance(serie, pd.Series) else serie
+    texto = texto.astype(str).reset_index(drop=True)
+    formato = _no_formato(texto)
+    if so_digitos and not formato.all():
+        fora = ~formato
+        texto = texto.astype(object)
+        texto[fora] = texto[fora].str.replace(r'\.0$', '', regex=True).str.replace(r'\D', '', regex=True)
+        formato[fora] = _no_formato(texto[fora])
+    bruto = texto[formato].to_numpy(dtype=f'S{TAMANHO_CHAVE}')
+    digitos = bruto.view(np.uint8).reshape(-1, TAMANHO_CHAVE) - ord('0')
+    return digitos, formato
+
+
+def _no_formato(texto):
+    return ((texto.str.len() == TAMANHO_CHAVE) & texto.str.isdigit()).to_numpy(dtype=bool, na_value=False, copy=True)
+
+
+def _dv_confere(digitos):
+    resto = np.einsum('ij,j->i', digitos[:, :-1], _PESOS_DV) % 11
+    return np.where(resto < 2, 0, 11 - resto) == digitos[:, -1]
+
+
+def _palavras(digitos):
+    return [
+        np.einsum('ij,j->i', digitos[:, ini:fim], 10 ** np.arange(fim - ini - 1, -1, -1, dtype=np.uint64))
+        for ini, fim in _FATIAS
+    ]
+
+
+def chave_acesso_valida(serie):
+    """Máscara (np.ndarray) das chaves bem formadas: 44 dígitos e DV do módulo 11 correto."""
+    digitos, formato = digitos_chave(serie)
+    valida = formato.copy()
+    valida[formato] = _dv_confere(digitos)
+    return valida
+
+
+class IndiceChaveAcesso:
+    """Chaves de acesso válidas de uma coluna -> posição da 1ª linha em que aparecem."""
+
+    def __init__(self, serie):
+        digitos, formato = digitos_chave(serie)
+        ok = _dv_confere(digitos)
+        posicoes = np.flatnonzero(formato)[ok]
+        indice = pd.MultiIndex.from_arrays(_palavras(digitos[ok]))
+        primeira = ~indice.duplicated(keep='first')
+        self.indice = indice[primeira]
+        self.posicoes = posicoes[primeira]
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def memoria_bytes(self):
+        return int(self.indice.memory_usage(deep=True)) + self.posicoes.nbytes
+
+    def linhas(self, serie):
+        """Posição da 1ª linha com a mesma chave de cada valor; -1 quando não há.
+
+        Chaves fora do formato ou com DV errado não casam.
+        """
+        digitos, formato = digitos_chave(serie)
+        resultado = np.full(len(formato), -1, dtype=np.int64)
+        ok = _dv_confere(digitos)
+        if not ok.any() or len(self.indice) == 0:
+            return resultado
+        achou = self.indice.get_indexer(pd.MultiIndex.from_arrays(_palavras(digitos[ok])))
+        resultado[np.flatnonzero(formato)[ok]] = np.where(achou >= 0, self.posicoes[np.maximum(achou, 0)], -1)
+        return resultado
@@ -0,0 +1,84 @@
+"""Motor de datas "parse único + broadcast".
+
+Exports reais têm centenas de milhares de linhas mas poucos milhares de
+timestamps distintos. Em vez de parsear e formatar linha a linha, fatoramos
+a coluna (`pd.factorize`), fazemos o trabalho caro só nos valores únicos e
+espalhamos o resultado de volta pelos códigos.
+
+`formatar_datas_br` devolve, além do texto de exibição (DD/MM/YYYY), a data
+tipada (datetime64 normalizada, sem hora) — usada pelo filtro de modo da
+Validação para não precisar reparsear o texto formatado.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _fatorar(serie):
+    """(codes, uniques) com nulos em -1."""
+    codes, uniques = pd.factorize(serie)
+    return codes, pd.Series(uniques, dtype=object)
+
+
+def _broadcast(valores_unicos, codes, index, valor_nulo):
+    """Espalha `valores_unicos` pelos `codes`; código -1 recebe `valor_nulo`."""
+    valores = np.asarray(valores_unicos)
+    if len(codes) == 0:
+        return pd.Series(valores[:0], index=index)
+    valores = np.append(valores, np.array([valor_nulo], dtype=valores.dtype))
+    codes = np.where(codes < 0, len(valores) - 1, codes)
+    return pd.Series(valores.take(codes), index=index)
+
+
+def _to_datetime(valores, **kwargs):
+    # format='mixed' permite que cada valor seja parseado com o formato dele
+    # (alguns com hora, outros só data). Sem isso, pandas infere pelo primeiro
+    # elemento e torna NaT os que não casam.
+    try:
+        dts = pd.to_datetime(valores, errors='coerce', format='mixed', **kwargs)
+    except (TypeError, ValueError):
+        # Fallback para versões antigas do pandas (<2.0)
+        dts = pd.to_datetime(valores, errors='coerce', **kwargs)
+    if getattr(dts.dt, 'tz', None) is not None:
+        # Mantém o horário "de parede" — é o que aparece no texto formatado.
+        dts = dts.dt.tz_localize(None)
+    return dts
+
+
+def formatar_datas_br(serie, default=""):
+    """
+    Formata a coluna para o padrão brasileiro e devolve também a data tipada.
+
+    Texto (mesma regra de DataProcessor._fmt_data_br):
+        * Se houver hora não-zero -> 'DD/MM/YYYY HH:MM:SS'
+        * Caso contrário          -> 'DD/MM/YYYY'
+        * Vazio/inválido          -> default ("")
+        * Não parseável (ex.: "VERIFICAR") -> texto original stripado
+    Data tipada: datetime64 sem hora; NaT quando não há data válida. Para
+    textos não parseáveis, tenta a parte antes do 1º espaço com dayfirst —
+    exatamente o que o filtro por DATA PREVISTA faria sobre o texto exibido.
+
+    Retorno: (serie_texto, serie_data)
+    """
+    codes, uniques = _fatorar(serie)
+    dts = _to_datetime(uniques)
+
+    tem_hora = (dts.dt.hour != 0) | (dts.dt.minute != 0) | (dts.dt.second != 0)
+    texto = pd.Series(
+        np.where(tem_hora, dts.dt.strftime('%d/%m/%Y %H:%M:%S'), dts.dt.strftime('%d/%m/%Y')),
+        dtype=object,
+    )
+
+    # Para valores não parseáveis, devolve string original (ex.: "VERIFICAR")
+    original = uniques.astype(str).str.strip()
+    mask_fallback = dts.isna() & ~original.isin(['', 'nan', 'NaT', 'None'])
+    texto = texto.where(dts.notna(), default).where(~mask_fallback, original)
+
+    datas = dts.dt.normalize()
+    if mask_fallback.any():
+        so_data = original[mask_fallback].str.split(' ', n=1).str[0]
+        datas_fallback = _to_datetime(so_data, dayfirst=True).dt.normalize()
+        datas = datas.where(~mask_fallback, datas_fallback)
+
+    serie_texto = _broadcast(texto.to_numpy(dtype=object), codes, serie.index, default)
+    serie_data = _broadcast(datas.to_numpy(dtype='datetime64[ns]'), codes, serie.index, np.datetime64('NaT'))
+    return serie_texto, serie_data
@@ -0,0 +1,258 @@
+"""Exportação .xlsx em streaming.
+
+O .xlsx é gravado direto no zip, linha a linha em blocos, sem montar o
+workbook em memória (antes: pd.ExcelWriter/openpyxl + um loop por célula
+para aplicar o formato texto). Decisões:
+    * strings inline (`t="inlineStr"`) — dispensa a tabela sharedStrings,
+      que obrigaria a manter todas as strings em memória até o fim;
+    * o formato texto ('@') das colunas de chave é um estilo da COLUNA
+      (`<col style=...>`) e o mesmo id vai em cada célula dessa coluna, já
+      montado de forma vetorizada junto com o XML do bloco;
+    * cabeçalho em negrito com borda, como o to_excel do pandas.
+"""
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+# Colunas que devem ser exportadas como TEXTO (preserva zeros à esquerda
+# e impede o Excel de renderizar chaves longas em notação científica).
+COLUNAS_FORCAR_TEXTO = {
+    'Chave NF', 'CHAVE DA NF', 'Chave da NF', 'Chave NFe', 'Chave da Nota',
+}
+
+LINHAS_POR_BLOCO = 50_000
+MAX_LINHAS_EXCEL = 1_048_576
+
+# Ids de estilo (índices de cellXfs em _STYLES).
+_ESTILO_CABECALHO = 1
+_ESTILO_TEXTO = 2
+_ESTILO_DATA = 3
+
+# Caracteres de controle proibidos em XML 1.0 (o openpyxl recusa; aqui são removidos).
+_CARACTERES_ILEGAIS = r'[\x00-\x08\x0b\x0c\x0e-\x1f]'
+
+_EPOCA_EXCEL = pd.Timestamp('1899-12-30')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{planilhas}'
+    '</Types>'
+)
+_CONTENT_TYPE_PLANILHA = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_RELS_RAIZ = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{planilhas}</sheets></workbook>'
+)
+_RELS_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{planilhas}'
+    '<Relationship Id="rIdEstilos" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+    '</fonts>'
+    '<fills count="2">'
+    '<fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill>'
+    '</fills>'
+    '<borders count="2">'
+    '<border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/>'
+    '<bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" '
+    'applyBorder="1" applyAlignment="1"><alignment horizontal="center" vertical="top"/></xf>'
+    '<xf numFmtId="49" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_INICIO_PLANILHA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+
+
+def _escapar(serie):
+    """Escapa &, <, > e remove caracteres de controle inválidos em XML.
+
+    A maioria das colunas não tem nada a escapar: um único `contains` evita
+    as quatro substituições nesse caso.
+    """
+    if not serie.str.contains(r'[&<>\x00-\x08\x0b\x0c\x0e-\x1f]', regex=True).any():
+        return serie
+    return (
+        serie.str.replace(_CARACTERES_ILEGAIS, '', regex=True)
+        .str.replace('&', '&amp;', regex=False)
+        .str.replace('<', '&lt;', regex=False)
+        .str.replace('>', '&gt;', regex=False)
+    )
+
+
+def _texto_escalar(valor):
+    return re.sub(_CARACTERES_ILEGAIS, '', escape(str(valor)))
+
+
+def _celula_escalar(valor, ref, estilo):
+    """XML de uma célula de coluna com tipos mistos (caminho lento, raro)."""
+    s = f' s="{estilo}"' if estilo else ''
+    # pd.isna cobre None, NaN, NaT e pd.NA (que str() escreveria como "<NA>").
+    if pd.api.types.is_scalar(valor) and pd.isna(valor):
+        return f'<c r="{ref}"{s}/>' if estilo else ''
+    if isinstance(valor, (bool, np.bool_)):
+        return f'<c r="{ref}"{s} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, np.integer, np.floating)) and not estilo:
+        if not np.isfinite(valor):
+            return ''
+        return f'<c r="{ref}"><v>{valor}</v></c>'
+    if isinstance(valor, pd.Timestamp) or isinstance(valor, np.datetime64):
+        valor = pd.Timestamp(valor).tz_localize(None)
+        serial = (valor - _EPOCA_EXCEL) / pd.Timedelta(days=1)
+        return f'<c r="{ref}" s="{_ESTILO_DATA}"><v>{serial!r}</v></c>'
+    texto = _texto_escalar(valor)
+    if texto == '':
+        return f'<c r="{ref}"{s}/>' if estilo else ''
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _celulas_coluna(serie, letra, linhas, estilo):
+    """XML das células de uma coluna do bloco, como Series de strings.
+
+    `linhas` são os números das linhas no Excel (já como str). Valores
+    ausentes viram string vazia (célula omitida) — exceto em colunas de
+    texto, que recebem a célula vazia com o estilo '@'.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(serie.cat.categories.dtype)
+    refs = letra + linhas
+    s = f' s="{estilo}"' if estilo else ''
+    vazia = ('<c r="' + refs + f'"{s}/>') if estilo else ''
+    ausente = serie.isna().to_numpy()
+
+    if pd.api.types.is_bool_dtype(serie):
+        xml = '<c r="' + refs + f'"{s} t="b"><v>' + serie.astype('int8').astype(str) + '</v></c>'
+    elif pd.api.types.is_numeric_dtype(serie) and not estilo:
+        finito = np.isfinite(serie.to_numpy(dtype='float64', na_value=np.nan))
+        ausente = ausente | ~finito
+        xml = '<c r="' + refs + '"><v>' + serie.astype(str) + '</v></c>'
+    elif pd.api.types.is_datetime64_any_dtype(serie):
+        if getattr(serie.dt, 'tz', None) is not None:
+            serie = serie.dt.tz_localize(None)
+        serial = (serie - _EPOCA_EXCEL) / pd.Timedelta(days=1)
+        xml = '<c r="' + refs + f'" s="{_ESTILO_DATA}"><v>' + serial.astype(str) + '</v></c>'
+    elif pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty') or estilo:
+        texto = _escapar(serie.astype(object).where(~ausente, '').astype(str))
+        ausente = ausente | (texto == '').to_numpy()
+        xml = ('<c r="' + refs + f'"{s} t="inlineStr"><is><t xml:space="preserve">'
+               + texto + '</t></is></c>')
+    else:
+        # Objetos mistos (números, datas e strings juntos): célula a célula.
+        return pd.Series(
+            [_celula_escalar(v, r, estilo) for v, r in zip(serie.to_numpy(), refs.to_numpy())],
+            index=serie.index, dtype=str,
+        )
+
+    return xml.where(~ausente, vazia) if ausente.any() else xml
+
+
+def _escrever_planilha(saida, df, colunas_texto):
+    """Escreve o XML de uma aba em `saida` (stream binário do zip), em blocos."""
+    if len(df) + 1 > MAX_LINHAS_EXCEL:
+        raise ValueError(
+            f"A aba tem {len(df):,} linhas; o Excel aceita no máximo {MAX_LINHAS_EXCEL - 1:,}."
+        )
+    letras = [get_column_letter(i) for i in range(1, len(df.columns) + 1)]
+    estilos = [_ESTILO_TEXTO if c in colunas_texto else 0 for c in df.columns]
+
+    partes = [_INICIO_PLANILHA]
+    cols = ''.join(
+        f'<col min="{i}" max="{i}" width="48" customWidth="1" style="{_ESTILO_TEXTO}"/>'
+        for i, estilo in enumerate(estilos, start=1) if estilo
+    )
+    if cols:
+        partes.append(f'<cols>{cols}</cols>')
+    partes.append('<sheetData><row r="1">')
+    partes.extend(
+        f'<c r="{letra}1" s="{_ESTILO_CABECALHO}" t="inlineStr"><is><t xml:space="preserve">'
+        f'{_texto_escalar(nome)}</t></is></c>'
+        for letra, nome in zip(letras, df.columns)
+    )
+    partes.append('</row>')
+    saida.write(''.join(partes).encode('utf-8'))
+
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO].reset_index(drop=True)
+        linhas = pd.Series(np.arange(inicio + 2, inicio + 2 + len(bloco))).astype(str)
+        xml = '<row r="' + linhas + '">'
+        for pos, letra in enumerate(letras):
+            xml = xml + _celulas_coluna(bloco.iloc[:, pos], letra, linhas, estilos[pos])
+        saida.write((xml + '</row>').str.cat().encode('utf-8'))
+
+    saida.write(b'</sheetData></worksheet>')
+
+
+def gerar_planilha_excel(abas, destino=None, colunas_texto=COLUNAS_FORCAR_TEXTO):
+    """Gera o .xlsx com uma aba por item de `abas` ({nome_aba: DataFrame}).
+
+    `destino` pode ser um caminho ou arquivo aberto; sem destino, devolve os
+    bytes da planilha (usado pelo botão de download). As colunas em
+    `colunas_texto` saem formatadas como texto.
+    """
+    buffer = destino if destino is not None else io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for n, (nome_aba, df) in enumerate(abas.items(), start=1):
+            with zf.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as saida:
+                _escrever_planilha(saida, df, colunas_texto)
+
+        ns = range(1, len(abas) + 1)
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            planilhas=''.join(_CONTENT_TYPE_PLANILHA.format(n=n) for n in ns)))
+        zf.writestr('_rels/.rels', _RELS_RAIZ)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(planilhas=''.join(
+            f'<sheet name="{escape(str(nome), {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, nome in zip(ns, abas))))
+        zf.writestr('xl/_rels/workbook.xml.rels', _RELS_WORKBOOK.format(planilhas=''.join(
+            f'<Relationship Id="rId{n}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>' for n in ns)))
+        zf.writestr('xl/styles.xml', _STYLES)
+    if destino is None:
+        return buffer.getvalue()
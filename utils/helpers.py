@@ -1,6 +1,15 @@
+import codecs
 import pandas as pd
 import re
-import streamlit as st
+
+from utils.categorias import categorizar_colunas
+
+# Quantos bytes do início do CSV são usados para detectar encoding/separador.
+TAMANHO_AMOSTRA_CSV = 64 * 1024
+# Linhas por bloco na leitura em streaming (limita o pico de memória).
+TAMANHO_BLOCO_CSV = 200_000
+# Bytes por leitura ao conferir o utf-8 do arquivo inteiro (ler_csv_em_blocos).
+TAMANHO_PEDACO_UTF8 = 1024 * 1024
 
 def normalizar_nf(valor):
     """Padroniza a Nota Fiscal extraindo apenas dígitos.
@@ -16,30 +25,154 @@ def normalizar_nf(valor):
     if s.endswith('.0'): s = s[:-2]
     return re.sub(r'\D', '', s)
 
-def carregar_arquivo(uploaded_file):
+def detectar_formato_csv(arquivo, tamanho_amostra=TAMANHO_AMOSTRA_CSV):
+    """Detecta (encoding, separador) de um CSV lendo apenas os primeiros KB.
+
+    Encoding: utf-8 se a amostra decodifica (tolerando um caractere multibyte
+    cortado no fim da amostra), senão latin1 — mesmos dois encodings que o
+    carregamento sempre aceitou. Separador: o mais frequente entre ';' e ','
+    na linha de cabeçalho (exports do Sysemp usam ';', Intelipost ',').
+    """
+    arquivo.seek(0)
+    amostra = arquivo.read(tamanho_amostra)
+    arquivo.seek(0)
+    if isinstance(amostra, str):
+        texto, encoding = amostra, 'utf-8'
+    else:
+        try:
+            texto, encoding = amostra.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError as e:
+            if e.start >= len(amostra) - 3 and len(amostra) == tamanho_amostra:
+                texto, encoding = amostra[:e.start].decode('utf-8'), 'utf-8'
+            else:
+                texto, encoding = amostra.decode('latin1'), 'latin1'
+
+    linhas = texto.splitlines()
+    cabecalho = linhas[0] if linhas else ''
+    sep = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    return encoding, sep
+
+def _utf8_valido(arquivo, tamanho_pedaco=TAMANHO_PEDACO_UTF8):
+    """O arquivo (binário) inteiro decodifica como utf-8? Lê em pedaços, sem guardar o texto."""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    arquivo.seek(0)
+    try:
+        while True:
+            pedaco = arquivo.read(tamanho_pedaco)
+            if isinstance(pedaco, str):
+                return True     # arquivo aberto em modo texto: já decodificado
+            if not pedaco:
+                decodificador.decode(b'', final=True)
+                return True
+            decodificador.decode(pedaco)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        arquivo.seek(0)
+
+def formato_csv_do_arquivo(arquivo):
+    """(encoding, separador) valendo para o arquivo inteiro, para leituras sem fallback.
+
+    O separador vem da amostra inicial (detectar_formato_csv). O utf-8 da
+    amostra não prova o do arquivo — um export latin1 pode ter o primeiro
+    acento só depois dela —, então o arquivo inteiro é conferido (só
+    decodificação, bem mais barata que o parse); se não for utf-8, vale
+    latin1, como na cascata de _ler_arquivo.
+    """
+    encoding, sep = detectar_formato_csv(arquivo)
+    if encoding == 'utf-8' and not _utf8_valido(arquivo):
+        encoding = 'latin1'
+    return encoding, sep
+
+def ler_csv_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO_CSV, **kwargs):
+    """Gera DataFrames de até `tamanho_bloco` linhas (todas as colunas como str).
+
+    Um bloco já entregue não pode ser relido em outro encoding: o formato
+    é decidido antes, para o arquivo inteiro (formato_csv_do_arquivo).
+    """
+    encoding, sep = formato_csv_do_arquivo(arquivo)
+    leitor = pd.read_csv(
+        arquivo, sep=sep, encoding=encoding, dtype=str, chunksize=tamanho_bloco, **kwargs
+    )
+    with leitor:
+        for bloco in leitor:
+            yield bloco
+
+def ler_cabecalho(arquivo):
+    """Nomes das colunas (já desduplicados como o pandas faz: 'A', 'A.1'), lendo só o cabeçalho."""
+    try:
+        if arquivo.name.endswith('.csv'):
+            # O parser decodifica um buffer bem maior que o cabeçalho: o
+            # encoding tem de valer além da amostra (e casar com o dos blocos).
+            encoding, sep = formato_csv_do_arquivo(arquivo)
+            return list(pd.read_csv(arquivo, sep=sep, encoding=encoding, nrows=0).columns)
+        return list(pd.read_excel(arquivo, nrows=0).columns)
+    finally:
+        arquivo.seek(0)
+
+def carregar_arquivo(uploaded_file, colunas=None):
     """Carrega arquivos CSV ou Excel lidando com diferentes encodings.
 
     Lê TODAS as colunas como string (dtype=str) para preservar a precisão
     de campos numéricos longos como a Chave da NF (44 dígitos). Sem isso,
     pandas inferiria float64 e a chave seria truncada em ~15 dígitos
     (ficando como "4.4109e+43"), corrompendo o dado antes do processamento.
+
+    Para CSV, encoding e separador são detectados pela amostra inicial
+    (detectar_formato_csv); a cascata antiga de tentativas fica só como
+    fallback caso a leitura detectada falhe.
+
+    Colunas de texto com poucos valores distintos (UF, transportadora,
+    canal, ocorrência...) saem como `category` — ver utils.categorias.
+
+    Leitura projetada: com `colunas` (função cabeçalho -> nomes usados, ver
+    DataProcessor.projecao), só o cabeçalho é lido primeiro e apenas essas
+    colunas são parseadas — exports de 80+ colunas usam uma dúzia. Se o
+    cabeçalho não puder ser lido ou nada for resolvido, lê tudo como antes.
     """
+    usecols = None
+    if colunas is not None:
+        try:
+            cabecalho = ler_cabecalho(uploaded_file)
+        except (ValueError, UnicodeDecodeError, pd.errors.ParserError):
+            cabecalho = []
+        usadas = set(colunas(cabecalho))
+        usecols = [c for c in cabecalho if c in usadas] or None
+    try:
+        return categorizar_colunas(_ler_arquivo(uploaded_file, usecols))
+    except ValueError:
+        if usecols is None:
+            raise
+        # Cabeçalho que o parser não casa com os nomes lidos (ex.: xlsx com
+        # colunas repetidas): volta para a leitura completa.
+        uploaded_file.seek(0)
+        return categorizar_colunas(_ler_arquivo(uploaded_file))
+
+def _ler_arquivo(uploaded_file, usecols=None):
     if uploaded_file.name.endswith('.csv'):
         try:
-            return pd.read_csv(uploaded_file, encoding='utf-8', dtype=str)
+            encoding, sep = detectar_formato_csv(uploaded_file)
+            return pd.read_csv(uploaded_file, sep=sep, encoding=encoding, dtype=str, usecols=usecols)
+        except (UnicodeDecodeError, pd.errors.ParserError):
+            uploaded_file.seek(0)
+        try:
+            return pd.read_csv(uploaded_file, encoding='utf-8', dtype=str, usecols=usecols)
         except:
             uploaded_file.seek(0)
             try:
-                return pd.read_csv(uploaded_file, sep=';', encoding='latin1', dtype=str)
+                return pd.read_csv(uploaded_file, sep=';', encoding='latin1', dtype=str, usecols=usecols)
             except:
                 uploaded_file.seek(0)
-                return pd.read_csv(uploaded_file, sep=',', encoding='latin1', dtype=str)
+                return pd.read_csv(uploaded_file, sep=',', encoding='latin1', dtype=str, usecols=usecols)
     else:
-        return pd.read_excel(uploaded_file, dtype=str)
+        return pd.read_excel(uploaded_file, dtype=str, usecols=usecols)
 
 def encontrar_coluna(df, palavras_chave):
-    """Busca inteligente de colunas baseada em palavras-chave."""
-    colunas_reais = df.columns
+    """Busca inteligente de colunas baseada em palavras-chave.
+
+    `df` pode ser o DataFrame ou só a lista de nomes (cabeçalho).
+    """
+    colunas_reais = df.columns if hasattr(df, 'columns') else list(df)
     # Busca exata
     for chave in palavras_chave:
         if chave in colunas_reais:
@@ -0,0 +1,223 @@
+"""Medição por etapa dos pipelines: tempo, linhas de entrada/saída e memória.
+
+O DataProcessor recebe uma Instrumentacao (opcional) e envolve cada etapa
+nomeada — leitura, tratamento do Sysemp, divisão pelo histórico, merges,
+canonicalização de transportadora, datas, filtros — num `with`:
+
+    with self.instrumentacao.etapa('merge Sysemp', entrada=len(df)) as etapa:
+        df = df.merge(...)
+        etapa.saida(len(df))
+
+Sem instrumentação (padrão), `etapa()` não mede nada e custa um `with`
+vazio. A memória é o delta do RSS do processo entre o início e o fim da
+etapa (barato de ler; disponível em Linux — nos demais sistemas fica None).
+Com `pico_memoria=True`, cada etapa também registra o pico alocado acima
+do nível em que começou (MonitorPico: tracemalloc + pool do Arrow) — é o
+que decide se um arquivo cabe no container, mas o tracemalloc deixa a
+execução algumas vezes mais lenta.
+
+Consumidores: o painel st.status do app, o cli.py e os benchmarks, via
+`callback` (chamado ao fim de cada etapa), `etapas`, `tabela()` ou
+`como_dataframe()`.
+"""
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+
+def memoria_rss():
+    """RSS atual do processo em bytes, ou None onde /proc não existe."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def bytes_arrow():
+    """Bytes alocados no pool do Arrow (onde moram as colunas de texto do pandas); 0 sem pyarrow."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return 0
+    return pa.total_allocated_bytes()
+
+
+class _Marca:
+    __slots__ = ('heap_base', 'heap_pico', 'arrow_base', 'arrow_pico')
+
+    def __init__(self, heap, arrow):
+        self.heap_base = self.heap_pico = heap
+        self.arrow_base = self.arrow_pico = arrow
+
+
+class MonitorPico:
+    """Pico de memória alocada em blocos (possivelmente aninhados).
+
+    Soma o pico do heap Python/numpy (tracemalloc) e o do pool do Arrow.
+    O pool não guarda pico consultável: uma thread o amostra a cada
+    `intervalo_s` enquanto houver bloco aberto. O tracemalloc só fica
+    ligado nesse período (se já estava ligado, continua).
+
+        marca = monitor.abrir()
+        ...
+        pico_bytes = monitor.fechar(marca)   # acima do nível da abertura
+    """
+
+    def __init__(self, intervalo_s=0.002):
+        self.intervalo_s = intervalo_s
+        self._abertas = []
+        self._lock = threading.Lock()
+        self._parar = None
+        self._ligou_tracemalloc = False
+
+    def abrir(self):
+        with self._lock:
+            if not self._abertas:
+                self._ligou_tracemalloc = not tracemalloc.is_tracing()
+                if self._ligou_tracemalloc:
+                    tracemalloc.start()
+                self._parar = threading.Event()
+                threading.Thread(target=self._amostrar, args=(self._parar,), daemon=True).start()
+            self._absorver()
+            marca = _Marca(tracemalloc.get_traced_memory()[0], bytes_arrow())
+            self._abertas.append(marca)
+        return marca
+
+    def fechar(self, marca):
+        """Pico (bytes) do bloco aberto com `marca`."""
+        with self._lock:
+            self._absorver()
+            self._abertas.remove(marca)
+            if not self._abertas:
+                self._parar.set()
+                if self._ligou_tracemalloc:
+                    tracemalloc.stop()
+        return (marca.heap_pico - marca.heap_base) + (marca.arrow_pico - marca.arrow_base)
+
+    def _absorver(self):
+        # Com o lock: o pico do heap desde a última leitura vale para todos
+        # os blocos abertos; zera o pico para o próximo trecho.
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        arrow = bytes_arrow()
+        for marca in self._abertas:
+            marca.heap_pico = max(marca.heap_pico, pico)
+            marca.arrow_pico = max(marca.arrow_pico, arrow)
+
+    def _amostrar(self, parar):
+        while not parar.wait(self.intervalo_s):
+            arrow = bytes_arrow()
+            with self._lock:
+                for marca in self._abertas:
+                    marca.arrow_pico = max(marca.arrow_pico, arrow)
+
+
+class MedidaEtapa:
+    """Resultado de uma etapa. `nivel` indica o aninhamento (0 = raiz)."""
+
+    __slots__ = ('nome', 'nivel', 'linhas_entrada', 'linhas_saida', 'tempo_s', 'memoria_delta_mb',
+                 'memoria_pico_mb')
+
+    def __init__(self, nome, nivel=0, linhas_entrada=None):
+        self.nome = nome
+        self.nivel = nivel
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.tempo_s = None
+        self.memoria_delta_mb = None
+        self.memoria_pico_mb = None
+
+    def entrada(self, linhas):
+        self.linhas_entrada = linhas
+
+    def saida(self, linhas):
+        self.linhas_saida = linhas
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    @classmethod
+    def de_dict(cls, dados):
+        """Inverso de como_dict (etapas medidas em outro processo)."""
+        medida = cls(dados['nome'])
+        for campo in cls.__slots__:
+            setattr(medida, campo, dados.get(campo))
+        return medida
+
+
+class Instrumentacao:
+    """Coleta as MedidaEtapa de uma execução, na ordem em que as etapas começam."""
+
+    def __init__(self, callback=None, pico_memoria=False):
+        self.callback = callback
+        self.etapas = []
+        self._nivel = 0
+        self._monitor = MonitorPico() if pico_memoria else None
+
+    @contextmanager
+    def etapa(self, nome, entrada=None):
+        medida = MedidaEtapa(nome, self._nivel, entrada)
+        self.etapas.append(medida)
+        self._nivel += 1
+        marca = self._monitor.abrir() if self._monitor else None
+        rss_inicio = memoria_rss()
+        inicio = time.perf_counter()
+        try:
+            yield medida
+        finally:
+            medida.tempo_s = time.perf_counter() - inicio
+            if marca is not None:
+                medida.memoria_pico_mb = self._monitor.fechar(marca) / 2**20
+            rss_fim = memoria_rss()
+            if rss_inicio is not None and rss_fim is not None:
+                medida.memoria_delta_mb = (rss_fim - rss_inicio) / 2**20
+            self._nivel -= 1
+            if self.callback:
+                self.callback(medida)
+
+    def limpar(self):
+        self.etapas = []
+
+    def como_dataframe(self):
+        linhas = []
+        for m in self.etapas:
+            linha = m.como_dict()
+            linha['nome'] = '  ' * m.nivel + m.nome
+            linhas.append(linha)
+        return pd.DataFrame(linhas, columns=list(MedidaEtapa.__slots__)).drop(columns='nivel')
+
+    def tabela(self, recuo='  '):
+        """Texto de largura fixa (CLI / st.code)."""
+        def _n(valor):
+            return f"{valor:>10,}" if valor is not None else f"{'-':>10}"
+
+        com_pico = any(m.memoria_pico_mb is not None for m in self.etapas)
+        saida = [f"{recuo}{'etapa':<50} {'entrada':>10} {'saída':>10} {'tempo':>9} {'Δ memória':>11}"
+                 + (f" {'pico':>11}" if com_pico else '')]
+        for m in self.etapas:
+            nome = ('  ' * m.nivel + m.nome)[:50]
+            tempo = f"{m.tempo_s:8.3f}s" if m.tempo_s is not None else f"{'...':>9}"
+            memoria = f"{m.memoria_delta_mb:+8.1f} MB" if m.memoria_delta_mb is not None else f"{'-':>11}"
+            if com_pico:
+                memoria += f" {m.memoria_pico_mb:8.1f} MB" if m.memoria_pico_mb is not None else f" {'-':>11}"
+            saida.append(f"{recuo}{nome:<50} {_n(m.linhas_entrada)} {_n(m.linhas_saida)} {tempo} {memoria}")
+        return '\n'.join(saida)
+
+
+class _SemInstrumentacao:
+    """Padrão do DataProcessor: etapas não são medidas."""
+
+    callback = None
+    etapas = ()
+
+    def etapa(self, nome, entrada=None):
+        return nullcontext(_MEDIDA_DESCARTADA)
+
+
+_MEDIDA_DESCARTADA = MedidaEtapa('')
+SEM_INSTRUMENTACAO = _SemInstrumentacao()
@@ -0,0 +1,153 @@
+"""Processamentos do app em segundo plano, com fila limitada.
+
+O script do Streamlit roda de novo a cada interação: um processamento
+longo feito nele trava a sessão e é abortado por qualquer clique. Aqui o
+processamento vira uma Tarefa executada num pool de threads do processo:
+
+    * cada Tarefa tem um id, o estado ('na fila', 'executando',
+      'concluída', 'erro'), os avisos e as etapas medidas (Instrumentacao)
+      conforme acontecem, e ao fim o resultado ou o erro;
+    * o pool tem MAX_TAREFAS_SIMULTANEAS workers e aceita no máximo
+      MAX_TAREFAS_NA_FILA esperando — acima disso `submeter` recusa
+      (FilaCheia) em vez de deixar um arquivo enorme de um usuário segurar
+      todos os demais;
+    * cada sessão tem no máximo uma tarefa ativa.
+
+A função da tarefa recebe a própria Tarefa (para `avisar` e
+`instrumentacao`) e devolve (resultado, erro_str_ou_None), como os motores
+do DataProcessor. Exceções viram erro com o traceback em `log` (ou o
+`log` da própria exceção, quando ela traz o de outro processo).
+
+Uso:
+    tarefa = TAREFAS.submeter(lambda t: processar(t, ...), 'Atraso', sessao=id_sessao)
+    tarefa.estado, tarefa.avisos, tarefa.instrumentacao.etapas
+    tarefa.aguardar(); tarefa.resultado, tarefa.erro
+"""
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.instrumentacao import Instrumentacao
+
+MAX_TAREFAS_SIMULTANEAS = 2
+MAX_TAREFAS_NA_FILA = 6
+# Tarefas terminadas guardadas pelo gerenciador (as sessões guardam as suas).
+MAX_TAREFAS_TERMINADAS = 32
+
+NA_FILA, EXECUTANDO, CONCLUIDA, ERRO = 'na fila', 'executando', 'concluída', 'erro'
+
+
+class FilaCheia(RuntimeError):
+    """O servidor já tem o máximo de processamentos esperando."""
+
+
+class Tarefa:
+    """Um processamento submetido. Os campos são escritos pelo worker e lidos pela sessão."""
+
+    def __init__(self, id_tarefa, descricao, sessao=None):
+        self.id = id_tarefa
+        self.descricao = descricao
+        self.sessao = sessao
+        self.estado = NA_FILA
+        self.avisos = []
+        self.instrumentacao = Instrumentacao()
+        self.resultado = None
+        self.erro = None
+        self.log = None
+        self.criada_em = time.time()
+        self.iniciada_em = self.terminada_em = None
+        self._fim = threading.Event()
+
+    @property
+    def terminada(self):
+        return self._fim.is_set()
+
+    def avisar(self, mensagem):
+        """Mensagem de progresso para o painel de status."""
+        self.avisos.append(mensagem)
+
+    def aguardar(self, timeout=None):
+        """Espera a tarefa terminar; devolve se terminou."""
+        return self._fim.wait(timeout)
+
+    def duracao_s(self):
+        if self.iniciada_em is None:
+            return None
+        return (self.terminada_em or time.time()) - self.iniciada_em
+
+    def _executar(self, funcao):
+        self.estado = EXECUTANDO
+        self.iniciada_em = time.time()
+        try:
+            self.resultado, self.erro = funcao(self)
+        except Exception as e:
+            self.erro = str(e) or type(e).__name__
+            self.log = getattr(e, 'log', None) or traceback.format_exc()
+        self.estado = ERRO if self.erro else CONCLUIDA
+        self.terminada_em = time.time()
+        self._fim.set()
+
+
+class GerenciadorTarefas:
+    """Pool de threads limitado + registro das tarefas por id. Thread-safe."""
+
+    def __init__(self, max_simultaneas=MAX_TAREFAS_SIMULTANEAS, max_fila=MAX_TAREFAS_NA_FILA,
+                 max_terminadas=MAX_TAREFAS_TERMINADAS):
+        self.max_simultaneas = max_simultaneas
+        self.max_fila = max_fila
+        self.max_terminadas = max_terminadas
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneas, thread_name_prefix="tarefa")
+        self._tarefas = OrderedDict()    # id -> Tarefa, na ordem de submissão
+        self._lock = threading.Lock()
+
+    def submeter(self, funcao, descricao, sessao=None):
+        """Enfileira `funcao(tarefa) -> (resultado, erro)`. Devolve a Tarefa.
+
+        Levanta FilaCheia se a fila está no limite, e RuntimeError se a
+        `sessao` já tem uma tarefa ativa.
+        """
+        with self._lock:
+            self._descartar_terminadas()
+            ativas = [t for t in self._tarefas.values() if not t.terminada]
+            if sessao is not None and any(t.sessao == sessao for t in ativas):
+                raise RuntimeError("Já existe um processamento em andamento nesta sessão.")
+            na_fila = sum(t.estado == NA_FILA for t in ativas)
+            if na_fila >= self.max_fila:
+                raise FilaCheia(
+                    f"Servidor ocupado: {na_fila} processamentos já aguardam na fila "
+                    f"(limite {self.max_fila}). Tente novamente em alguns minutos."
+                )
+            tarefa = Tarefa(uuid.uuid4().hex[:8], descricao, sessao)
+            self._tarefas[tarefa.id] = tarefa
+            self._pool.submit(tarefa._executar, funcao)
+        return tarefa
+
+    def obter(self, id_tarefa):
+        with self._lock:
+            return self._tarefas.get(id_tarefa)
+
+    def posicao_na_fila(self, tarefa):
+        """Quantas tarefas estão na frente desta (0 = a próxima); None fora da fila."""
+        with self._lock:
+            if tarefa.estado != NA_FILA:
+                return None
+            na_fila = [t for t in self._tarefas.values() if t.estado == NA_FILA]
+        return na_fila.index(tarefa) if tarefa in na_fila else None
+
+    def estatisticas(self):
+        with self._lock:
+            estados = [t.estado for t in self._tarefas.values()]
+        return {estado: estados.count(estado) for estado in (NA_FILA, EXECUTANDO, CONCLUIDA, ERRO)}
+
+    def _descartar_terminadas(self):
+        # Com o lock: mantém só as max_terminadas terminadas mais recentes.
+        terminadas = [i for i, t in self._tarefas.items() if t.terminada]
+        for id_tarefa in terminadas[:max(0, len(terminadas) - self.max_terminadas)]:
+            del self._tarefas[id_tarefa]
+
+
+# Compartilhado por todas as sessões do processo: o limite vale para o servidor.
+TAREFAS = GerenciadorTarefas()
@@ -0,0 +1,124 @@
+"""Transformações de texto "fatora uma vez, transforma os distintos, espalha".
+
+O processor repetia as mesmas cadeias coluna a coluna —
+`astype(str).str.upper().str.strip()`, às vezes com `str.replace(r'\\s+', ' ')`,
+seguidas de `.map(dicionario).fillna(...)`. Aqui cada cadeia vira um
+pipeline nomeado que roda só sobre os valores distintos da coluna (os
+códigos da category) e é espalhado de volta pelas linhas.
+
+`Transformacoes` guarda um memo por pipeline: valor de entrada -> resultado.
+Dentro de uma execução, um valor normalizado uma vez (a transportadora
+"jadlog  serra 18" na origem, no Sysemp e nas descartadas) não é
+normalizado de novo; cada chamada só transforma os valores ainda não vistos.
+
+    transf = Transformacoes({'maiusculo': texto_maiusculo})
+    transf.aplicar(df['UF'], 'maiusculo')     # -> Series category
+"""
+import numpy as np
+import pandas as pd
+
+from utils.categorias import codigos_e_valores, espalhar
+
+# Acima disso (valores distintos por chamada / guardados por pipeline) o memo
+# não compensa: a coluna é quase uma chave e cada valor aparece uma vez.
+MAX_VALORES_MEMO = 50_000
+
+_NULO = object()
+
+
+# --------------------------------------------------------------------------- #
+# Cadeias comuns (recebem e devolvem Series de valores distintos)
+# --------------------------------------------------------------------------- #
+def texto_limpo(valores):
+    """astype(str) + strip."""
+    return valores.astype(str).str.strip()
+
+
+def texto_maiusculo(valores):
+    """astype(str) + upper + strip."""
+    return valores.astype(str).str.upper().str.strip()
+
+
+def texto_maiusculo_espacos(valores):
+    """Como texto_maiusculo, colapsando espaços repetidos ("JADLOG  SERRA" -> "JADLOG SERRA")."""
+    return valores.astype(str).str.upper().str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def texto_exibicao(valores):
+    """Texto de saída: 'nan'/'NaT'/'None' e nulos viram "", com strip."""
+    return (
+        valores.astype(str)
+        .replace({'nan': "", 'NaT': "", 'None': ""})
+        .fillna("")
+        .str.strip()
+    )
+
+
+def com_dicionario(base, dicionario):
+    """Pipeline: `base` e depois o dicionário; valores fora dele ficam como `base` os deixou."""
+    def _aplicar(valores):
+        normalizado = base(valores)
+        return normalizado.map(dicionario).fillna(normalizado)
+    return _aplicar
+
+
+def no_dicionario(base, dicionario):
+    """Pipeline booleano: o valor, depois de `base`, é chave do dicionário?"""
+    return lambda valores: base(valores).isin(dicionario)
+
+
+def encadear(*etapas):
+    """Compõe cadeias: encadear(f, g)(v) == g(f(v))."""
+    def _aplicar(valores):
+        for etapa in etapas:
+            valores = etapa(valores)
+        return valores
+    return _aplicar
+
+
+class Transformacoes:
+    """Pipelines nomeados com memo de valor -> resultado, compartilhado na execução."""
+
+    def __init__(self, pipelines=None, max_valores=MAX_VALORES_MEMO):
+        self.pipelines = dict(pipelines or {})
+        self.max_valores = max_valores
+        self._memo = {}
+        self.valores_transformados = 0
+
+    def registrar(self, nome, transformar):
+        self.pipelines[nome] = transformar
+        self._memo.pop(nome, None)
+
+    def limpar(self):
+        self._memo.clear()
+
+    def aplicar(self, serie, nome):
+        """Resultado do pipeline `nome` para cada linha de `serie`, como category.
+
+        Passe a mesma Series category para várias chamadas: a fatoração já
+        está nos códigos e só os valores distintos ainda não vistos por
+        `nome` passam pelo pipeline.
+        """
+        transformar = self.pipelines[nome]
+        codigos, valores = codigos_e_valores(serie)
+        if len(valores) > self.max_valores:
+            self.valores_transformados += len(valores)
+            return espalhar(transformar(valores), codigos, serie)
+
+        memo = self._memo.setdefault(nome, {})
+        if len(memo) + len(valores) > self.max_valores:
+            memo.clear()
+        chaves = valores.tolist()
+        i = len(chaves) - 1
+        while i >= 0 and pd.isna(chaves[i]):
+            # Categorias nunca são nulas: os nulos só podem ser os últimos
+            # valores, um por tipo (None e NaN viram textos diferentes).
+            chaves[i] = (_NULO, type(chaves[i]))
+            i -= 1
+        faltando = [i for i, chave in enumerate(chaves) if chave not in memo]
+        if faltando:
+            novos = transformar(valores.iloc[faltando].reset_index(drop=True))
+            for i, resultado in zip(faltando, np.asarray(novos, dtype=object)):
+                memo[chaves[i]] = resultado
+            self.valores_transformados += len(faltando)
+        return espalhar([memo[chave] for chave in chaves], codigos, serie)